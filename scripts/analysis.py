@@ -0,0 +1,181 @@
+import math
+from statistics import NormalDist
+from typing import Dict, List
+import numpy as np
+from results_store import STORE_DIR, load_results
+from endpoint_index import EndpointIndex, RouteTrie, UNKNOWN, endpoint_ids
+from sequential import quantile_ci
+
+BASELINE = "benign"
+TREATMENT = "attack"
+CONFIDENCE = 0.95
+MAX_SAMPLES = 200_000  # per endpoint and scenario; larger pools are subsampled
+SEED = 0
+
+COMPARISON_DTYPE = np.dtype([
+    ("method", "U8"), ("endpoint", "U256"),
+    ("n_baseline", "i8"), ("n_treatment", "i8"),
+    ("p50_baseline", "f8"), ("p50_treatment", "f8"),
+    ("p99_baseline", "f8"), ("p99_treatment", "f8"),
+    ("delta_p50", "f8"), ("delta_p50_low", "f8"), ("delta_p50_high", "f8"),
+    ("delta_p99", "f8"), ("delta_p99_low", "f8"), ("delta_p99_high", "f8"),
+    ("ks_d", "f8"), ("ks_p", "f8"),
+    ("mw_effect", "f8"), ("mw_p", "f8"),
+    ("sensitivity", "f8"),
+])
+
+
+def normalize_endpoints(columns: Dict[str, np.ndarray], templates: List[dict] = None,
+                        index: EndpointIndex = None) -> np.ndarray:
+    """
+    Key every row by (method, path template).
+    Rows stored with an endpoint id are keyed through the persisted endpoint table; rows without one (converted
+    CSVs) only have a faked URL, which is matched against the catalog's route trie. Their method is unknown and
+    reported as "*".
+    Args:
+        columns (Dict[str, np.ndarray]): Columns from load_results.
+        templates (List[dict]): Catalog templates used to match bare URLs.
+        index (EndpointIndex): Table the stored ids were interned in (default: the persisted one).
+    Returns:
+        np.ndarray: "METHOD template" key per row ("" when the URL matches nothing).
+    """
+    index = index if index is not None else EndpointIndex.load(persist=False)
+    stored = columns["endpoint_id"]
+    # Ids the table does not know (e.g. written against another table) are resolved again like unstored ones
+    known = np.where((stored > UNKNOWN) & (stored < len(index)), stored, UNKNOWN).astype(np.int32)
+    ids = endpoint_ids({**columns, "endpoint_id": known}, index, RouteTrie(templates))
+    return np.array(index.keys)[ids]
+
+
+def ks_2samp(a: np.ndarray, b: np.ndarray) -> tuple[float, float]:
+    """
+    Two-sample Kolmogorov-Smirnov statistic and asymptotic p-value.
+    """
+    a = np.sort(a)
+    b = np.sort(b)
+    both = np.concatenate((a, b))
+    cdf_a = np.searchsorted(a, both, side="right") / a.size
+    cdf_b = np.searchsorted(b, both, side="right") / b.size
+    d = float(np.abs(cdf_a - cdf_b).max())
+    n = a.size * b.size / (a.size + b.size)
+    lam = (math.sqrt(n) + 0.12 + 0.11 / math.sqrt(n)) * d
+    k = np.arange(1, 101)
+    p = float(np.clip(2 * np.sum((-1.0) ** (k - 1) * np.exp(-2 * k ** 2 * lam ** 2)), 0.0, 1.0))
+    return d, p
+
+
+def mann_whitney(a: np.ndarray, b: np.ndarray) -> tuple[float, float]:
+    """
+    Mann-Whitney U test (normal approximation with tie correction).
+    Returns:
+        tuple: Probability that a value from b exceeds one from a (ties count half), and the two-sided p-value.
+    """
+    both = np.concatenate((a, b))
+    values, inverse, counts = np.unique(both, return_inverse=True, return_counts=True)
+    # Average rank of every distinct value
+    upper = np.cumsum(counts)
+    ranks = (upper - (counts - 1) / 2.0)[inverse]
+    n1, n2 = a.size, b.size
+    u_b = ranks[n1:].sum() - n2 * (n2 + 1) / 2.0
+    n = n1 + n2
+    tie_term = float((counts.astype(np.float64) ** 3 - counts).sum()) / (n * (n - 1))
+    sigma = math.sqrt(n1 * n2 / 12.0 * ((n + 1) - tie_term))
+    if sigma == 0:
+        return 0.5, 1.0
+    z = (u_b - n1 * n2 / 2.0) / sigma
+    return float(u_b / (n1 * n2)), float(math.erfc(abs(z) / math.sqrt(2)))
+
+
+def _grouped_latencies(columns: Dict[str, np.ndarray], row_groups: np.ndarray, n_groups: int) -> tuple:
+    """
+    Sort every request by its row's group without building per-row Python lists.
+    Returns:
+        tuple: Latencies ordered by group and the start offset of every group.
+    """
+    lengths = np.diff(columns["offsets"])
+    request_groups = np.repeat(row_groups, lengths)
+    order = np.argsort(request_groups, kind="stable")
+    bounds = np.searchsorted(request_groups[order], np.arange(n_groups + 1))
+    return columns["latency"][order], bounds
+
+
+def compare_scenarios(columns: Dict[str, np.ndarray], templates: List[dict] = None, baseline: str = BASELINE,
+                      treatment: str = TREATMENT, confidence: float = CONFIDENCE,
+                      max_samples: int = MAX_SAMPLES) -> np.ndarray:
+    """
+    Compare per-request latency distributions of two scenarios for every endpoint present in both.
+    Percentile deltas carry confidence intervals; KS and Mann-Whitney tests measure distribution shift. The
+    result is ranked by sensitivity: the relative p99 increase, weighted by the KS statistic. Rows without
+    per-request latencies (converted CSVs) do not contribute.
+    Args:
+        columns (Dict[str, np.ndarray]): Columns from load_results (any number of runs).
+        templates (List[dict]): Catalog templates used to key rows without a stored template.
+        baseline (str): Baseline scenario name.
+        treatment (str): Treatment scenario name.
+        confidence (float): Confidence level of the intervals.
+        max_samples (int): Cap on pooled requests per endpoint and scenario.
+    Returns:
+        np.ndarray: One COMPARISON_DTYPE record per endpoint, most sensitive first.
+    """
+    keys = normalize_endpoints(columns, templates)
+    scenario = columns["scenario"]
+    endpoint_names, endpoint_ids = np.unique(keys, return_inverse=True)
+    # Group = endpoint * 2 + (0 baseline, 1 treatment); rows of other scenarios are dropped
+    side = np.where(scenario == baseline, 0, np.where(scenario == treatment, 1, -1))
+    groups = np.where((side >= 0) & (keys != ""), endpoint_ids * 2 + side, len(endpoint_names) * 2)
+    latencies, bounds = _grouped_latencies(columns, groups, len(endpoint_names) * 2 + 1)
+
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+    rng = np.random.default_rng(SEED)
+    records = []
+    for e, name in enumerate(endpoint_names):
+        samples = []
+        for s in (0, 1):
+            values = latencies[bounds[e * 2 + s]:bounds[e * 2 + s + 1]]
+            values = values[~np.isnan(values)].astype(np.float64)
+            if values.size > max_samples:
+                values = rng.choice(values, max_samples, replace=False)
+            samples.append(np.sort(values))
+        a, b = samples
+        if a.size < 2 or b.size < 2:
+            continue
+        method, _, endpoint = name.partition(" ")
+        row = [method, endpoint, a.size, b.size]
+        deltas = []
+        # Standard errors derived from the order-statistic intervals, combined into an interval of the difference
+        (est_a, low_a, high_a), (est_b, low_b, high_b) = (quantile_ci(x, (50, 99), confidence) for x in (a, b))
+        se_a, se_b = (high_a - low_a) / (2 * z), (high_b - low_b) / (2 * z)
+        for i in range(2):
+            half = z * math.sqrt(se_a[i] ** 2 + se_b[i] ** 2)
+            row += [float(est_a[i]), float(est_b[i])]
+            deltas += [float(est_b[i] - est_a[i]), float(est_b[i] - est_a[i] - half), float(est_b[i] - est_a[i] + half)]
+        ks_d, ks_p = ks_2samp(a, b)
+        mw_effect, mw_p = mann_whitney(a, b)
+        p99_a = row[6]
+        sensitivity = (deltas[3] / p99_a if p99_a > 0 else 0.0) * ks_d
+        records.append(tuple(row + deltas) + (ks_d, ks_p, mw_effect, mw_p, sensitivity))
+
+    result = np.array(records, dtype=COMPARISON_DTYPE)
+    return result[np.argsort(-result["sensitivity"], kind="stable")]
+
+
+def main(store_dir: str = STORE_DIR, limit: int = 20) -> None:
+    """
+    Print the benign / attack comparison of the stored results, largest p99 shifts first.
+    """
+    from catalog import load_catalog
+
+    columns = load_results(store_dir)
+    if not columns:
+        print(f"[Error] No results in {store_dir}")
+        return
+    comparison = compare_scenarios(columns, load_catalog())
+    print(f"{'endpoint':60} {'p99 base':>9} {'p99 att':>9} {'delta p99 (95% CI)':>26} {'KS D':>6} {'MW p':>8}")
+    for r in comparison[:limit]:
+        print(f"{(r['method'] + ' ' + r['endpoint'])[:60]:60} {r['p99_baseline']:9.2f} {r['p99_treatment']:9.2f} "
+              f"{r['delta_p99']:9.2f} [{r['delta_p99_low']:7.2f}, {r['delta_p99_high']:7.2f}] "
+              f"{r['ks_d']:6.3f} {r['mw_p']:8.2g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,217 @@
+import asyncio
+import ssl
+import time
+import urllib.parse
+import numpy as np
+from pmb import empty_timings
+
+CONNECT_TIMEOUT = 10.0  # seconds
+REQUEST_TIMEOUT = 30.0  # seconds
+
+
+class _Connection:
+    """
+    One keep-alive HTTP/1.1 connection owned by a single worker.
+    """
+
+    def __init__(self, host: str, port: int, tls: ssl.SSLContext = None):
+        self.host = host
+        self.port = port
+        self.tls = tls
+        self.reader = None
+        self.writer = None
+
+    async def open(self) -> None:
+        # With TLS the handshake is part of the connect time, as in ab
+        self.reader, self.writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port, ssl=self.tls),
+                                                          CONNECT_TIMEOUT)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+    async def read_response(self) -> tuple[int, bool, float]:
+        """
+        Read one response.
+        Returns the status, whether the server keeps the connection open, and the perf_counter time at which
+        the status line arrived (time to first byte).
+        """
+        status_line = await self.reader.readuntil(b"\r\n")
+        first_byte = time.perf_counter()
+        status = int(status_line.split(b" ", 2)[1])
+        headers = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.partition(b":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        if headers.get(b"transfer-encoding") == b"chunked":
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        elif b"content-length" in headers:
+            await self.reader.readexactly(int(headers[b"content-length"]))
+        elif status >= 200 and status not in (204, 304):
+            await self.reader.read()
+            return status, False, first_byte
+        return status, headers.get(b"connection") != b"close", first_byte
+
+
+async def _benchmark(host: str, url: str, method: str, body: bytes, n_requests: int, n_concurrency: int,
+                     content_type: str, timings: np.ndarray, status: np.ndarray) -> None:
+    target = urllib.parse.urlsplit(host)
+    tls = ssl.create_default_context() if target.scheme == "https" else None
+    port = target.port or (443 if tls else 80)
+    request = (
+        f"{method} {url} HTTP/1.1\r\nHost: {target.hostname}:{port}\r\nAccept: */*\r\nConnection: keep-alive\r\n"
+    ).encode()
+    if body is not None:
+        request += f"Content-Type: {content_type}\r\nContent-Length: {len(body)}\r\n\r\n".encode() + body
+    else:
+        request += b"\r\n"
+
+    # Map the monotonic clock onto epoch seconds once, so start times line up with other time.time() data
+    epoch_offset = time.time() - time.perf_counter()
+    next_index = iter(range(n_requests))
+
+    async def worker() -> None:
+        conn = _Connection(target.hostname, port, tls)
+        try:
+            for i in next_index:
+                started = time.perf_counter()
+                connect = 0.0
+                try:
+                    if conn.writer is None:
+                        await conn.open()
+                        connect = time.perf_counter() - started
+                    conn.writer.write(request)
+                    await conn.writer.drain()
+                    code, keep_alive, first_byte = await asyncio.wait_for(conn.read_response(), REQUEST_TIMEOUT)
+                except (OSError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError,
+                        ValueError, IndexError):
+                    conn.close()
+                    finished = time.perf_counter()
+                    status[i] = 0
+                    timings[i] = (started + epoch_offset, connect * 1e3, (finished - started - connect) * 1e3,
+                                  np.nan, (finished - started) * 1e3)
+                    continue
+                finished = time.perf_counter()
+                # Status first: a live_metrics watcher takes a row as complete once its start time is set
+                status[i] = code
+                timings[i] = (started + epoch_offset, connect * 1e3, (finished - started - connect) * 1e3,
+                              (first_byte - started) * 1e3, (finished - started) * 1e3)
+                if not keep_alive:
+                    conn.close()
+        finally:
+            conn.close()
+
+    await asyncio.gather(*(worker() for _ in range(min(n_concurrency, n_requests))))
+
+
+def run_benchmark(host: str, url: str, method: str = "GET", body: bytes = None, n_requests: int = 7000,
+                  n_concurrency: int = 10, content_type: str = "application/json", live=None,
+                  endpoint: str = None) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Send n_requests requests over a pool of n_concurrency keep-alive connections, like `ab -k`, but in-process.
+    Args:
+        host (str): Base URL, e.g. "http://localhost:9393"; https:// URLs are sent over TLS.
+        url (str): Path and query, already percent-encoded.
+        method (str): HTTP method.
+        body (bytes): Request body for POST/PUT (None sends no body).
+        n_requests (int): Total number of requests.
+        n_concurrency (int): Number of connections used in parallel.
+        content_type (str): Content type of the body.
+        live (LiveMetrics): Live metrics the timing arrays are exposed to while they fill.
+        endpoint (str): Endpoint label for the live metrics (default url).
+    Returns:
+        tuple: Timings with pmb.TIMING_DTYPE (connect, ttfb, total in ms) and the HTTP status of every request
+        (0 when the request failed at the connection level).
+    """
+    if urllib.parse.urlsplit(host).scheme not in ("http", "https"):
+        raise ValueError(f"Unsupported scheme in {host!r}; expected http:// or https://")
+    timings = empty_timings(n_requests)
+    status = np.zeros(n_requests, dtype=np.int16)
+    watch = live.watch(endpoint or url, method, timings, status) if live is not None else None
+    try:
+        asyncio.run(_benchmark(host, url, method, body, n_requests, n_concurrency, content_type, timings, status))
+    finally:
+        if watch is not None:
+            live.done(watch)
+    order = np.argsort(timings["start"], kind="stable")
+    return timings[order], status[order]
+
+
+def serve_stub(port: int = 0):
+    """
+    Start a minimal keep-alive HTTP server on localhost in a background thread, for checking the client.
+    Returns:
+        The server; its port is server.server_address[1].
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class StubHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def _reply(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            if length:
+                self.rfile.read(length)
+            body = b'{"status":"ok"}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        do_GET = do_POST = do_PUT = do_DELETE = _reply
+
+        def log_message(self, *args):
+            pass
+
+    class StubServer(ThreadingHTTPServer):
+        daemon_threads = True
+        # The default of 5 drops the connects of a concurrent client, which then wait out 1 s SYN retries
+        request_queue_size = 128
+
+    server = StubServer(("127.0.0.1", port), StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    # Compare the in-process client with ab against a local stub server
+    import shutil
+    import subprocess
+    import tempfile
+    from pmb import load_ab_gnuplot
+
+    N_REQUESTS, N_CONCURRENCY = 2000, 10
+    stub = serve_stub()
+    stub_host = f"http://127.0.0.1:{stub.server_address[1]}"
+
+    started = time.perf_counter()
+    timings, status = run_benchmark(stub_host, "/apps?force=true", "GET", None, N_REQUESTS, N_CONCURRENCY)
+    wall = time.perf_counter() - started
+    print(f"asyncio: {wall:.2f}s, ok {int((status == 200).sum())}/{N_REQUESTS}, "
+          f"p50 {np.percentile(timings['latency'], 50):.3f} ms, p99 {np.percentile(timings['latency'], 99):.3f} ms, "
+          f"ttfb p50 {np.percentile(timings['ttfb'], 50):.3f} ms")
+
+    if shutil.which("ab"):
+        with tempfile.NamedTemporaryFile(suffix=".tsv") as gnuplot:
+            started = time.perf_counter()
+            subprocess.run(["ab", "-k", "-q", "-n", str(N_REQUESTS), "-c", str(N_CONCURRENCY), "-g", gnuplot.name,
+                            f"{stub_host}/apps?force=true"], stdout=subprocess.DEVNULL, check=True)
+            wall = time.perf_counter() - started
+            ab_timings = load_ab_gnuplot(gnuplot.name)
+        print(f"ab:      {wall:.2f}s, p50 {np.percentile(ab_timings['latency'], 50):.3f} ms, "
+              f"p99 {np.percentile(ab_timings['latency'], 99):.3f} ms")
+    else:
+        print("ab is not installed; skipping the comparison")
+    stub.shutdown()
@@ -1,64 +1,117 @@
-import json, csv
-from faker import Faker
-from helper import generate_request_data, execute_ab_request
+import csv
+from helper import execute_ab_request
+from cgroup_sampler import CgroupSampler, compose_container_names, docker_cgroup_dirs
+from results_store import ResultsWriter, new_run_id, CSV_HEADER
+from catalog import load_catalog
+from corpus import load_corpus
+from endpoint_index import EndpointIndex
+from harness_profile import HarnessProfiler, OVERHEAD_THRESHOLD, stage
+from live_metrics import LiveMetrics
 from concurrent.futures import ThreadPoolExecutor
 
-# GLOBAL CONSTANTS
+# GLOBAL CONSTANTS (defaults of main(); the CLI overrides them from a config file or flags)
 HOST = "http://localhost:9393"
 MICROSERVICE = "spring"
-API_SPEC_FILE = f"./{MICROSERVICE}/documents/scdf_endpoints.json"
-RESULTS_FILE = f"./results/{MICROSERVICE}_attack_results.csv"
+CORPUS_SEED = 1234
+CORPUS_VARIANTS = 16
+CORPUS_VARIANT = 0
 DEBUG = True
+PROFILE = False  # also dump a cProfile of every thread to results/harness/<run id>.prof
+METRICS_PORT = None  # e.g. 9464 to serve live Prometheus metrics on localhost during the run (0 = any free port)
+HTTP_CLIENT = "ab"  # or "asyncio" for the in-process keep-alive client
 BOTTLENECK_THRESHOLD = 0 # milliseconds
 N_REQUESTS = 100
 N_CONCURRENCY = 100
 MAX_API_TO_ATTACK = 30
 
 
-def send_ab_requests_from_api_spec(api_spec, verbose=True, max_workers=10):
+def send_ab_requests_from_api_spec(templates, corpus, host, results_file, store, sampler, n_requests=N_REQUESTS,
+                                   n_concurrency=N_CONCURRENCY, bottleneck_threshold=BOTTLENECK_THRESHOLD,
+                                   client=HTTP_CLIENT, verbose=True, max_workers=10, live=None,
+                                   corpus_variant=CORPUS_VARIANT):
     """
-    Loops through the OpenAPI specification and sends requests using ab for each endpoint.
+    Loops through the compiled endpoint catalog and sends requests using ab for each endpoint.
     Executes requests simultaneously, with a limit on the number of simultaneous requests.
     """
-    fake = Faker()
-    def process_request(path, method, details):
+    def process_request(template):
         """
         Inner function to process a single API request.
         """
+        path, method = template["path"], template["method"]
         if verbose:
-            print(f"[Verbose] Processing {method.upper()} request for {path}...")
+            print(f"[Verbose] Processing {method} request for {path}...")
 
-        # Prepare the request data (URL and body)
-        url, body_params = generate_request_data(path, method, details.get('parameters', []), fake)
-        # url = f"http://localhost:9393{url}"
+        # Take the pre-generated request data (URL and body) from the seeded corpus
+        with stage("generate"):
+            url, body_params = corpus.request(template, corpus_variant)
 
         # Execute the ab request
-        execute_ab_request(host=HOST, url=url, body_params=body_params, method=method.upper(), csv_file=RESULTS_FILE, n_requests=N_REQUESTS, n_concurrency=N_CONCURRENCY, bottleneck_threshold=BOTTLENECK_THRESHOLD)
+        execute_ab_request(host=host, url=url, body_params=body_params, method=method, csv_file=results_file, n_requests=n_requests, n_concurrency=n_concurrency, bottleneck_threshold=bottleneck_threshold, sampler=sampler, store=store, endpoint=path, client=client, live=live)
+        if live is not None:
+            live.endpoint_done(path)
 
     # Collect tasks for concurrent execution
     tasks = []
     with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        for path, methods in api_spec['paths'].items():
-            for method, details in methods.items():
-                if method.upper() in ["GET", "POST", "PUT", "DELETE"]:
-                    # Submit each task to the executor
-                    tasks.append(executor.submit(process_request, path, method, details))
+        for template in templates:
+            # Submit each task to the executor
+            tasks.append(executor.submit(process_request, template))
 
     # Optionally wait for all tasks to complete
     for task in tasks:
         task.result()  # This will raise any exception encountered in the worker thread
 
-with open(RESULTS_FILE, mode='w', newline='') as file:
-        writer = csv.writer(file)
-        # Write header row with fixed and dynamic columns
-        writer.writerow([
-            "URL", "Failed Requests", "50%", "66%", "75%", "80%", "90%", "95%", "98%", "99%", "100%",
-            "Bottleneck Length", "Average Memory Usage (MB)", "Average Network Usage (MBps)"
-        ])
 
-with open(API_SPEC_FILE, 'r') as file:
-    # Load the JSON content into a Python dictionary
-    api_spec = json.load(file)
+def main(host=HOST, microservice=MICROSERVICE, n_requests=N_REQUESTS, n_concurrency=N_CONCURRENCY,
+         bottleneck_threshold=BOTTLENECK_THRESHOLD, client=HTTP_CLIENT, max_api=MAX_API_TO_ATTACK, profile=PROFILE,
+         overhead_threshold=OVERHEAD_THRESHOLD, metrics_port=METRICS_PORT, verbose=DEBUG):
+    """
+    Run the attack scenario: catalog endpoints hit in parallel, max_api at a time.
+    """
+    documents = f"./{microservice}/Documents"
+    results_file = f"./results/{microservice}_attack_results.csv"
+
+    with open(results_file, mode='w', newline='') as file:
+            writer = csv.writer(file)
+            # Write header row with fixed and dynamic columns
+            writer.writerow(CSV_HEADER)
+
+    # Load the compiled request templates (recompiled only when the spec changed)
+    templates = load_catalog(f"{documents}/scdf_endpoints.json", f"{documents}/scdf_catalog.pickle")
+    corpus = load_corpus(templates, f"{documents}/corpus", CORPUS_SEED, CORPUS_VARIANTS)
+
+    # Single writer for the CSV rows and the columnar results store; rows are stamped with interned endpoint ids
+    run_id = new_run_id("attack")
+    store = ResultsWriter(run_id, "attack", csv_file=results_file, endpoint_index=EndpointIndex.load())
+
+    # One long-lived resource sampler shared by every worker
+    sampler = CgroupSampler(docker_cgroup_dirs(compose_container_names(f"./{microservice}/ComposeFile"))).start()
+
+    # Self-profile of the harness: stage timers, own CPU / RSS / context switches and optionally cProfile
+    profiler = HarnessProfiler(run_id, profile, overhead_threshold).start()
+
+    # Optional live metrics endpoint and terminal summary of the running scenario
+    live = None
+    if metrics_port is not None:
+        live = LiveMetrics(metrics_port, sampler, total_endpoints=len(templates)).start()
+        print(f"[Verbose] Live metrics on {live.url}")
+
+    # Call the function to send ab requests
+    try:
+        send_ab_requests_from_api_spec(templates, corpus, host, results_file, store, sampler, n_requests, n_concurrency,
+                                       bottleneck_threshold, client, verbose, max_api, live)
+    finally:
+        if live is not None:
+            live.stop()
+        sampler.stop()
+        harness = profiler.stop(sampler)
+        if verbose:
+            print(f"[Verbose] Resource sampler overhead: {sampler.overhead() * 100:.2f}% of one core")
+        if verbose or harness["over_threshold"]:
+            print(f"[Verbose] Harness: {profiler.summary()}")
+        # Last: it re-raises a failed results write, after everything above has been cleaned up
+        store.close()
+
 
-# Call the function to send ab requests
-send_ab_requests_from_api_spec(api_spec, DEBUG, MAX_API_TO_ATTACK)
+if __name__ == "__main__":
+    main()
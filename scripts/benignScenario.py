@@ -1,50 +1,149 @@
-import json, csv
-from faker import Faker
-from helper import generate_request_data, execute_ab_request
+import csv
+from helper import execute_ab_request
+from cgroup_sampler import CgroupSampler, compose_container_names, docker_cgroup_dirs
+from results_store import ResultsWriter, new_run_id, CSV_HEADER
+from catalog import load_catalog
+from corpus import load_corpus
+from endpoint_index import EndpointIndex
+from harness_profile import HarnessProfiler, OVERHEAD_THRESHOLD, stage
+from live_metrics import LiveMetrics
+from warmup import WarmupGate, drift_probe_requests, readiness_probes
+from sequential import SequentialStop
+from mitigation_proxy import start_proxy, stop_proxy
 
-# GLOBAL CONSTANTS
+# GLOBAL CONSTANTS (defaults of main(); the CLI overrides them from a config file or flags)
 HOST = "http://localhost:9393"
 MICROSERVICE = "spring"
-API_SPEC_FILE = f"./{MICROSERVICE}/documents/scdf_endpoints.json"
-RESULTS_FILE = f"./results/{MICROSERVICE}_benign_results.csv"
+CORPUS_SEED = 1234
+CORPUS_VARIANTS = 16
+CORPUS_VARIANT = 0
 DEBUG = True
+PROFILE = False  # also dump a cProfile of every thread to results/harness/<run id>.prof
+METRICS_PORT = None  # e.g. 9464 to serve live Prometheus metrics on localhost during the run (0 = any free port)
+HTTP_CLIENT = "ab"  # or "asyncio" for the in-process keep-alive client
 BOTTLENECK_THRESHOLD = 500 # milliseconds
 N_REQUESTS = 7000
 N_CONCURRENCY = 20
+WARMUP = True  # wait for the stack and warm it up to steady state before measuring
+WARMUP_TARGETS = 5  # GET endpoints without path parameters used as warm-up workload
+DRIFT_REQUESTS = None  # probe requests per drift check before every endpoint; None sizes them to N_REQUESTS, 0 disables
+ADAPTIVE = False  # stop each endpoint once its p50/p95/p99 CIs are narrow enough, with N_REQUESTS as the maximum (needs HTTP_CLIENT = "asyncio")
+MIN_REQUESTS = 500
+PROXY_POLICY = None  # e.g. "shortest_first" to measure the stack behind the mitigation proxy (see mitigation_proxy.POLICIES)
 
 
-def send_ab_requests_from_api_spec(api_spec, verbose=True):
+def send_ab_requests_from_api_spec(templates, corpus, host, results_file, store, sampler, gate=None, stopping=None,
+                                   n_requests=N_REQUESTS, n_concurrency=N_CONCURRENCY,
+                                   bottleneck_threshold=BOTTLENECK_THRESHOLD, client=HTTP_CLIENT, verbose=True, live=None):
     """
-    Loops through the OpenAPI specification and sends requests using ab for each endpoint.
+    Loops through the compiled endpoint catalog and sends requests using ab for each endpoint.
     """
-    # Initialize Faker to generate fake data
-    fake = Faker()
-    for path, methods in api_spec['paths'].items():
-        for method, details in methods.items():
-            if method.upper() in ["GET", "POST", "PUT", "DELETE"]:
-                if verbose:
-                    print(f"[Verbose: ] Processing {method.upper()} request for {path}...")
-                # Prepare the request data (URL and body)
-                url, body_params = generate_request_data(path, method, details.get('parameters', []), fake)
-                # url = f"{HOST}{url}"
-                
-                # Execute the ab request
-                execute_ab_request(host=HOST, url=url, body_params=body_params, method=method.upper(), csv_file=RESULTS_FILE, n_requests=N_REQUESTS, n_concurrency=N_CONCURRENCY, bottleneck_threshold=BOTTLENECK_THRESHOLD)
-
-
-
-with open(RESULTS_FILE, mode='w', newline='') as file:
+    for template in templates:
+        path, method = template["path"], template["method"]
+        if verbose:
+            print(f"[Verbose: ] Processing {method} request for {path}...")
+        # Take the pre-generated request data (URL and body) from the seeded corpus
+        with stage("generate"):
+            url, body_params = corpus.request(template, CORPUS_VARIANT)
+
+        # Re-check that the stack is still in the steady state the previous endpoints were measured in
+        if gate is not None:
+            gate.check_drift()
+
+        # Execute the ab request
+        execute_ab_request(host=host, url=url, body_params=body_params, method=method, csv_file=results_file, n_requests=n_requests, n_concurrency=n_concurrency, bottleneck_threshold=bottleneck_threshold, sampler=sampler, store=store, endpoint=path, client=client, live=live, stopping=stopping)
+        if live is not None:
+            live.endpoint_done(path)
+
+
+def main(host=HOST, microservice=MICROSERVICE, n_requests=N_REQUESTS, n_concurrency=N_CONCURRENCY,
+         bottleneck_threshold=BOTTLENECK_THRESHOLD, client=HTTP_CLIENT, warmup=WARMUP, adaptive=ADAPTIVE,
+         min_requests=MIN_REQUESTS, drift_requests=DRIFT_REQUESTS, proxy_policy=PROXY_POLICY, profile=PROFILE,
+         overhead_threshold=OVERHEAD_THRESHOLD, metrics_port=METRICS_PORT, verbose=DEBUG):
+    """
+    Run the benign baseline: every catalog endpoint in turn, after the warm-up gate, optionally through the
+    mitigation proxy and with sequential early stopping.
+    """
+    # ab reports latencies only once it exits, so it cannot be stopped early; never swap the client silently
+    if adaptive and client != "asyncio":
+        raise ValueError(f"Adaptive stopping needs the asyncio client, not {client}; "
+                         "use --client asyncio or drop --adaptive")
+
+    documents = f"./{microservice}/Documents"
+    results_file = f"./results/{microservice}_benign_results.csv"
+    precision_file = f"./results/{microservice}_benign_precision.csv"
+
+    with open(results_file, mode='w', newline='') as file:
         writer = csv.writer(file)
         # Write header row with fixed and dynamic columns
-        writer.writerow([
-            "URL", "Failed Requests", "50%", "66%", "75%", "80%", "90%", "95%", "98%", "99%", "100%",
-            "Bottleneck Length", "Average Memory Usage (MB)", "Average Network Usage (MBps)"
-        ])
+        writer.writerow(CSV_HEADER)
+
+    # Load the compiled request templates (recompiled only when the spec changed)
+    templates = load_catalog(f"{documents}/scdf_endpoints.json", f"{documents}/scdf_catalog.pickle")
+    corpus = load_corpus(templates, f"{documents}/corpus", CORPUS_SEED, CORPUS_VARIANTS)
+
+    # Optional mitigation proxy in front of the stack; every request (warm-up included) then goes through it
+    proxy = None
+    target_host = host
+    if proxy_policy is not None:
+        proxy, target_host = start_proxy(host, proxy_policy)
+
+    # Readiness and warm-up gate; the first endpoints are otherwise measured against a cold JVM
+    gate = None
+    if warmup:
+        warmup_targets = [corpus.request(t)[0] for t in templates if t["method"] == "GET" and not t["path_slots"]]
+        # Readiness is probed on the stack itself (from its compose file), also when measuring through the proxy
+        health_urls, tcp_ports = readiness_probes(host, f"./{microservice}/ComposeFile")
+        if drift_requests is None:
+            drift_requests = drift_probe_requests(n_requests)
+        gate = WarmupGate(target_host, warmup_targets[:WARMUP_TARGETS], verbose=verbose, health_urls=health_urls,
+                          tcp_ports=tcp_ports, probe_requests=drift_requests)
+        if gate.wait_ready():
+            gate.warm_up()
+
+    # Single writer for the CSV rows and the columnar results store; rows are stamped with interned endpoint ids
+    run_id = new_run_id("benign")
+    store = ResultsWriter(run_id, "benign", csv_file=results_file, endpoint_index=EndpointIndex.load())
+
+    # Sequential early stopping; the achieved precision of every endpoint goes to the precision file
+    stopping = SequentialStop(min_samples=min_requests, max_samples=n_requests) if adaptive else None
+
+    # One long-lived resource sampler shared by every endpoint test
+    sampler = CgroupSampler(docker_cgroup_dirs(compose_container_names(f"./{microservice}/ComposeFile"))).start()
+
+    # Self-profile of the harness: stage timers, own CPU / RSS / context switches and optionally cProfile
+    profiler = HarnessProfiler(run_id, profile, overhead_threshold).start()
+
+    # Optional live metrics endpoint and terminal summary of the running scenario
+    live = None
+    if metrics_port is not None:
+        live = LiveMetrics(metrics_port, sampler, total_endpoints=len(templates)).start()
+        print(f"[Verbose: ] Live metrics on {live.url}")
 
-with open(API_SPEC_FILE, 'r') as file:
-    # Load the JSON content into a Python dictionary
-    api_spec = json.load(file)
+    # Call the function to send ab requests
+    try:
+        send_ab_requests_from_api_spec(templates, corpus, target_host, results_file, store, sampler, gate, stopping,
+                                       n_requests, n_concurrency, bottleneck_threshold, client, verbose, live)
+    finally:
+        if live is not None:
+            live.stop()
+        sampler.stop()
+        harness = profiler.stop(sampler)
+        if stopping is not None:
+            stopping.write_report(precision_file)
+        if proxy is not None:
+            stop_proxy(proxy)
+        if verbose:
+            print(f"[Verbose: ] Resource sampler overhead: {sampler.overhead() * 100:.2f}% of one core")
+            if gate is not None:
+                print(f"[Verbose: ] Warm-up gate: {gate.report}")
+            if stopping is not None:
+                print(f"[Verbose: ] Sequential stopping: {stopping.summary()}")
+        if verbose or harness["over_threshold"]:
+            print(f"[Verbose: ] Harness: {profiler.summary()}")
+        # Last: it re-raises a failed results write, after everything above has been cleaned up
+        store.close()
 
 
-# Call the function to send ab requests
-send_ab_requests_from_api_spec(api_spec, DEBUG)
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import hashlib
+import json
+import os
+import pickle
+from typing import Dict, List
+
+HOST = "http://localhost:9393"
+SPEC_FILE = "./spring/Documents/scdf_endpoints.json"
+CACHE_FILE = "./spring/Documents/scdf_catalog.pickle"
+METHODS = ("GET", "POST", "PUT", "DELETE")
+CACHE_VERSION = 1
+
+
+def spec_hash(data: bytes) -> str:
+    """
+    Content hash used to key the compiled catalog.
+    """
+    return hashlib.sha256(data).hexdigest()
+
+
+def resolve_refs(node, components: dict, _seen: tuple = ()):
+    """
+    Recursively inline local "$ref"s ("#/components/...").
+    Self-referencing schemas are cut off at the second visit and replaced with an empty schema.
+    Args:
+        node: Any part of the spec.
+        components (dict): The spec's "components" section.
+    Returns:
+        A copy of node with references resolved.
+    """
+    if isinstance(node, dict):
+        ref = node.get("$ref")
+        if isinstance(ref, str) and ref.startswith("#/components/"):
+            if ref in _seen:
+                return {}
+            target = components
+            for part in ref[len("#/components/"):].split("/"):
+                target = target.get(part, {})
+            return resolve_refs(target, components, _seen + (ref,))
+        return {k: resolve_refs(v, components, _seen) for k, v in node.items()}
+    if isinstance(node, list):
+        return [resolve_refs(v, components, _seen) for v in node]
+    return node
+
+
+def _slot(name: str, location: str, schema: dict, required: bool) -> dict:
+    """
+    Reduce a parameter or property schema to the typed slot used for request generation.
+    """
+    slot = {
+        "name": name,
+        "in": location,
+        "type": schema.get("type"),
+        "format": schema.get("format"),
+        "enum": schema.get("enum"),
+        "required": required,
+    }
+    if slot["type"] == "array":
+        slot["items"] = (schema.get("items") or {}).get("type")
+    return slot
+
+
+def compile_operation(path: str, method: str, details: dict, components: dict) -> dict:
+    """
+    Compile one OpenAPI operation into a request template.
+    The template keeps the OpenAPI "parameters" list (with resolved schemas) so it can be passed straight to
+    helper.generate_request_data, plus typed slots for path, query and body values.
+    Args:
+        path (str): Path template, e.g. "/apps/{type}/{name}".
+        method (str): HTTP method.
+        details (dict): The operation object.
+        components (dict): The spec's "components" section.
+    Returns:
+        dict: The request template.
+    """
+    details = resolve_refs(details, components)
+    parameters = [p for p in details.get("parameters", []) if "in" in p and "name" in p]
+    template = {
+        "method": method.upper(),
+        "path": path,
+        "operation_id": details.get("operationId"),
+        "parameters": parameters,
+        "path_slots": [_slot(p["name"], "path", p.get("schema", {}), True) for p in parameters if p["in"] == "path"],
+        "query_slots": [_slot(p["name"], "query", p.get("schema", {}), p.get("required", False))
+                        for p in parameters if p["in"] == "query"],
+        "body_slots": [],
+        "content_type": None,
+    }
+    content = (details.get("requestBody") or {}).get("content") or {}
+    if content:
+        template["content_type"] = "application/json" if "application/json" in content else next(iter(content))
+        schema = content[template["content_type"]].get("schema") or {}
+        required = set(schema.get("required") or ())
+        for name, prop in (schema.get("properties") or {}).items():
+            template["body_slots"].append(_slot(name, "body", prop, name in required))
+        extra = schema.get("additionalProperties")
+        if isinstance(extra, dict):
+            for name, prop in extra.items():
+                if isinstance(prop, dict) and "type" in prop:
+                    template["body_slots"].append(_slot(name, "body", prop, False))
+    return template
+
+
+def compile_catalog(spec: dict, previous: dict = None) -> Dict[str, tuple]:
+    """
+    Compile every GET/POST/PUT/DELETE operation of a spec.
+    Operations whose raw definition is unchanged since the previous compilation are reused, unless the
+    components they may reference changed.
+    Args:
+        spec (dict): Parsed OpenAPI document.
+        previous (dict): Operations of an earlier compilation, as returned by this function.
+    Returns:
+        Dict[str, tuple]: "METHOD path" to (operation hash, template), in spec order.
+    """
+    components = spec.get("components", {})
+    components_hash = spec_hash(json.dumps(components, sort_keys=True).encode())
+    previous = previous or {}
+    operations = {}
+    for path, methods in spec.get("paths", {}).items():
+        for method, details in methods.items():
+            if method.upper() not in METHODS:
+                continue
+            key = f"{method.upper()} {path}"
+            op_hash = spec_hash((components_hash + json.dumps(details, sort_keys=True)).encode())
+            cached = previous.get(key)
+            if cached is not None and cached[0] == op_hash:
+                operations[key] = cached
+            else:
+                operations[key] = (op_hash, compile_operation(path, method, details, components))
+    return operations
+
+
+def _read_cache(cache_path: str) -> dict:
+    try:
+        with open(cache_path, "rb") as f:
+            cache = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError):
+        return {}
+    return cache if cache.get("version") == CACHE_VERSION else {}
+
+
+def _write_cache(cache_path: str, cache: dict) -> None:
+    tmp_path = cache_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, cache_path)
+
+
+def load_catalog(spec_file: str = SPEC_FILE, cache_file: str = CACHE_FILE) -> List[dict]:
+    """
+    Load the request templates for a local spec file, compiling them only when the spec changed.
+    The cache is keyed by the hash of the spec bytes, so a warm start never parses the JSON spec.
+    Args:
+        spec_file (str): OpenAPI JSON document.
+        cache_file (str): Compiled catalog cache.
+    Returns:
+        List[dict]: Request templates in spec order.
+    """
+    with open(spec_file, "rb") as f:
+        data = f.read()
+    digest = spec_hash(data)
+    cache = _read_cache(cache_file)
+    if cache.get("spec_hash") != digest:
+        operations = compile_catalog(json.loads(data), cache.get("operations"))
+        cache = {"version": CACHE_VERSION, "spec_hash": digest, "etag": cache.get("etag"), "operations": operations}
+        _write_cache(cache_file, cache)
+    return [template for _, template in cache["operations"].values()]
+
+
+def refresh_catalog(host: str = HOST, spec_file: str = SPEC_FILE, cache_file: str = CACHE_FILE) -> List[dict]:
+    """
+    Fetch /v3/api-docs from a running server and refresh the spec file and catalog cache.
+    A conditional request with the cached ETag avoids downloading an unchanged spec.
+    Args:
+        host (str): Base URL of the server.
+        spec_file (str): Where to store the raw spec.
+        cache_file (str): Compiled catalog cache.
+    Returns:
+        List[dict]: Request templates in spec order.
+    """
+    import requests
+
+    cache = _read_cache(cache_file)
+    headers = {"If-None-Match": cache["etag"]} if cache.get("etag") and os.path.exists(spec_file) else {}
+    response = requests.get(f"{host}/v3/api-docs", headers=headers)
+    if response.status_code == 304:
+        return load_catalog(spec_file, cache_file)
+    response.raise_for_status()
+
+    os.makedirs(os.path.dirname(spec_file) or ".", exist_ok=True)
+    with open(spec_file, "wb") as f:
+        f.write(response.content)
+    templates = load_catalog(spec_file, cache_file)
+    cache = _read_cache(cache_file)
+    cache["etag"] = response.headers.get("ETag")
+    _write_cache(cache_file, cache)
+    return templates
@@ -0,0 +1,337 @@
+import glob
+import os
+import re
+import subprocess
+import threading
+import time
+import warnings
+from typing import Dict, List
+import numpy as np
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+SAMPLE_INTERVAL = 0.01  # seconds
+RING_CAPACITY = 2 ** 16  # ~11 minutes of history at 10 ms
+
+# Per-container counters kept for every sample
+SAMPLE_FIELDS = ("cpu_usage_usec", "cpu_throttled_usec", "memory_current", "io_rbytes", "io_wbytes")
+
+
+def compose_container_names(compose_dir: str) -> List[str]:
+    """
+    Collect the container names declared in the docker-compose files of a directory.
+    Args:
+        compose_dir (str): Directory holding docker-compose*.yml files.
+    Returns:
+        List[str]: Container names in file order.
+    """
+    names = []
+    for path in sorted(glob.glob(os.path.join(compose_dir, "docker-compose*.yml"))):
+        with open(path) as f:
+            for match in re.finditer(r"^\s*container_name:\s*['\"]?([\w.-]+)", f.read(), re.MULTILINE):
+                if match.group(1) not in names:
+                    names.append(match.group(1))
+    return names
+
+
+def compose_published_ports(compose_dir: str) -> Dict[str, List[int]]:
+    """
+    Collect the host ports published by every service of the docker-compose files of a directory.
+    Only single "host:container" mappings count; port ranges and merely exposed ports are left out.
+    Args:
+        compose_dir (str): Directory holding docker-compose*.yml files.
+    Returns:
+        Dict[str, List[int]]: Container name (the service name without one) to its published host ports.
+    """
+    ports = {}
+    for path in sorted(glob.glob(os.path.join(compose_dir, "docker-compose*.yml"))):
+        with open(path) as f:
+            services = re.split(r"^  ([\w.-]+):[ \t]*$", f.read(), flags=re.MULTILINE)
+        for service, block in zip(services[1::2], services[2::2]):
+            name = re.search(r"^\s*container_name:\s*['\"]?([\w.-]+)", block, re.MULTILINE)
+            published = ports.setdefault(name.group(1) if name else service, [])
+            for match in re.finditer(r"^\s*-\s*['\"]?(?:[\d.]+:)?(\d+):\d+(?:/tcp)?['\"]?\s*$", block, re.MULTILINE):
+                if int(match.group(1)) not in published:
+                    published.append(int(match.group(1)))
+    return ports
+
+
+def docker_cgroup_dirs(names: List[str], root: str = CGROUP_ROOT) -> Dict[str, str]:
+    """
+    Resolve running containers to their cgroup v2 directories.
+    Handles both the systemd (system.slice/docker-<id>.scope) and cgroupfs (docker/<id>) layouts.
+    Containers that are not running are skipped.
+    Args:
+        names (List[str]): Container names.
+        root (str): cgroup v2 mount point.
+    Returns:
+        Dict[str, str]: Container name to cgroup directory.
+    """
+    dirs = {}
+    for name in names:
+        try:
+            container_id = subprocess.run(["docker", "inspect", "--format", "{{.Id}}", name], stdout=subprocess.PIPE,
+                                          stderr=subprocess.DEVNULL, text=True, check=True).stdout.strip()
+        except (OSError, subprocess.CalledProcessError):
+            continue
+        for pattern in (f"system.slice/docker-{container_id}.scope", f"docker/{container_id}"):
+            candidate = os.path.join(root, pattern)
+            if os.path.isdir(candidate):
+                dirs[name] = candidate
+                break
+    return dirs
+
+
+def _read_keyed(data: bytes, keys: tuple) -> List[int]:
+    """
+    Pick integer values out of a flat-keyed cgroup file such as cpu.stat.
+    """
+    values = [0] * len(keys)
+    for line in data.split(b"\n"):
+        parts = line.split(b" ")
+        if len(parts) == 2 and parts[0] in keys:
+            values[keys.index(parts[0])] = int(parts[1])
+    return values
+
+
+def _read_io(data: bytes) -> tuple[int, int]:
+    """
+    Sum read and written bytes across all devices of an io.stat file.
+    """
+    rbytes = wbytes = 0
+    for line in data.split(b"\n"):
+        for field in line.split(b" ")[1:]:
+            if field.startswith(b"rbytes="):
+                rbytes += int(field[7:])
+            elif field.startswith(b"wbytes="):
+                wbytes += int(field[7:])
+    return rbytes, wbytes
+
+
+class CgroupSampler:
+    """
+    Long-lived sampler of cgroup v2 counters for a fixed set of containers.
+    A single background thread reads cpu.stat, memory.current and io.stat for every container at a fixed
+    interval into a preallocated ring buffer. Runs do not start their own threads; they open a window and
+    read back the samples that fall inside it.
+    A container whose cgroup can no longer be read (e.g. it was restarted and its cgroup removed) gets NaN in
+    its column from then on; the other containers keep being sampled. Counters whose file was missing from the
+    start (e.g. io.stat without the io controller) are NaN as well.
+    """
+
+    CPU_KEYS = (b"usage_usec", b"throttled_usec")
+
+    def __init__(self, cgroup_dirs: Dict[str, str], interval: float = SAMPLE_INTERVAL, capacity: int = RING_CAPACITY):
+        """
+        Args:
+            cgroup_dirs (Dict[str, str]): Container name to cgroup directory (a fake tree works as well).
+            interval (float): Sampling interval in seconds.
+            capacity (int): Number of samples kept in the ring buffer.
+        """
+        self.containers = list(cgroup_dirs)
+        self.interval = interval
+        self.capacity = capacity
+        self.timestamps = np.zeros(capacity, dtype=np.float64)
+        # float64 so a container that could not be read is NaN; counters stay exact up to 2**53
+        self.samples = np.zeros((capacity, len(self.containers), len(SAMPLE_FIELDS)), dtype=np.float64)
+        self.count = 0
+        self.failed = {}  # container name -> error of the read that failed
+        self._row = np.zeros((len(self.containers), len(SAMPLE_FIELDS)), dtype=np.float64)
+        self._fds = [
+            {name: self._open(os.path.join(cgroup_dirs[c], name)) for name in ("cpu.stat", "memory.current", "io.stat")}
+            for c in self.containers
+        ]
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._cpu_time = 0.0
+        self._wall_time = 0.0
+
+    @staticmethod
+    def _open(path: str):
+        try:
+            return os.open(path, os.O_RDONLY)
+        except OSError:
+            return None
+
+    def _read(self, fds: dict, row: np.ndarray) -> None:
+        """
+        Read one container's counters into a row of the ring buffer.
+        cgroup files are kept open and re-read from offset 0, which avoids an open() per sample.
+        Fields of a file that could not be opened are NaN, not 0, so sums over containers do not undercount.
+        """
+        fd = fds["cpu.stat"]
+        row[0], row[1] = _read_keyed(os.pread(fd, 4096, 0), self.CPU_KEYS) if fd is not None else (np.nan, np.nan)
+        fd = fds["memory.current"]
+        row[2] = int(os.pread(fd, 64, 0)) if fd is not None else np.nan
+        fd = fds["io.stat"]
+        row[3], row[4] = _read_io(os.pread(fd, 65536, 0)) if fd is not None else (np.nan, np.nan)
+
+    def sample_once(self) -> None:
+        """
+        Take one sample of every container and append it to the ring buffer.
+        The files are read into a scratch row outside the lock; the row is only copied into the ring (and the
+        count advanced) under it, so window() never sees a half-written slot after wrap-around.
+        """
+        row = self._row
+        for i, fds in enumerate(self._fds):
+            name = self.containers[i]
+            if name in self.failed:
+                row[i] = np.nan
+                continue
+            try:
+                self._read(fds, row[i])
+            except (OSError, ValueError) as e:
+                self.failed[name] = e
+                row[i] = np.nan
+                for key, fd in fds.items():
+                    if fd is not None:
+                        try:
+                            os.close(fd)
+                        except OSError:
+                            pass
+                        fds[key] = None
+                print(f"[Error] cgroup of {name} is no longer readable ({e}); its samples are NaN from now on")
+        timestamp = time.time()
+        with self._lock:
+            slot = self.count % self.capacity
+            self.samples[slot] = row
+            self.timestamps[slot] = timestamp
+            self.count += 1
+
+    def _run(self) -> None:
+        thread_start = time.thread_time()
+        wall_start = time.perf_counter()
+        deadline = wall_start
+        while not self._stop.is_set():
+            self.sample_once()
+            deadline += self.interval
+            delay = deadline - time.perf_counter()
+            if delay > 0:
+                self._stop.wait(delay)
+            else:
+                # Fell behind; skip the missed ticks instead of bursting to catch up
+                deadline = time.perf_counter()
+            self._cpu_time = time.thread_time() - thread_start
+            self._wall_time = time.perf_counter() - wall_start
+
+    def start(self) -> "CgroupSampler":
+        """
+        Start the sampling thread (once).
+        """
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="cgroup-sampler", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Stop the sampling thread and close the cgroup files.
+        """
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        for fds in self._fds:
+            for fd in fds.values():
+                if fd is not None:
+                    os.close(fd)
+        self._fds = []
+
+    def pin(self, cpus) -> None:
+        """
+        Restrict the sampling thread to a set of CPUs, away from the cores the load generator runs on.
+        """
+        if self._thread is not None:
+            os.sched_setaffinity(self._thread.native_id, cpus)
+
+    def times(self) -> tuple[float, float]:
+        """
+        CPU and wall-clock seconds of the sampling thread so far.
+        """
+        return self._cpu_time, self._wall_time
+
+    def overhead(self) -> float:
+        """
+        CPU time used by the sampling thread as a fraction of wall-clock time (1.0 = one full core).
+        """
+        return self._cpu_time / self._wall_time if self._wall_time > 0 else 0.0
+
+    def window(self, start: float, end: float) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Copy out the samples taken between two wall-clock timestamps.
+        Samples older than the ring buffer capacity are no longer available.
+        Args:
+            start (float): Window start (time.time() seconds).
+            end (float): Window end (time.time() seconds).
+        Returns:
+            tuple: Timestamps of shape (n,) and samples of shape (n, containers, len(SAMPLE_FIELDS)).
+        """
+        with self._lock:
+            count = self.count
+            n = min(count, self.capacity)
+            order = (np.arange(count - n, count) % self.capacity)
+            timestamps = self.timestamps[order]
+            samples = self.samples[order]
+        mask = (timestamps >= start) & (timestamps <= end)
+        return timestamps[mask], samples[mask]
+
+    def subscribe(self) -> "SamplerWindow":
+        """
+        Open a window that collects the samples taken until it is closed.
+        Usage:
+            with sampler.subscribe() as window:
+                ...run...
+            timestamps, samples = window.result
+        """
+        return SamplerWindow(self)
+
+
+class SamplerWindow:
+    """
+    A time window over a CgroupSampler, filled in when the context manager exits.
+    """
+
+    def __init__(self, sampler: CgroupSampler):
+        self.sampler = sampler
+        self.start = None
+        self.end = None
+        self.result = None
+
+    def __enter__(self) -> "SamplerWindow":
+        self.start = time.time()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.end = time.time()
+        self.result = self.sampler.window(self.start, self.end)
+
+    def cpu_utilization(self) -> np.ndarray:
+        """
+        Mean CPU utilization per container over the window (1.0 = one core).
+        Containers with NaN samples are measured between their first and last readable sample (NaN if fewer
+        than two).
+        """
+        timestamps, samples = self.result
+        if len(timestamps) < 2:
+            return np.zeros(len(self.sampler.containers))
+        usage = samples[:, :, 0]
+        valid = ~np.isnan(usage)
+        columns = np.arange(usage.shape[1])
+        first = valid.argmax(axis=0)
+        last = len(usage) - 1 - valid[::-1].argmax(axis=0)
+        elapsed = timestamps[last] - timestamps[first]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            utilization = (usage[last, columns] - usage[first, columns]) / 1e6 / elapsed
+        return np.where(valid.any(axis=0) & (elapsed > 0), utilization, np.nan)
+
+    def mean_memory_mb(self) -> np.ndarray:
+        """
+        Mean memory.current per container over the window, in MB.
+        """
+        timestamps, samples = self.result
+        if not len(timestamps):
+            return np.zeros(len(self.sampler.containers))
+        with warnings.catch_warnings():
+            # A container without a single readable sample is NaN
+            warnings.simplefilter("ignore", RuntimeWarning)
+            return np.nanmean(samples[:, :, 2], axis=0) / 1024 / 1024
@@ -0,0 +1,206 @@
+import argparse
+import importlib
+import json
+import os
+import sys
+
+# Only the standard library is imported here; every subcommand imports its modules (and through them numpy,
+# psutil, requests, ...) when it runs, so `--help` and the light commands start fast.
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+CONFIG_FILE = "./millibottleneck.json"
+COMMANDS = ("scrape", "benign", "run", "analyze", "features", "ingest")
+# `run matrix` options besides the CELL_DEFAULTS parameters, which set the defaults of every cell
+MATRIX_OPTIONS = ("matrix_dir", "host", "verbose", "microservice", "profile", "overhead_threshold")
+
+
+def load_config(path: str) -> dict:
+    """
+    Read a JSON config file. Top-level keys apply to every command; an object under a command's name (e.g.
+    "benign": {...}) overrides them for that command. A missing default config file is an empty config.
+    """
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        if path == CONFIG_FILE:
+            return {}
+        raise
+
+
+def options_for(config: dict, command: str, flags: dict) -> dict:
+    """
+    Merge config sections and command-line flags (flags win) into the options of one command.
+    """
+    options = {key: value for key, value in config.items() if key not in COMMANDS}
+    options.update(config.get(command, {}))
+    options.update(flags)
+    return options
+
+
+def _parameters(function) -> tuple:
+    code = function.__code__  # cheaper than importing inspect, which alone adds ~10 ms to every start
+    return code.co_varnames[:code.co_argcount + code.co_kwonlyargcount]
+
+
+def _call(function, options: dict):
+    """
+    Call function with the options it accepts; the others belong to other commands and are ignored.
+    """
+    parameters = _parameters(function)
+    return function(**{key: value for key, value in options.items() if key in parameters})
+
+
+def _reject(scenario: str, flags: dict, accepted) -> None:
+    """
+    Refuse command-line flags a scenario would silently ignore. Config keys are shared by all commands and
+    scenarios, so the ones a scenario does not use are still ignored.
+    """
+    unsupported = sorted(key for key in flags if key != "scenario" and key not in accepted)
+    if unsupported:
+        raise ValueError(f"run {scenario} does not take {', '.join(unsupported)}")
+
+
+def _module(name: str):
+    # Modules import their siblings by plain name, as when they are run as scripts
+    if SCRIPTS_DIR not in sys.path:
+        sys.path.insert(0, SCRIPTS_DIR)
+    return importlib.import_module(name)
+
+
+def scrape(options: dict) -> None:
+    _call(_module("api_scrapper").main, options)
+
+
+def benign(options: dict) -> None:
+    _call(_module("benignScenario").main, options)
+
+
+def run(options: dict, flags: dict = None) -> None:
+    scenario = options.pop("scenario")
+    flags = flags or {}
+    if scenario in ("attack", "bursty"):
+        main = _module("attackScenarioOwn" if scenario == "attack" else "syncM_attack").main
+        _reject(scenario, flags, _parameters(main))
+        _call(main, options)
+    else:
+        matrix = _module("experiment_matrix")
+        grid = options.get("grid", matrix.GRID)
+        if isinstance(grid, str):
+            grid = matrix.load_grid(grid)
+        # Load options set the parameters the grid does not sweep; a flag for a swept one would have no effect
+        swept = sorted(key for key in flags if key in grid and key != "scenario")
+        if swept:
+            raise ValueError(f"run matrix: the grid already sweeps {', '.join(swept)}")
+        unswept = [key for key in matrix.CELL_DEFAULTS if key not in grid]
+        _reject(scenario, flags, ("grid", *MATRIX_OPTIONS, *unswept))
+        kwargs = {key: options[key] for key in MATRIX_OPTIONS if key in options}
+        defaults = {key: options[key] for key in unswept if key in options}
+        matrix.ExperimentMatrix(grid, defaults=defaults, **kwargs).run()
+
+
+def analyze(options: dict) -> None:
+    _call(_module("analysis").main, options)
+
+
+def features(options: dict) -> None:
+    meta = _call(_module("features").build_features, options)
+    print(f"Wrote {meta['rows']} windows from {len(meta['runs'])} runs ({meta['bin']} s bins)")
+
+
+def ingest(options: dict) -> None:
+    source = options.pop("source")
+    if source == "alerts":
+        _call(_module("ids_alerts").main, options)
+        return
+    results_store = _module("results_store")
+    for path in options.get("paths", []):
+        print(f"Converted {_call(results_store.convert_csv, {'csv_path': path, **options})} rows from {path}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    # Flags default to SUPPRESS, so only the ones given on the command line override the config file
+    parser = argparse.ArgumentParser(prog="python -m scripts", argument_default=argparse.SUPPRESS,
+                                     description="Millibottleneck measurement harness.")
+    parser.add_argument("--config", default=CONFIG_FILE, help=f"JSON config file (default {CONFIG_FILE})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    def command(name: str, help: str) -> argparse.ArgumentParser:
+        return commands.add_parser(name, help=help, argument_default=argparse.SUPPRESS)
+
+    def target(sub):
+        sub.add_argument("--host", help="base URL of the system under test")
+        sub.add_argument("--microservice", help="directory of the spec, corpus and compose file")
+        sub.add_argument("--quiet", dest="verbose", action="store_false", help="no progress output")
+
+    def load(sub):
+        sub.add_argument("--n-requests", dest="n_requests", type=int, help="requests per endpoint")
+        sub.add_argument("--concurrency", dest="n_concurrency", type=int, help="concurrent connections")
+        sub.add_argument("--threshold", dest="bottleneck_threshold", type=float,
+                         help="millibottleneck threshold in ms")
+        sub.add_argument("--client", choices=("ab", "asyncio"), help="load generator")
+        sub.add_argument("--profile", action="store_true", help="also cProfile the harness (results/harness)")
+        sub.add_argument("--overhead-threshold", dest="overhead_threshold", type=float,
+                         help="harness CPU share of all cores above which the run is flagged")
+        sub.add_argument("--metrics-port", dest="metrics_port", type=int,
+                         help="serve live Prometheus metrics on localhost:PORT/metrics during the run (0 = any)")
+
+    sub = command("scrape", "fetch the OpenAPI spec and compile the endpoint catalog")
+    sub.add_argument("--host", help="base URL serving /v3/api-docs")
+    sub.add_argument("--spec-file", dest="spec_file", help="where the raw spec is stored")
+    sub.add_argument("--cache-file", dest="cache_file", help="where the compiled catalog is stored")
+
+    sub = command("benign", "measure the benign baseline of every endpoint")
+    target(sub)
+    load(sub)
+    sub.add_argument("--no-warmup", dest="warmup", action="store_false", help="skip the readiness / warm-up gate")
+    sub.add_argument("--adaptive", action="store_true",
+                     help="stop every endpoint once its percentiles are precise, with --n-requests as the maximum "
+                          "(needs --client asyncio)")
+    sub.add_argument("--min-requests", dest="min_requests", type=int, help="minimum requests per endpoint")
+    sub.add_argument("--drift-requests", dest="drift_requests", type=int,
+                     help="probe requests per drift check before every endpoint (0 = no drift checks)")
+    sub.add_argument("--proxy-policy", dest="proxy_policy", help="measure behind the mitigation proxy")
+
+    sub = command("run", "run the attack, the ON/OFF bursty attack or an experiment matrix")
+    sub.add_argument("scenario", choices=("attack", "bursty", "matrix"))
+    target(sub)
+    load(sub)
+    sub.add_argument("--max-api", dest="max_api", type=int, help="endpoints attacked in parallel")
+    sub.add_argument("--grid", help="JSON parameter grid of the matrix")
+    sub.add_argument("--matrix-dir", dest="matrix_dir", help="cache directory of the matrix cells")
+
+    sub = command("analyze", "compare benign and attack results from the store")
+    sub.add_argument("--store-dir", dest="store_dir", help="results store directory")
+    sub.add_argument("--limit", type=int, help="endpoints printed")
+
+    sub = command("features", "extract labelled window features from the store")
+    sub.add_argument("--store-dir", dest="store_dir", help="results store directory")
+    sub.add_argument("--feature-dir", dest="feature_dir", help="where the feature matrix is written")
+    sub.add_argument("--bin-width", dest="bin_width", type=float,
+                     help="seconds per time bin (default 1 s if the store holds ab runs, else 0.1 s)")
+    sub.add_argument("--window", type=float, help="seconds per feature window")
+    sub.add_argument("--step", type=float, help="seconds between window starts")
+
+    sub = command("ingest", "convert results CSVs into the store, or ingest IDS alerts")
+    sub.add_argument("source", choices=("csv", "alerts"))
+    sub.add_argument("paths", nargs="*", help="CSV files (csv)")
+    sub.add_argument("--store-dir", dest="store_dir", help="results store directory (csv)")
+    sub.add_argument("--scenario", help="scenario name of the converted rows (csv)")
+    sub.add_argument("--eve", dest="eve_path", help="Suricata eve.json (alerts)")
+    sub.add_argument("--snort", dest="snort_path", help="Snort fast alert log (alerts)")
+    sub.add_argument("--year", type=int, help="year of Snort timestamps (alerts)")
+    return parser
+
+
+def main(argv: list = None) -> None:
+    """
+    Entry point of `python -m scripts`.
+    """
+    flags = vars(build_parser().parse_args(argv))
+    command = flags.pop("command")
+    config_file = flags.pop("config")
+    options = options_for(load_config(config_file), command, flags)
+    if command == "run":
+        run(options, flags)
+    else:
+        globals()[command](options)
@@ -0,0 +1,243 @@
+import hashlib
+import json
+import os
+import urllib.parse
+import uuid
+from typing import List
+import numpy as np
+
+CORPUS_DIR = "./spring/Documents/corpus"
+CORPUS_SEED = 1234
+CORPUS_VARIANTS = 16
+CORPUS_VERSION = 1
+
+# Value pool for string slots; fixed so a seed always yields the same payloads
+WORDS = (
+    "alpha", "amount", "app", "batch", "bridge", "cache", "charge", "cloud", "data", "delta", "deploy", "engine",
+    "event", "field", "filter", "flow", "graph", "group", "health", "http", "index", "input", "job", "kafka",
+    "label", "log", "mark", "metric", "mode", "node", "order", "output", "page", "partition", "platform", "pool",
+    "queue", "record", "region", "release", "route", "sample", "schema", "server", "sink", "source", "stage",
+    "state", "step", "stream", "task", "time", "topic", "trace", "unit", "user", "value", "version", "window",
+    "worker", "zone", "timer", "ticker", "transform",
+)
+INTEGER_RANGES = {"int32": (1, 70000), "int64": (1, 70000), None: (1, 70000)}
+
+# Files making up a corpus directory; every one is loaded memory-mapped
+CORPUS_ARRAYS = ("keys", "variant_offsets", "url_blob", "url_offsets", "body_blob", "body_offsets")
+
+
+def endpoint_key(template: dict) -> str:
+    """
+    Stable key of a catalog template.
+    """
+    return f"{template['method']} {template['path']}"
+
+
+def catalog_hash(templates: List[dict]) -> str:
+    """
+    Hash of everything in the catalog that influences generated payloads.
+    """
+    slots = [(endpoint_key(t), t["path_slots"], t["query_slots"], t["body_slots"]) for t in templates]
+    return hashlib.sha256(json.dumps(slots, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _endpoint_rng(seed: int, key: str) -> np.random.Generator:
+    """
+    Independent generator per endpoint, so adding or removing endpoints leaves the others' payloads unchanged.
+    """
+    digest = hashlib.sha256(f"{seed}:{key}".encode()).digest()
+    return np.random.default_rng(int.from_bytes(digest[:8], "little"))
+
+
+def _scalar_pool(rng: np.random.Generator, slot_type: str, slot_format: str, enum, n: int) -> list:
+    """
+    Draw n values for a scalar slot in one vectorized call.
+    """
+    if enum:
+        return [enum[i] for i in rng.integers(0, len(enum), size=n)]
+    if slot_type == "integer":
+        low, high = INTEGER_RANGES.get(slot_format, INTEGER_RANGES[None])
+        return rng.integers(low, high, size=n).tolist()
+    if slot_type == "number":
+        return np.round(rng.uniform(0, 1000, size=n), 3).tolist()
+    if slot_type == "boolean":
+        return rng.integers(0, 2, size=n).astype(bool).tolist()
+    if slot_format == "date-time":
+        seconds = rng.integers(1577836800, 1893456000, size=n)
+        return [np.datetime_as_string(np.datetime64(int(s), "s")) + "Z" for s in seconds]
+    if slot_format == "date":
+        days = rng.integers(18262, 21915, size=n)
+        return [str(np.datetime64(int(d), "D")) for d in days]
+    if slot_format == "uuid":
+        raw = rng.integers(0, 256, size=(n, 16), dtype=np.uint8)
+        return [str(uuid.UUID(bytes=row.tobytes())) for row in raw]
+    words = [WORDS[i] for i in rng.integers(0, len(WORDS), size=n)]
+    if slot_format in ("uri", "url"):
+        return [f"http://{w}.local/{w}" for w in words]
+    if slot_format == "email":
+        return [f"{w}@example.com" for w in words]
+    return words
+
+
+def _slot_pool(rng: np.random.Generator, slot: dict, n: int) -> list:
+    """
+    Draw n values for a slot, including arrays (1 to 5 items of the item type).
+    """
+    if slot["type"] == "array":
+        lengths = rng.integers(1, 6, size=n)
+        total = int(lengths.sum())
+        items = [{} for _ in range(total)] if slot.get("items") == "object" else \
+            _scalar_pool(rng, slot.get("items"), None, None, total)
+        bounds = np.concatenate(([0], np.cumsum(lengths)))
+        return [items[bounds[i]:bounds[i + 1]] for i in range(n)]
+    if slot["type"] == "object":
+        return [{} for _ in range(n)]
+    return _scalar_pool(rng, slot["type"], slot.get("format"), slot.get("enum"), n)
+
+
+def _format_value(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+def build_requests(template: dict, seed: int, n: int) -> tuple[List[bytes], List[bytes]]:
+    """
+    Generate n request variants (URL and JSON body) for one catalog template.
+    Values are drawn per slot in bulk from a generator seeded by (seed, endpoint), and the body is serialized
+    canonically, so the same seed always yields byte-identical requests.
+    Args:
+        template (dict): Catalog template.
+        seed (int): Corpus seed.
+        n (int): Number of variants.
+    Returns:
+        tuple: URLs (path and query, percent-encoded) and JSON bodies (empty for methods without a body).
+    """
+    rng = _endpoint_rng(seed, endpoint_key(template))
+    path_values = {slot["name"]: _slot_pool(rng, slot, n) for slot in template["path_slots"]}
+    query_values = {slot["name"]: _slot_pool(rng, slot, n) for slot in template["query_slots"]}
+    body_values = {slot["name"]: _slot_pool(rng, slot, n) for slot in template["body_slots"]}
+    with_body = template["method"] in ("POST", "PUT")
+
+    urls, bodies = [], []
+    for i in range(n):
+        path = template["path"]
+        for name, values in path_values.items():
+            value = values[i]
+            value = ",".join(map(_format_value, value)) if isinstance(value, list) else _format_value(value)
+            path = path.replace(f"{{{name}}}", urllib.parse.quote(value, safe=""))
+        query = []
+        for name, values in query_values.items():
+            value = values[i]
+            for item in (value if isinstance(value, list) else [value]):
+                query.append((name, _format_value(item)))
+        url = path + ("?" + urllib.parse.urlencode(query) if query else "")
+        urls.append(url.encode())
+        if with_body:
+            body = {name: values[i] for name, values in body_values.items()}
+            bodies.append(json.dumps(body, sort_keys=True, separators=(",", ":")).encode())
+        else:
+            bodies.append(b"")
+    return urls, bodies
+
+
+def _pack(chunks: List[bytes]) -> tuple[np.ndarray, np.ndarray]:
+    offsets = np.zeros(len(chunks) + 1, dtype=np.int64)
+    np.cumsum([len(c) for c in chunks], out=offsets[1:])
+    return np.frombuffer(b"".join(chunks), dtype=np.uint8), offsets
+
+
+def build_corpus(templates: List[dict], corpus_dir: str = CORPUS_DIR, seed: int = CORPUS_SEED,
+                 variants: int = CORPUS_VARIANTS) -> None:
+    """
+    Pre-generate payload variants for every catalog template and write them to a corpus directory.
+    Args:
+        templates (List[dict]): Catalog templates.
+        corpus_dir (str): Output directory.
+        seed (int): Corpus seed.
+        variants (int): Variants per endpoint.
+    """
+    keys, urls, bodies = [], [], []
+    for template in templates:
+        keys.append(endpoint_key(template))
+        u, b = build_requests(template, seed, variants)
+        urls.extend(u)
+        bodies.extend(b)
+    url_blob, url_offsets = _pack(urls)
+    body_blob, body_offsets = _pack(bodies)
+    arrays = {
+        "keys": np.array(keys),
+        "variant_offsets": np.arange(len(keys) + 1, dtype=np.int64) * variants,
+        "url_blob": url_blob, "url_offsets": url_offsets,
+        "body_blob": body_blob, "body_offsets": body_offsets,
+    }
+    os.makedirs(corpus_dir, exist_ok=True)
+    for name in CORPUS_ARRAYS:
+        np.save(os.path.join(corpus_dir, f"{name}.npy"), arrays[name])
+    meta = {"version": CORPUS_VERSION, "seed": seed, "variants": variants, "catalog": catalog_hash(templates)}
+    with open(os.path.join(corpus_dir, "meta.json"), "w") as f:
+        json.dump(meta, f)
+
+
+class PayloadCorpus:
+    """
+    Read-only view over a corpus directory. Arrays are memory-mapped on first use, so opening a corpus is
+    cheap and only the pages of requested variants are read.
+    """
+
+    def __init__(self, corpus_dir: str = CORPUS_DIR):
+        self.corpus_dir = corpus_dir
+        with open(os.path.join(corpus_dir, "meta.json")) as f:
+            self.meta = json.load(f)
+        self._arrays = {}
+        self._index = None
+
+    def _array(self, name: str) -> np.ndarray:
+        if name not in self._arrays:
+            self._arrays[name] = np.load(os.path.join(self.corpus_dir, f"{name}.npy"), mmap_mode="r")
+        return self._arrays[name]
+
+    def _row(self, key: str, variant: int) -> int:
+        if self._index is None:
+            self._index = {k: i for i, k in enumerate(self._array("keys").tolist())}
+        start, end = self._array("variant_offsets")[self._index[key]:self._index[key] + 2]
+        return int(start + variant % (end - start))
+
+    def _slice(self, name: str, row: int) -> bytes:
+        offsets = self._array(f"{name}_offsets")
+        return self._array(f"{name}_blob")[offsets[row]:offsets[row + 1]].tobytes()
+
+    def request(self, template: dict, variant: int = 0) -> tuple[str, bytes]:
+        """
+        URL and JSON body of one variant of an endpoint (the variant index wraps around).
+        Args:
+            template (dict): Catalog template.
+            variant (int): Variant index.
+        Returns:
+            tuple: URL (path and query) and body bytes.
+        """
+        row = self._row(endpoint_key(template), variant)
+        return self._slice("url", row).decode(), self._slice("body", row)
+
+
+def load_corpus(templates: List[dict], corpus_dir: str = CORPUS_DIR, seed: int = CORPUS_SEED,
+                variants: int = CORPUS_VARIANTS) -> PayloadCorpus:
+    """
+    Open the corpus for a catalog, rebuilding it first if the seed, size or catalog changed.
+    Args:
+        templates (List[dict]): Catalog templates.
+        corpus_dir (str): Corpus directory.
+        seed (int): Corpus seed.
+        variants (int): Variants per endpoint.
+    Returns:
+        PayloadCorpus: The opened corpus.
+    """
+    expected = {"version": CORPUS_VERSION, "seed": seed, "variants": variants, "catalog": catalog_hash(templates)}
+    try:
+        corpus = PayloadCorpus(corpus_dir)
+        if corpus.meta == expected:
+            return corpus
+    except (OSError, ValueError):
+        pass
+    build_corpus(templates, corpus_dir, seed, variants)
+    return PayloadCorpus(corpus_dir)
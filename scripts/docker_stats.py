@@ -0,0 +1,252 @@
+import http.client
+import json
+import queue
+import socket
+import threading
+import time
+from typing import Dict, List
+import numpy as np
+
+DOCKER_SOCKET = "/var/run/docker.sock"
+RING_CAPACITY = 4096  # samples per container; Docker emits one per second
+
+# Values kept for every stats message
+STATS_FIELDS = ("cpu_percent", "memory_usage", "memory_limit", "net_rx", "net_tx", "blk_read", "blk_write")
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    HTTP connection over a unix domain socket, as used by the Docker Engine API.
+    """
+
+    def __init__(self, socket_path: str, timeout: float = None):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+        self.raw_sock = None
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        # Kept after http.client hands the socket over to a streaming response, so it can be shut down
+        self.raw_sock = sock
+        self.sock = sock
+
+
+class DockerClient:
+    """
+    Minimal Docker Engine API client with a pool of keep-alive connections.
+    """
+
+    def __init__(self, socket_path: str = DOCKER_SOCKET, pool_size: int = 4, timeout: float = 10.0):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._pool = queue.LifoQueue(maxsize=pool_size)
+
+    def _acquire(self) -> UnixHTTPConnection:
+        try:
+            return self._pool.get_nowait()
+        except queue.Empty:
+            return UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+
+    def _release(self, conn: UnixHTTPConnection) -> None:
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def get_json(self, path: str):
+        """
+        Send a GET request on a pooled connection and decode the JSON response.
+        Args:
+            path (str): API path, e.g. "/containers/json".
+        Returns:
+            The decoded response body.
+        """
+        conn = self._acquire()
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            body = response.read()
+        except (OSError, http.client.HTTPException):
+            conn.close()
+            raise
+        self._release(conn)
+        if response.status != 200:
+            raise http.client.HTTPException(f"GET {path} returned {response.status}")
+        return json.loads(body)
+
+    def list_containers(self) -> Dict[str, str]:
+        """
+        Map the names of running containers to their ids.
+        """
+        return {c["Names"][0].lstrip("/"): c["Id"] for c in self.get_json("/containers/json")}
+
+    def open_stats_stream(self, container_id: str) -> tuple[UnixHTTPConnection, http.client.HTTPResponse]:
+        """
+        Open the streaming stats endpoint of a container on a dedicated connection.
+        The response yields one JSON document per line until the connection is closed.
+        """
+        conn = UnixHTTPConnection(self.socket_path, timeout=None)
+        conn.request("GET", f"/containers/{container_id}/stats?stream=true")
+        response = conn.getresponse()
+        if response.status != 200:
+            conn.close()
+            raise http.client.HTTPException(f"stats stream for {container_id} returned {response.status}")
+        return conn, response
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
+
+
+def parse_stats(stats: dict) -> List[float]:
+    """
+    Reduce one Docker stats document to the values in STATS_FIELDS.
+    CPU percent is computed from the cpu/precpu deltas the same way `docker stats` does.
+    Args:
+        stats (dict): Decoded stats message.
+    Returns:
+        List[float]: Values ordered as STATS_FIELDS.
+    """
+    cpu = stats.get("cpu_stats", {})
+    precpu = stats.get("precpu_stats", {})
+    cpu_delta = cpu.get("cpu_usage", {}).get("total_usage", 0) - precpu.get("cpu_usage", {}).get("total_usage", 0)
+    system_delta = cpu.get("system_cpu_usage", 0) - precpu.get("system_cpu_usage", 0)
+    online_cpus = cpu.get("online_cpus") or len(cpu.get("cpu_usage", {}).get("percpu_usage") or [1])
+    cpu_percent = (cpu_delta / system_delta) * online_cpus * 100.0 if system_delta > 0 and cpu_delta > 0 else 0.0
+
+    memory = stats.get("memory_stats", {})
+    net_rx = net_tx = 0
+    for interface in (stats.get("networks") or {}).values():
+        net_rx += interface.get("rx_bytes", 0)
+        net_tx += interface.get("tx_bytes", 0)
+    blk_read = blk_write = 0
+    for entry in (stats.get("blkio_stats", {}).get("io_service_bytes_recursive") or []):
+        op = entry.get("op", "").lower()
+        if op == "read":
+            blk_read += entry.get("value", 0)
+        elif op == "write":
+            blk_write += entry.get("value", 0)
+
+    return [cpu_percent, memory.get("usage", 0), memory.get("limit", 0), net_rx, net_tx, blk_read, blk_write]
+
+
+class DockerStatsCollector:
+    """
+    Persistent collector of Docker container stats.
+    One thread per container consumes the streaming stats endpoint and appends every message to a
+    per-container ring buffer, so any time window (e.g. one ab test) can be read back afterwards.
+    """
+
+    def __init__(self, names: List[str] = None, socket_path: str = DOCKER_SOCKET, capacity: int = RING_CAPACITY):
+        """
+        Args:
+            names (List[str]): Containers to follow; None follows every running container.
+            socket_path (str): Docker Engine API socket (a fake server's socket works as well).
+            capacity (int): Number of samples kept per container.
+        """
+        self.names = names
+        self.client = DockerClient(socket_path)
+        self.capacity = capacity
+        self.containers = []
+        self.timestamps = {}
+        self.samples = {}
+        self.counts = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+        self._connections = []
+
+    def start(self) -> "DockerStatsCollector":
+        """
+        Look up the containers and start streaming their stats.
+        """
+        running = self.client.list_containers()
+        self.containers = [n for n in (self.names or running) if n in running]
+        for name in self.containers:
+            self.timestamps[name] = np.zeros(self.capacity, dtype=np.float64)
+            self.samples[name] = np.zeros((self.capacity, len(STATS_FIELDS)), dtype=np.float64)
+            self.counts[name] = 0
+            thread = threading.Thread(target=self._follow, args=(name, running[name]), name=f"docker-stats-{name}",
+                                      daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def _follow(self, name: str, container_id: str) -> None:
+        try:
+            conn, response = self.client.open_stats_stream(container_id)
+        except (OSError, http.client.HTTPException) as e:
+            print(f"[Error] Cannot stream stats for {name}: {e}")
+            return
+        with self._lock:
+            self._connections.append(conn)
+        try:
+            while not self._stop.is_set():
+                line = response.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                values = parse_stats(json.loads(line))
+                with self._lock:
+                    slot = self.counts[name] % self.capacity
+                    self.timestamps[name][slot] = time.time()
+                    self.samples[name][slot] = values
+                    self.counts[name] += 1
+        except (OSError, ValueError, http.client.HTTPException):
+            # Raised when stop() closes the connection underneath readline()
+            pass
+        finally:
+            conn.close()
+
+    def stop(self) -> None:
+        """
+        Close every stream and wait for the reader threads.
+        """
+        self._stop.set()
+        with self._lock:
+            for conn in self._connections:
+                if conn.raw_sock is not None:
+                    try:
+                        conn.raw_sock.shutdown(socket.SHUT_RDWR)
+                    except OSError:
+                        pass
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        self.client.close()
+
+    def window(self, start: float, end: float) -> Dict[str, tuple[np.ndarray, np.ndarray]]:
+        """
+        Per-container samples received between two wall-clock timestamps.
+        Args:
+            start (float): Window start (time.time() seconds).
+            end (float): Window end (time.time() seconds).
+        Returns:
+            Dict[str, tuple]: Container name to (timestamps, samples) with samples ordered as STATS_FIELDS.
+        """
+        result = {}
+        with self._lock:
+            for name in self.containers:
+                count = self.counts[name]
+                n = min(count, self.capacity)
+                order = np.arange(count - n, count) % self.capacity
+                timestamps = self.timestamps[name][order]
+                samples = self.samples[name][order]
+                mask = (timestamps >= start) & (timestamps <= end)
+                result[name] = (timestamps[mask], samples[mask])
+        return result
+
+    def latest(self) -> Dict[str, np.ndarray]:
+        """
+        Most recent sample of every container that has reported at least once.
+        """
+        with self._lock:
+            return {name: self.samples[name][(self.counts[name] - 1) % self.capacity].copy()
+                    for name in self.containers if self.counts[name]}
@@ -0,0 +1,306 @@
+import contextlib
+import csv
+import fcntl
+import glob
+import json
+import os
+import urllib.parse
+from typing import Dict, List
+import numpy as np
+
+ENDPOINT_TABLE = "./results/endpoint_ids.json"
+UNKNOWN = 0  # id of rows that match no template
+ID_COLUMNS = ["Endpoint Id", "Endpoint"]
+
+
+class RouteTrie:
+    """
+    Path-segment trie over catalog templates.
+    Matching walks one node per segment, preferring a literal segment over a "{param}" segment and
+    backtracking only when the literal branch dead-ends, so the cost depends on the path depth rather than
+    the number of templates.
+    """
+
+    def __init__(self, templates: List[dict] = None):
+        self.root = self._node()
+        for template in templates or []:
+            self.add(template["method"], template["path"])
+
+    @staticmethod
+    def _node() -> dict:
+        return {"literal": {}, "param": None, "methods": {}}
+
+    @staticmethod
+    def _segments(path: str) -> List[str]:
+        path = path.strip("/")
+        return path.split("/") if path else []
+
+    def add(self, method: str, path: str) -> None:
+        node = self.root
+        for segment in self._segments(path):
+            if segment.startswith("{") and segment.endswith("}"):
+                if node["param"] is None:
+                    node["param"] = self._node()
+                node = node["param"]
+            else:
+                node = node["literal"].setdefault(segment, self._node())
+        # Templates differing only in parameter names share a node; each method keeps its own spelling
+        node["methods"].setdefault(method, path)
+
+    def match(self, path: str, method: str = None) -> str:
+        """
+        Template of a concrete path (without query), or None.
+        Args:
+            path (str): Request path.
+            method (str): Only match templates declared for this method (None accepts any).
+        """
+        segments = self._segments(path)
+        stack = [(self.root, 0)]
+        while stack:
+            node, depth = stack.pop()
+            if depth == len(segments):
+                if method is None and node["methods"]:
+                    return next(iter(node["methods"].values()))
+                if method in node["methods"]:
+                    return node["methods"][method]
+                continue
+            # Pushed last, popped first: the literal branch is tried before the parameter branch
+            if node["param"] is not None:
+                stack.append((node["param"], depth + 1))
+            child = node["literal"].get(segments[depth])
+            if child is not None:
+                stack.append((child, depth + 1))
+        return None
+
+
+@contextlib.contextmanager
+def _locked(path: str):
+    """
+    Hold an exclusive lock on the sidecar "<path>.lock" (released when the block exits).
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _read_keys(path: str) -> List[str]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return []
+
+
+class EndpointIndex:
+    """
+    Interned "METHOD template" keys with small, stable integer ids (persisted, so ids agree across runs).
+    Rows whose method is unknown (converted CSVs) use the key "* template".
+    The persisted table is append-only: a loaded index assigns a new id under a file lock, after adopting the
+    keys other processes appended since, and writes it out at once. Concurrent runs therefore never hand out
+    the same id for different keys, and ids already stamped on stored results stay valid.
+    """
+
+    def __init__(self, keys: List[str] = None, path: str = None):
+        """
+        Args:
+            keys (List[str]): Keys of ids 1, 2, ...
+            path (str): Persisted table new keys are appended to (None keeps the index in memory).
+        """
+        self.keys = [""] + list(keys or [])
+        self.ids = {key: i for i, key in enumerate(self.keys)}
+        self.path = path
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def intern(self, key: str) -> int:
+        """
+        Id of a key, assigning the next id to a new one ("" is UNKNOWN).
+        """
+        endpoint_id = self.ids.get(key)
+        if endpoint_id is None and self.path is not None:
+            with _locked(self.path):
+                self._merge(_read_keys(self.path), self.path)
+                endpoint_id = self.ids.get(key)
+                if endpoint_id is None:
+                    endpoint_id = self._append(key)
+                    self._write(self.path)
+        elif endpoint_id is None:
+            endpoint_id = self._append(key)
+        return endpoint_id
+
+    def key(self, endpoint_id: int) -> str:
+        return self.keys[endpoint_id]
+
+    def _append(self, key: str) -> int:
+        endpoint_id = self.ids[key] = len(self.keys)
+        self.keys.append(key)
+        return endpoint_id
+
+    def _merge(self, stored: List[str], path: str) -> None:
+        """
+        Adopt the keys appended to a persisted table; it must agree with this index on their common ids.
+        """
+        common = min(len(stored), len(self.keys) - 1)
+        if stored[:common] != self.keys[1:common + 1]:
+            raise ValueError(f"{path} assigns different endpoint ids than this index; it was not only appended to")
+        for key in stored[common:]:
+            self._append(key)
+
+    def _write(self, path: str) -> None:
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.keys[1:], f, indent=1)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path: str = ENDPOINT_TABLE, persist: bool = True) -> "EndpointIndex":
+        """
+        Args:
+            path (str): Persisted table.
+            persist (bool): Append new keys to the table (False keeps them in memory, e.g. for analysis).
+        """
+        return cls(_read_keys(path), path if persist else None)
+
+    def save(self, path: str = None) -> None:
+        """
+        Write the table, merged with the keys other processes appended to it in the meantime.
+        Args:
+            path (str): Table file (default: the one the index was loaded from, else ENDPOINT_TABLE).
+        """
+        path = path or self.path or ENDPOINT_TABLE
+        with _locked(path):
+            self._merge(_read_keys(path), path)
+            self._write(path)
+
+    def resolve(self, method: str, endpoint: str, url: str, trie: RouteTrie = None) -> int:
+        """
+        Id of one result: its recorded template if there is one, else the template its URL matches.
+        """
+        if endpoint:
+            return self.intern(f"{method or '*'} {endpoint}")
+        if trie is None:
+            return UNKNOWN
+        template = trie.match(urllib.parse.urlsplit(url).path)
+        return self.intern(f"* {template}") if template else UNKNOWN
+
+
+def endpoint_ids(columns: Dict[str, np.ndarray], index: EndpointIndex, trie: RouteTrie = None) -> np.ndarray:
+    """
+    Endpoint id of every loaded result row. Stored ids are used as they are; rows stored without one are
+    resolved (and interned) once per distinct (method, endpoint, url).
+    Args:
+        columns (Dict[str, np.ndarray]): Columns from results_store.load_results.
+        index (EndpointIndex): Key table the stored ids were interned in.
+        trie (RouteTrie): Matcher for rows that only have a URL.
+    Returns:
+        np.ndarray: int32 id per row.
+    """
+    ids = columns["endpoint_id"].astype(np.int32)
+    missing = np.flatnonzero(ids == UNKNOWN)
+    if missing.size:
+        triples = np.stack((columns["method"][missing], columns["endpoint"][missing], columns["url"][missing]),
+                           axis=1).astype(str)
+        unique, inverse = np.unique(triples, axis=0, return_inverse=True)
+        resolved = np.array([index.resolve(m, e, u, trie) for m, e, u in unique.tolist()], dtype=np.int32)
+        ids[missing] = resolved[inverse.ravel()]
+    return ids
+
+
+class RunIndex:
+    """
+    run -> endpoint -> result rows over loaded results, with the rows of every (run, endpoint) pair and of
+    every endpoint stored contiguously, so lookups are one dict access and group-bys are slices.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], ids: np.ndarray):
+        """
+        Args:
+            columns (Dict[str, np.ndarray]): Columns from results_store.load_results.
+            ids (np.ndarray): Endpoint id per row (endpoint_ids).
+        """
+        self.columns = columns
+        self.endpoint_ids = ids
+        self.run_names, runs = np.unique(columns["run_id"], return_inverse=True)
+        self.run_ids = {name: i for i, name in enumerate(self.run_names.tolist())}
+        self.order = np.lexsort((ids, runs))
+        pair = runs[self.order].astype(np.int64) << 32 | ids[self.order]
+        heads = np.flatnonzero(np.concatenate(([True], pair[1:] != pair[:-1], [True])))
+        self.pairs = {(int(pair[lo] >> 32), int(pair[lo] & 0xFFFFFFFF)): (int(lo), int(hi))
+                      for lo, hi in zip(heads[:-1], heads[1:])}
+        self.endpoint_order = np.argsort(ids, kind="stable")
+        self.endpoint_offsets = np.searchsorted(ids[self.endpoint_order], np.arange(int(ids.max(initial=0)) + 2))
+
+    def rows(self, run_id: str, endpoint_id: int) -> np.ndarray:
+        """
+        Rows of one endpoint in one run.
+        """
+        lo, hi = self.pairs.get((self.run_ids.get(run_id, -1), endpoint_id), (0, 0))
+        return self.order[lo:hi]
+
+    def endpoint_rows(self, endpoint_id: int) -> np.ndarray:
+        """
+        Rows of one endpoint across all runs.
+        """
+        if endpoint_id + 1 >= len(self.endpoint_offsets):
+            return self.endpoint_order[:0]
+        return self.endpoint_order[self.endpoint_offsets[endpoint_id]:self.endpoint_offsets[endpoint_id + 1]]
+
+    def endpoints(self, run_id: str) -> List[int]:
+        """
+        Endpoint ids present in one run.
+        """
+        run = self.run_ids.get(run_id, -1)
+        return [endpoint for r, endpoint in self.pairs if r == run]
+
+    def latencies(self, rows: np.ndarray) -> np.ndarray:
+        """
+        Per-request latencies of a set of rows, concatenated.
+        """
+        offsets = self.columns["offsets"]
+        if not len(rows):
+            return self.columns["latency"][:0]
+        return np.concatenate([self.columns["latency"][offsets[r]:offsets[r + 1]] for r in rows])
+
+
+def backfill_csv(csv_path: str, index: EndpointIndex, trie: RouteTrie) -> int:
+    """
+    Add (or refresh) the "Endpoint Id" and "Endpoint" columns of a results CSV in place.
+    Rows are first padded to the full results_store.CSV_HEADER width so that positional readers
+    (convert_csv) keep working on the older, shorter files.
+    Returns:
+        int: Number of rows matched to a template.
+    """
+    from results_store import CSV_HEADER
+
+    width = len(CSV_HEADER) - len(ID_COLUMNS)
+    with open(csv_path, newline='') as f:
+        rows = [row for row in csv.reader(f) if row]
+    if not rows:
+        return 0
+    header, body = rows[0][:width], rows[1:]
+    header += CSV_HEADER[len(header):width]
+    matched = 0
+    output = [header + ID_COLUMNS]
+    for row in body:
+        row = (row + [""] * width)[:width]
+        endpoint_id = index.resolve(None, None, row[0], trie)
+        matched += endpoint_id != UNKNOWN
+        output.append(row + [endpoint_id, index.key(endpoint_id)])
+    tmp_path = csv_path + ".tmp"
+    with open(tmp_path, "w", newline='') as f:
+        csv.writer(f, lineterminator="\n").writerows(output)
+    os.replace(tmp_path, csv_path)
+    return matched
+
+
+if __name__ == "__main__":
+    from catalog import load_catalog
+
+    table = EndpointIndex.load()
+    route_trie = RouteTrie(load_catalog())
+    for path in sorted(glob.glob("./results/*.csv") + glob.glob("./spring/Documents/*_response_time.csv")):
+        print(f"Backfilled {path}: {backfill_csv(path, table, route_trie)} rows matched")
+    table.save()
+    print(f"{len(table) - 1} endpoint keys in {ENDPOINT_TABLE}")
@@ -0,0 +1,313 @@
+import csv
+import hashlib
+import itertools
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+import psutil
+from helper import execute_ab_request
+from cgroup_sampler import CgroupSampler, compose_container_names, docker_cgroup_dirs
+from harness_profile import HarnessProfiler, OVERHEAD_THRESHOLD, stage
+from results_store import ResultsWriter, CSV_HEADER, new_run_id
+from catalog import load_catalog
+from corpus import load_corpus, catalog_hash
+from endpoint_index import EndpointIndex
+from attackScenarioOwn import send_ab_requests_from_api_spec as send_attack_requests
+
+HOST = "http://localhost:9393"
+MICROSERVICE = "spring"  # directory of the spec, corpus and compose file
+CORPUS_SEED = 1234
+CORPUS_VARIANTS = 16
+MATRIX_DIR = "./results/matrix"
+CELL_VERSION = 2  # bump when the way a cell is measured changes, so cached cells are re-run
+DEBUG = True
+PROFILE = False  # also dump a cProfile of the harness of every cell next to it
+
+# Default sweep; every combination of values is one cell. Parameters left out take CELL_DEFAULTS.
+GRID = {
+    "scenario": ["benign", "attack"],
+    "n_requests": [1000, 7000],
+    "n_concurrency": [20, 100],
+}
+# benign: endpoints one at a time; attack: max_api endpoints at once, as in attackScenarioOwn
+SCENARIOS = ("benign", "attack")
+CELL_DEFAULTS = {
+    "scenario": "benign",
+    "n_requests": 7000,
+    "n_concurrency": 20,
+    "bottleneck_threshold": 500,  # milliseconds
+    "max_api": 30,  # endpoints measured per cell (first ones of the catalog), all in parallel for "attack"
+    "client": "ab",
+    "corpus_variant": 0,
+}
+
+# CPU isolation: the highest cores go to the monitors, the ones below them to the load generator, and the
+# rest stay with the system under test
+MONITOR_CPUS = 1
+HARNESS_CPUS = 2
+PIN_CONTAINERS = False  # also restrict the compose containers to the remaining cores (docker update --cpuset-cpus)
+MONITOR_PROCESSES = ("tcpdump", "sysdig", "suricata", "snort")  # external monitors pinned when running
+GAP_SECONDS = 2.0  # idle time between two measurement windows, so one endpoint's tail does not leak into the next
+
+
+def expand_grid(grid: Dict[str, list], defaults: Dict[str, object] = CELL_DEFAULTS) -> List[dict]:
+    """
+    All cells of a parameter grid, in a stable order (the grid's key order, last key varying fastest).
+    """
+    unknown = set(grid) - set(defaults)
+    if unknown:
+        raise ValueError(f"unknown grid parameters: {', '.join(sorted(unknown))}")
+    scenarios = set(grid.get("scenario", [defaults["scenario"]])) - set(SCENARIOS)
+    if scenarios:
+        raise ValueError(f"unknown scenarios: {', '.join(sorted(map(str, scenarios)))} "
+                         f"(known: {', '.join(SCENARIOS)})")
+    keys = list(grid)
+    return [{**defaults, **dict(zip(keys, values))} for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def load_grid(path: str) -> Dict[str, list]:
+    """
+    Read a grid from a JSON file ({"parameter": [values...]}); scalars are treated as one-value lists.
+    """
+    with open(path) as f:
+        grid = json.load(f)
+    return {key: value if isinstance(value, list) else [value] for key, value in grid.items()}
+
+
+def config_hash(config: dict, catalog: str, host: str, compose_dir: str) -> str:
+    """
+    Cache key of one cell: its parameters, the catalog it runs over, the system under test (host and compose
+    directory) and the cell version.
+    """
+    payload = json.dumps({"config": config, "catalog": catalog, "host": host, "compose_dir": compose_dir,
+                          "version": CELL_VERSION}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()[:16]
+
+
+def _write_json(path: str, data: dict) -> None:
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp_path, path)
+
+
+def _read_json(path: str) -> dict:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def split_cpus(cpus: List[int] = None, monitor_cpus: int = MONITOR_CPUS,
+               harness_cpus: int = HARNESS_CPUS) -> Dict[str, List[int]]:
+    """
+    Partition the usable CPUs into system-under-test, harness and monitor sets.
+    Returns:
+        Dict[str, List[int]]: "sut", "harness" and "monitor" CPU lists; empty when there are too few cores to
+        isolate anything (everything then shares all cores).
+    """
+    cpus = sorted(cpus if cpus is not None else os.sched_getaffinity(0))
+    if len(cpus) < monitor_cpus + harness_cpus + 1:
+        return {"sut": [], "harness": [], "monitor": []}
+    return {
+        "sut": cpus[:-(monitor_cpus + harness_cpus)],
+        "harness": cpus[-(monitor_cpus + harness_cpus):-monitor_cpus],
+        "monitor": cpus[-monitor_cpus:],
+    }
+
+
+def pin_monitors(cpus: List[int], names: tuple = MONITOR_PROCESSES) -> List[int]:
+    """
+    Move running monitor processes (and all their threads) onto the monitor CPUs.
+    Returns:
+        List[int]: Pids that were pinned.
+    """
+    pinned = []
+    for process in psutil.process_iter(["name"]):
+        if process.info["name"] in names:
+            try:
+                process.cpu_affinity(cpus)
+                pinned.append(process.pid)
+            except (psutil.NoSuchProcess, psutil.AccessDenied):
+                pass
+    return pinned
+
+
+def pin_containers(names: List[str], cpus: List[int]) -> bool:
+    """
+    Restrict compose containers to the system-under-test CPUs.
+    """
+    try:
+        subprocess.run(["docker", "update", "--cpuset-cpus", ",".join(map(str, cpus)), *names],
+                       check=True, capture_output=True)
+        return True
+    except (OSError, subprocess.CalledProcessError) as e:
+        print(f"[Error] Cannot pin containers: {e}")
+        return False
+
+
+class ExperimentMatrix:
+    """
+    Resumable sweep over a parameter grid.
+    Cells run one after another, GAP_SECONDS apart. The scenario decides the workload: in a benign cell endpoints
+    are measured one at a time with GAP_SECONDS of idle time in between, so no two measurement windows overlap; an
+    attack cell hits all its endpoints in parallel (attackScenarioOwn's workload) as one window. The load generator
+    (this process and the ab children it spawns) runs on the harness CPUs, the cgroup sampler thread and
+    external monitors on the monitor CPUs. Every cell keeps a cell.json under MATRIX_DIR/<config hash>; cells marked done are skipped, so an
+    interrupted sweep continues with the first unfinished cell.
+    """
+
+    def __init__(self, grid: Dict[str, list] = GRID, matrix_dir: str = MATRIX_DIR, host: str = HOST,
+                 verbose: bool = DEBUG, defaults: Dict[str, object] = None, microservice: str = MICROSERVICE,
+                 profile: bool = PROFILE, overhead_threshold: float = OVERHEAD_THRESHOLD):
+        """
+        Args:
+            grid (Dict[str, list]): Parameter name to the values swept (see CELL_DEFAULTS for the names).
+            matrix_dir (str): Cache directory of the cells.
+            host (str): Base URL of the system under test.
+            verbose (bool): Print progress.
+            defaults (Dict[str, object]): Overrides of CELL_DEFAULTS for the parameters the grid does not sweep.
+            microservice (str): Directory of the spec, corpus and compose file.
+            profile (bool): Also cProfile the harness of every cell.
+            overhead_threshold (float): Harness CPU share of all cores above which a cell is flagged.
+        """
+        defaults = defaults or {}
+        unknown = set(defaults) - set(CELL_DEFAULTS)
+        if unknown:
+            raise ValueError(f"unknown cell parameters: {', '.join(sorted(unknown))}")
+        self.host = host
+        self.verbose = verbose
+        self.matrix_dir = matrix_dir
+        self.profile = profile
+        self.overhead_threshold = overhead_threshold
+        documents = f"./{microservice}/Documents"
+        self.compose_dir = f"./{microservice}/ComposeFile"
+        self.templates = load_catalog(f"{documents}/scdf_endpoints.json", f"{documents}/scdf_catalog.pickle")
+        self.corpus = load_corpus(self.templates, f"{documents}/corpus", CORPUS_SEED, CORPUS_VARIANTS)
+        catalog = catalog_hash(self.templates)
+        self.cells = [(config_hash(config, catalog, host, self.compose_dir), config)
+                      for config in expand_grid(grid, {**CELL_DEFAULTS, **defaults})]
+        self.cpus = split_cpus()
+
+    def cell_dir(self, key: str) -> str:
+        return os.path.join(self.matrix_dir, key)
+
+    def status(self) -> Dict[str, str]:
+        """
+        State of every cell: "done", "interrupted" (started but never finished) or "pending".
+        """
+        states = {}
+        for key, _ in self.cells:
+            state = _read_json(os.path.join(self.cell_dir(key), "cell.json")).get("status")
+            states[key] = "done" if state == "done" else "interrupted" if state == "running" else "pending"
+        return states
+
+    def _isolate(self, containers: List[str]) -> None:
+        if not self.cpus["harness"]:
+            print("[Error] Too few CPUs to isolate the harness from the monitors; running unpinned")
+            return
+        # Children (ab) inherit the affinity of this process
+        os.sched_setaffinity(0, self.cpus["harness"])
+        pinned = pin_monitors(self.cpus["monitor"])
+        if PIN_CONTAINERS:
+            pin_containers(containers, self.cpus["sut"])
+        if self.verbose:
+            print(f"[Verbose] CPUs: {self.cpus}, monitor pids pinned: {pinned}")
+
+    def _measure_each(self, templates: List[dict], config: dict, cell: dict, results_file: str, store: ResultsWriter,
+                      sampler: CgroupSampler) -> None:
+        """
+        Benign workload: one endpoint at a time, each in its own window, GAP_SECONDS apart.
+        """
+        for template in templates:
+            if cell["windows"]:
+                time.sleep(GAP_SECONDS)
+            with stage("generate"):
+                url, body_params = self.corpus.request(template, config["corpus_variant"])
+            started = time.time()
+            execute_ab_request(host=self.host, url=url, body_params=body_params, method=template["method"],
+                               csv_file=results_file, n_requests=config["n_requests"],
+                               n_concurrency=config["n_concurrency"],
+                               bottleneck_threshold=config["bottleneck_threshold"], sampler=sampler,
+                               store=store, endpoint=template["path"], client=config["client"])
+            cell["windows"].append([started, time.time()])
+
+    def run_cell(self, key: str, config: dict) -> dict:
+        """
+        Measure one cell and mark it done.
+        Returns:
+            dict: The cell record written to cell.json.
+        """
+        cell_dir = self.cell_dir(key)
+        os.makedirs(cell_dir, exist_ok=True)
+        cell_file = os.path.join(cell_dir, "cell.json")
+        previous = _read_json(cell_file)
+        # Rows of an interrupted attempt stay in the store under their run id; they are listed, not reused
+        abandoned = previous.get("abandoned", []) + ([previous["run_id"]] if previous.get("run_id") else [])
+        run_id = new_run_id(f"matrix-{key[:8]}")
+        cell = {"key": key, "config": config, "status": "running", "run_id": run_id, "abandoned": abandoned,
+                "cpus": self.cpus, "started": time.time(), "windows": []}
+        _write_json(cell_file, cell)
+
+        results_file = os.path.join(cell_dir, "results.csv")
+        with open(results_file, mode='w', newline='') as file:
+            csv.writer(file).writerow(CSV_HEADER)
+        store = ResultsWriter(run_id, config["scenario"], csv_file=results_file, endpoint_index=EndpointIndex.load())
+        sampler = CgroupSampler(docker_cgroup_dirs(compose_container_names(self.compose_dir))).start()
+        if self.cpus["monitor"]:
+            sampler.pin(self.cpus["monitor"])
+        # The harness's own footprint lands next to the cell, so an overloaded harness CPU shows up per cell
+        profiler = HarnessProfiler(run_id, self.profile, self.overhead_threshold, harness_dir=cell_dir).start()
+        templates = self.templates[:config["max_api"]]
+        try:
+            if config["scenario"] == "attack":
+                started = time.time()
+                send_attack_requests(templates, self.corpus, self.host, results_file, store, sampler,
+                                     config["n_requests"], config["n_concurrency"], config["bottleneck_threshold"],
+                                     config["client"], self.verbose, max_workers=max(1, len(templates)),
+                                     corpus_variant=config["corpus_variant"])
+                cell["windows"].append([started, time.time()])
+            else:
+                self._measure_each(templates, config, cell, results_file, store, sampler)
+        finally:
+            sampler.stop()
+            harness = profiler.stop(sampler)
+            # Re-raises a failed results write; the cell then stays "running" and is re-measured on resume
+            store.close()
+        if harness["over_threshold"]:
+            print(profiler.summary())
+        cell.update(status="done", finished=time.time(), sampler_overhead=sampler.overhead(),
+                    harness_overhead=harness["overhead"])
+        _write_json(cell_file, cell)
+        return cell
+
+    def run(self) -> List[dict]:
+        """
+        Run every cell that is not done yet, in grid order.
+        Returns:
+            List[dict]: Records of the cells run by this call.
+        """
+        self._isolate(compose_container_names(self.compose_dir))
+        states = self.status()
+        todo = [(key, config) for key, config in self.cells if states[key] != "done"]
+        if self.verbose:
+            print(f"[Verbose] {len(self.cells) - len(todo)} of {len(self.cells)} cells cached, {len(todo)} to run")
+        finished = []
+        for i, (key, config) in enumerate(todo):
+            if i:
+                # The previous cell's last window (or attack) must not leak into this cell's first one
+                time.sleep(GAP_SECONDS)
+            if self.verbose:
+                print(f"[Verbose] Cell {i + 1}/{len(todo)} {key} ({states[key]}): {config}")
+            finished.append(self.run_cell(key, config))
+        return finished
+
+
+if __name__ == "__main__":
+    # python scripts/experiment_matrix.py [grid.json]
+    matrix = ExperimentMatrix(load_grid(sys.argv[1]) if len(sys.argv) > 1 else GRID)
+    matrix.run()
@@ -0,0 +1,341 @@
+import glob
+import json
+import os
+from typing import Dict, Iterator
+import numpy as np
+from results_store import STORE_DIR, load_results
+
+FEATURE_DIR = "./results/features"
+BIN = 0.1  # seconds per time bin
+AB_RESOLUTION = 1.0  # seconds; ab only records whole-second request starts
+WINDOW = 30.0  # seconds per feature window
+STEP = 5.0  # seconds between window starts
+MAX_LAG = 2.0  # seconds of lag searched in the CPU / tail latency cross-correlation
+THRESHOLD = 500  # ms, latency counted as tail
+CHUNK_WINDOWS = 4096  # windows transformed at once; bounds the FFT working set
+
+LABELS = {"benign": 0, "attack": 1, "bursty": 1}
+
+FEATURE_NAMES = (
+    "rate_mean",           # requests per second
+    "rate_cv",             # coefficient of variation of per-bin request counts
+    "rate_fano",           # variance / mean of per-bin counts (1 for a Poisson arrival process)
+    "latency_mean",        # ms
+    "latency_std",         # ms
+    "latency_max",         # ms
+    "tail_fraction",       # share of requests above THRESHOLD
+    "period",              # seconds, dominant period of the arrival rate
+    "spectral_peak",       # share of arrival-rate power in the dominant frequency
+    "autocorr_peak",       # highest arrival-rate autocorrelation beyond lag 1
+    "cpu_mean",            # cores
+    "cpu_tail_xcorr",      # strongest correlation between CPU use and per-bin max latency within MAX_LAG
+    "cpu_tail_lag",        # seconds by which CPU leads tail latency at that correlation
+)
+
+
+def bin_requests(start: np.ndarray, latency: np.ndarray, origin: float, n_bins: int,
+                 threshold: float = THRESHOLD, bin_width: float = BIN) -> Dict[str, np.ndarray]:
+    """
+    Reduce requests to per-bin sums, so every window statistic becomes a difference of cumulative sums.
+    Args:
+        start (np.ndarray): Request start times in epoch seconds.
+        latency (np.ndarray): Latencies in ms (NaN for failed requests, which only count as arrivals).
+        origin (float): Time of bin 0.
+        n_bins (int): Number of bins.
+        threshold (float): Tail latency threshold in ms.
+        bin_width (float): Seconds per bin.
+    Returns:
+        Dict[str, np.ndarray]: "count", "ok", "sum", "sum_sq", "tail" and "max" per bin.
+    """
+    index = np.clip(((start - origin) / bin_width).astype(np.int64), 0, n_bins - 1)
+    ok = ~np.isnan(latency)
+    lat = np.where(ok, latency, 0.0).astype(np.float64)
+    bins = {
+        "count": np.bincount(index, minlength=n_bins).astype(np.float64),
+        "ok": np.bincount(index, weights=ok, minlength=n_bins),
+        "sum": np.bincount(index, weights=lat, minlength=n_bins),
+        "sum_sq": np.bincount(index, weights=lat * lat, minlength=n_bins),
+        "tail": np.bincount(index, weights=lat > threshold, minlength=n_bins),
+        "max": np.zeros(n_bins),
+    }
+    np.maximum.at(bins["max"], index, lat)
+    return bins
+
+
+def bin_cpu(ts: np.ndarray, usage_usec: np.ndarray, origin: float, n_bins: int, bin_width: float = BIN) -> np.ndarray:
+    """
+    CPU use in cores per bin from cumulative cgroup usage counters (summed over containers beforehand).
+    Bins without a sample carry the previous rate forward.
+    """
+    if len(ts) < 2:
+        return np.zeros(n_bins)
+    rate = np.diff(usage_usec.astype(np.float64)) / 1e6 / np.maximum(np.diff(ts), 1e-9)
+    index = np.clip(((ts[1:] - origin) / bin_width).astype(np.int64), 0, n_bins - 1)
+    total = np.bincount(index, weights=rate, minlength=n_bins)
+    count = np.bincount(index, minlength=n_bins)
+    # Forward-fill empty bins with the last observed rate
+    filled = np.where(count > 0, np.arange(n_bins), 0)
+    np.maximum.accumulate(filled, out=filled)
+    return np.where(count > 0, total / np.maximum(count, 1), (total / np.maximum(count, 1))[filled])
+
+
+def _window_sums(values: np.ndarray, heads: np.ndarray, width: int) -> np.ndarray:
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    return cumulative[heads + width] - cumulative[heads]
+
+
+def _periodicity(counts: np.ndarray, bin_width: float = BIN) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Dominant period, its share of spectral power and the autocorrelation peak for every row of binned counts.
+    The autocorrelation is the inverse FFT of the zero-padded power spectrum.
+    """
+    width = counts.shape[1]
+    centered = counts - counts.mean(axis=1, keepdims=True)
+    spectrum = np.abs(np.fft.rfft(centered, axis=1)) ** 2
+    power = spectrum[:, 1:]
+    total = power.sum(axis=1)
+    peak = power.argmax(axis=1) + 1
+    with np.errstate(invalid="ignore", divide="ignore"):
+        period = np.where(total > 0, width * bin_width / peak, np.nan)
+        share = np.where(total > 0, power.max(axis=1) / total, 0.0)
+        padded = np.abs(np.fft.rfft(centered, n=2 * width, axis=1)) ** 2
+        autocorr = np.fft.irfft(padded, axis=1)[:, :width]
+        autocorr = autocorr / autocorr[:, :1]
+    autocorr_peak = np.nan_to_num(autocorr[:, 2:width // 2].max(axis=1)) if width > 4 else np.zeros(len(counts))
+    return period, share, autocorr_peak
+
+
+def _cross_correlation(cpu: np.ndarray, tail: np.ndarray, max_lag: int,
+                       bin_width: float = BIN) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Strongest Pearson correlation between CPU and tail latency rows, with CPU leading by 0..max_lag bins.
+    """
+    best = np.zeros(len(cpu))
+    best_lag = np.zeros(len(cpu))
+    width = cpu.shape[1]
+    for lag in range(max_lag + 1):
+        a = cpu[:, :width - lag]
+        b = tail[:, lag:]
+        a = a - a.mean(axis=1, keepdims=True)
+        b = b - b.mean(axis=1, keepdims=True)
+        denominator = np.sqrt((a * a).sum(axis=1) * (b * b).sum(axis=1))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            corr = np.where(denominator > 0, (a * b).sum(axis=1) / denominator, 0.0)
+        better = np.abs(corr) > np.abs(best)
+        best[better] = corr[better]
+        best_lag[better] = lag * bin_width
+    return best, best_lag
+
+
+def window_features(bins: Dict[str, np.ndarray], cpu: np.ndarray = None, window: float = WINDOW,
+                    step: float = STEP, bin_width: float = BIN) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Sliding-window features over binned requests (and optionally binned CPU use).
+    Cumulative-sum statistics are computed for all windows at once; the FFT and cross-correlation work on
+    strided views, CHUNK_WINDOWS windows at a time.
+    Args:
+        bins (Dict[str, np.ndarray]): Output of bin_requests.
+        cpu (np.ndarray): Output of bin_cpu over the same bins (None leaves the CPU features at 0).
+        window (float): Window length in seconds.
+        step (float): Step between windows in seconds.
+        bin_width (float): Seconds per bin of bins and cpu.
+    Returns:
+        tuple: Window start offsets in seconds from bin 0, and a float32 matrix with one column per FEATURE_NAMES.
+    """
+    width = int(round(window / bin_width))
+    stride = int(round(step / bin_width))
+    n_bins = len(bins["count"])
+    if n_bins < width:
+        return np.zeros(0), np.zeros((0, len(FEATURE_NAMES)), dtype=np.float32)
+    heads = np.arange(0, n_bins - width + 1, stride)
+    features = np.zeros((len(heads), len(FEATURE_NAMES)), dtype=np.float32)
+    column = {name: i for i, name in enumerate(FEATURE_NAMES)}
+
+    count = _window_sums(bins["count"], heads, width)
+    count_sq = _window_sums(bins["count"] ** 2, heads, width)
+    ok = _window_sums(bins["ok"], heads, width)
+    total = _window_sums(bins["sum"], heads, width)
+    total_sq = _window_sums(bins["sum_sq"], heads, width)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        bin_mean = count / width
+        bin_var = np.maximum(count_sq / width - bin_mean ** 2, 0.0)
+        features[:, column["rate_mean"]] = count / window
+        features[:, column["rate_cv"]] = np.where(bin_mean > 0, np.sqrt(bin_var) / bin_mean, 0.0)
+        features[:, column["rate_fano"]] = np.where(bin_mean > 0, bin_var / bin_mean, 0.0)
+        mean = np.where(ok > 0, total / ok, 0.0)
+        features[:, column["latency_mean"]] = mean
+        features[:, column["latency_std"]] = np.sqrt(np.maximum(np.where(ok > 0, total_sq / ok, 0.0) - mean ** 2, 0.0))
+        features[:, column["tail_fraction"]] = np.where(ok > 0, _window_sums(bins["tail"], heads, width) / ok, 0.0)
+    if cpu is not None:
+        features[:, column["cpu_mean"]] = _window_sums(cpu, heads, width) / width
+
+    count_view = np.lib.stride_tricks.sliding_window_view(bins["count"], width)[::stride]
+    max_view = np.lib.stride_tricks.sliding_window_view(bins["max"], width)[::stride]
+    cpu_view = np.lib.stride_tricks.sliding_window_view(cpu, width)[::stride] if cpu is not None else None
+    max_lag = int(round(MAX_LAG / bin_width))
+    for lo in range(0, len(heads), CHUNK_WINDOWS):
+        hi = min(lo + CHUNK_WINDOWS, len(heads))
+        features[lo:hi, column["latency_max"]] = max_view[lo:hi].max(axis=1)
+        period, share, autocorr_peak = _periodicity(count_view[lo:hi], bin_width)
+        features[lo:hi, column["period"]] = period
+        features[lo:hi, column["spectral_peak"]] = share
+        features[lo:hi, column["autocorr_peak"]] = autocorr_peak
+        if cpu_view is not None:
+            corr, lag = _cross_correlation(cpu_view[lo:hi], max_view[lo:hi], max_lag, bin_width)
+            features[lo:hi, column["cpu_tail_xcorr"]] = corr
+            features[lo:hi, column["cpu_tail_lag"]] = lag
+    return heads * bin_width, features
+
+
+def list_runs(store_dir: str = STORE_DIR) -> list:
+    """
+    Run ids present in a results store, from the batch file names (no batch is opened).
+    """
+    paths = glob.glob(os.path.join(store_dir, "*-b*.npz"))
+    return sorted({os.path.basename(p).rsplit("-b", 1)[0] for p in paths})
+
+
+def _whole_seconds(start: np.ndarray) -> bool:
+    return len(start) > 0 and np.array_equal(start, np.floor(start))
+
+
+def store_bin_width(store_dir: str = STORE_DIR) -> float:
+    """
+    Default bin width of a results store: AB_RESOLUTION once any run only has whole-second request starts (ab),
+    BIN otherwise. Only the request_start member of every batch is read.
+    """
+    for run_id in list_runs(store_dir):
+        starts = []
+        for path in glob.glob(os.path.join(store_dir, f"{glob.escape(run_id)}-b*.npz")):
+            with np.load(path) as data:
+                starts.append(data["request_start"])
+        if _whole_seconds(np.concatenate(starts)):
+            return AB_RESOLUTION
+    return BIN
+
+
+def run_features(store_dir: str = STORE_DIR, cpu_source=None, window: float = WINDOW, step: float = STEP,
+                 bin_width: float = None) -> Iterator[tuple]:
+    """
+    Compute features run by run, so memory is bounded by the largest run rather than the whole store.
+    Runs measured with ab only carry whole-second request starts; binned finer than that, their rate features
+    would reflect the clock resolution (and so the client, i.e. the label) instead of the traffic. The default
+    bin width is therefore AB_RESOLUTION for a store holding such runs (see store_bin_width), applied to every run
+    alike so the features stay comparable; an explicitly finer bin_width skips them.
+    Args:
+        store_dir (str): Results store.
+        cpu_source: Optional callable (start, end) -> (timestamps, cumulative CPU usage in usec) for a time range,
+            e.g. backed by a timeline's cgroup stream.
+        window (float): Window length in seconds.
+        step (float): Step between windows in seconds.
+        bin_width (float): Seconds per bin (None for store_bin_width).
+    Yields:
+        tuple: Run id, scenario, window start times (epoch seconds) and the feature matrix.
+    """
+    if bin_width is None:
+        bin_width = store_bin_width(store_dir)
+    for run_id in list_runs(store_dir):
+        columns = load_results(store_dir, [run_id])
+        if not columns or not len(columns["latency"]):
+            continue
+        start = columns["request_start"]
+        latency = columns["latency"]
+        if bin_width < AB_RESOLUTION and _whole_seconds(start):
+            print(f"[Error] Skipping {run_id}: whole-second request starts (ab) need bins of at least "
+                  f"{AB_RESOLUTION} s, not {bin_width} s")
+            continue
+        origin = float(start.min())
+        n_bins = int((start.max() - origin) / bin_width) + 1
+        bins = bin_requests(start, latency, origin, n_bins, bin_width=bin_width)
+        cpu = None
+        if cpu_source is not None:
+            cpu_ts, usage = cpu_source(origin, origin + n_bins * bin_width)
+            cpu = bin_cpu(cpu_ts, usage, origin, n_bins, bin_width)
+        offsets, features = window_features(bins, cpu, window, step, bin_width)
+        yield run_id, str(columns["scenario"][0]), origin + offsets, features
+
+
+def timeline_cpu_source(timeline, stream: str = "cgroup"):
+    """
+    cpu_source backed by a timeline's cgroup stream (Timeline.add_cgroup), summing usage over containers.
+    """
+    points = timeline.points[stream]
+    usage_columns = [name for name in points.columns if name.endswith(".cpu_usage_usec")]
+
+    def source(start: float, end: float) -> tuple[np.ndarray, np.ndarray]:
+        rows = points.range(int(start * 1e9), int(end * 1e9))
+        usage = np.sum([rows[name] for name in usage_columns], axis=0) if usage_columns else np.zeros(len(rows["ts"]))
+        return rows["ts"] / 1e9, usage
+
+    return source
+
+
+class FeatureWriter:
+    """
+    Append-only labelled feature matrix on disk: raw float32 rows, int8 labels, float64 window starts and a
+    meta.json describing the columns and the row range of every run. Rows are written as they are produced,
+    so memory does not grow with the number of runs; load_features memory-maps the result.
+    """
+
+    def __init__(self, feature_dir: str = FEATURE_DIR, window: float = WINDOW, step: float = STEP,
+                 bin_width: float = BIN):
+        os.makedirs(feature_dir, exist_ok=True)
+        self.feature_dir = feature_dir
+        self.meta = {"features": list(FEATURE_NAMES), "labels": LABELS, "bin": bin_width, "window": window, "step": step,
+                     "rows": 0, "runs": []}
+        self._files = {name: open(os.path.join(feature_dir, f"{name}.bin"), "wb")
+                       for name in ("features", "labels", "starts")}
+
+    def write(self, run_id: str, scenario: str, starts: np.ndarray, features: np.ndarray) -> None:
+        rows = self.meta["rows"]
+        self._files["features"].write(np.ascontiguousarray(features, dtype=np.float32).tobytes())
+        self._files["labels"].write(np.full(len(features), LABELS.get(scenario, -1), dtype=np.int8).tobytes())
+        self._files["starts"].write(np.asarray(starts, dtype=np.float64).tobytes())
+        self.meta["runs"].append({"run_id": run_id, "scenario": scenario, "rows": [rows, rows + len(features)]})
+        self.meta["rows"] = rows + len(features)
+
+    def close(self) -> None:
+        for f in self._files.values():
+            f.close()
+        with open(os.path.join(self.feature_dir, "meta.json"), "w") as f:
+            json.dump(self.meta, f, indent=1)
+
+
+def load_features(feature_dir: str = FEATURE_DIR) -> tuple[np.ndarray, np.ndarray, np.ndarray, dict]:
+    """
+    Memory-map a feature directory written by FeatureWriter.
+    Returns:
+        tuple: Features (rows, len(FEATURE_NAMES)), labels, window starts and the meta dict.
+    """
+    with open(os.path.join(feature_dir, "meta.json")) as f:
+        meta = json.load(f)
+    rows, n_features = meta["rows"], len(meta["features"])
+    if not rows:
+        return np.zeros((0, n_features), np.float32), np.zeros(0, np.int8), np.zeros(0), meta
+    features = np.memmap(os.path.join(feature_dir, "features.bin"), np.float32, "r", shape=(rows, n_features))
+    labels = np.memmap(os.path.join(feature_dir, "labels.bin"), np.int8, "r", shape=(rows,))
+    starts = np.memmap(os.path.join(feature_dir, "starts.bin"), np.float64, "r", shape=(rows,))
+    return features, labels, starts, meta
+
+
+def build_features(store_dir: str = STORE_DIR, feature_dir: str = FEATURE_DIR, cpu_source=None,
+                   window: float = WINDOW, step: float = STEP, bin_width: float = None) -> dict:
+    """
+    Extract labelled features for every run in a results store (see run_features for runs measured with ab).
+    Returns:
+        dict: The written meta data; "bin" is the bin width used.
+    """
+    if bin_width is None:
+        bin_width = store_bin_width(store_dir)
+    writer = FeatureWriter(feature_dir, window, step, bin_width)
+    try:
+        for run_id, scenario, starts, features in run_features(store_dir, cpu_source, window, step, bin_width):
+            writer.write(run_id, scenario, starts, features)
+    finally:
+        writer.close()
+    return writer.meta
+
+
+if __name__ == "__main__":
+    meta = build_features()
+    print(f"Wrote {meta['rows']} windows from {len(meta['runs'])} runs to {FEATURE_DIR} ({meta['bin']} s bins)")
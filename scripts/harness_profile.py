@@ -0,0 +1,205 @@
+import contextlib
+import json
+import os
+import resource
+import threading
+import time
+from typing import Dict, Iterator
+
+HARNESS_DIR = "./results/harness"
+OVERHEAD_THRESHOLD = 0.05  # harness CPU outside load generation, as a share of all cores
+
+
+class StageTimers:
+    """
+    Wall-clock and CPU time per hot-path stage, accumulated per thread.
+    Every thread adds to its own dict, so timing a stage takes no lock; totals are summed when read.
+    """
+
+    def __init__(self):
+        self._local = threading.local()
+        self._tables = []
+        self._lock = threading.Lock()
+
+    def _table(self) -> dict:
+        table = getattr(self._local, "table", None)
+        if table is None:
+            table = self._local.table = {}
+            with self._lock:
+                self._tables.append(table)
+        return table
+
+    def add(self, name: str, wall: float, cpu: float, count: int = 1) -> None:
+        """
+        Add time (seconds) to a stage of the calling thread.
+        """
+        entry = self._table().get(name)
+        if entry is None:
+            entry = self._table()[name] = [0, 0.0, 0.0, 0.0]
+        entry[0] += count
+        entry[1] += wall
+        entry[2] += cpu
+        entry[3] = max(entry[3], wall / count if count else 0.0)
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        wall, cpu = time.perf_counter(), time.thread_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def reset(self) -> None:
+        with self._lock:
+            for table in self._tables:
+                table.clear()
+
+    def totals(self) -> Dict[str, dict]:
+        """
+        Per stage: calls, total wall and CPU seconds, and the longest single call.
+        """
+        totals = {}
+        with self._lock:
+            tables = [dict(table) for table in self._tables]
+        for table in tables:
+            for name, (count, wall, cpu, longest) in table.items():
+                entry = totals.setdefault(name, {"calls": 0, "wall_s": 0.0, "cpu_s": 0.0, "max_wall_s": 0.0})
+                entry["calls"] += count
+                entry["wall_s"] += wall
+                entry["cpu_s"] += cpu
+                entry["max_wall_s"] = max(entry["max_wall_s"], longest)
+        return totals
+
+
+# Process-wide timers; the measurement code wraps its stages in `with stage(...)`
+TIMERS = StageTimers()
+stage = TIMERS.stage
+
+
+class HarnessProfiler:
+    """
+    Self-profile of one measurement run.
+    start() / stop() bracket the run. In between, the stage timers collect time per hot-path stage, and the
+    harness process's CPU time, RSS and context switches are read from psutil at both ends. The load itself
+    (ab child processes, or the CPU of the "load" stage for the in-process client) is reported separately and
+    not counted as overhead. With profile=True
+    every thread is also traced by cProfile and the merged stats are dumped to a .prof file, which pstats,
+    snakeviz and flameprof read (py-spy can attach to the pid in the report instead).
+    """
+
+    def __init__(self, run_id: str, profile: bool = False, threshold: float = OVERHEAD_THRESHOLD,
+                 harness_dir: str = HARNESS_DIR):
+        """
+        Args:
+            run_id (str): Run the profile belongs to; names the report files.
+            profile (bool): Trace all threads with cProfile.
+            threshold (float): Overhead (share of all cores) above which the report flags the run.
+            harness_dir (str): Directory of the .json reports and .prof dumps.
+        """
+        self.run_id = run_id
+        self.profile = profile
+        self.threshold = threshold
+        # Imported here, so modules that only time stages (results_store, used by analysis) stay light
+        import psutil
+
+        self.harness_dir = harness_dir
+        self.process = psutil.Process()
+        self._profiles = []
+        self._start = None
+        self.result = None
+
+    def _trace_thread(self, *args) -> None:
+        # Installed through threading.setprofile: runs once on each new thread's first call and hands the thread
+        # over to its own cProfile profiler
+        import cProfile
+
+        profiler = cProfile.Profile()
+        self._profiles.append(profiler)
+        profiler.enable()
+
+    def _snapshot(self) -> dict:
+        with self.process.oneshot():
+            cpu = self.process.cpu_times()
+            switches = self.process.num_ctx_switches()
+            return {"wall": time.perf_counter(), "user": cpu.user, "system": cpu.system,
+                    "children": cpu.children_user + cpu.children_system, "rss": self.process.memory_info().rss,
+                    "voluntary": switches.voluntary, "involuntary": switches.involuntary}
+
+    def start(self) -> "HarnessProfiler":
+        TIMERS.reset()
+        if self.profile:
+            threading.setprofile(self._trace_thread)
+            self._trace_thread()
+        self._start = self._snapshot()
+        return self
+
+    def stop(self, sampler=None) -> dict:
+        """
+        End the run and build the report (also written to harness_dir/<run_id>.json).
+        Args:
+            sampler (CgroupSampler): Shared sampler whose thread CPU is reported as the "sampling" stage.
+        Returns:
+            dict: The report; "over_threshold" is True when the harness overhead exceeded the threshold.
+        """
+        end = self._snapshot()
+        wall = end["wall"] - self._start["wall"]
+        if sampler is not None:
+            cpu, wall_time = sampler.times()
+            TIMERS.add("sampling", wall_time, cpu)
+        harness_cpu = (end["user"] - self._start["user"]) + (end["system"] - self._start["system"])
+        cores = os.cpu_count() or 1
+        stages = TIMERS.totals()
+        load_cpu = stages.get("load", {}).get("cpu_s", 0.0)
+        overhead = max(harness_cpu - load_cpu, 0.0) / (wall * cores) if wall > 0 else 0.0
+        self.result = {
+            "run_id": self.run_id, "pid": self.process.pid, "wall_s": wall, "cores": cores,
+            "harness_cpu_s": harness_cpu, "load_cpu_s": load_cpu,
+            "children_cpu_s": end["children"] - self._start["children"],
+            "overhead": overhead, "threshold": self.threshold, "over_threshold": overhead > self.threshold,
+            "rss_mb": end["rss"] / 1024 / 1024,
+            # ru_maxrss is in KiB on Linux
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            "voluntary_switches": end["voluntary"] - self._start["voluntary"],
+            "involuntary_switches": end["involuntary"] - self._start["involuntary"],
+            "stages": dict(sorted(stages.items(), key=lambda item: -item[1]["cpu_s"])),
+        }
+        os.makedirs(self.harness_dir, exist_ok=True)
+        if self.profile:
+            self.result["profile"] = self._dump_profile()
+        with open(os.path.join(self.harness_dir, f"{self.run_id}.json"), "w") as f:
+            json.dump(self.result, f, indent=1)
+        return self.result
+
+    def _dump_profile(self) -> str:
+        import pstats
+
+        threading.setprofile(None)
+        for profiler in self._profiles:
+            profiler.disable()
+        path = os.path.join(self.harness_dir, f"{self.run_id}.prof")
+        stats = None
+        for profiler in self._profiles:
+            profiler.create_stats()
+            if not profiler.stats:
+                continue
+            if stats is None:
+                stats = pstats.Stats(profiler)
+            else:
+                stats.add(profiler)
+        if stats is not None:
+            stats.dump_stats(path)
+        self._profiles = []
+        return path
+
+    def summary(self) -> str:
+        """
+        One-line summary of the report, flagging runs whose harness overhead exceeded the threshold.
+        """
+        r = self.result
+        top = ", ".join(f"{name} {entry['cpu_s']:.2f}s" for name, entry in list(r["stages"].items())[:3])
+        line = (f"harness CPU {r['harness_cpu_s']:.1f}s ({r['overhead'] * 100:.1f}% of {r['cores']} cores), "
+                f"load generator {r['children_cpu_s']:.1f}s, peak RSS {r['peak_rss_mb']:.0f} MB, "
+                f"{r['involuntary_switches']} involuntary switches; top stages: {top}")
+        if r["over_threshold"]:
+            return f"[Error] Harness overhead above {r['threshold'] * 100:.0f}%: {line}"
+        return line
@@ -0,0 +1,174 @@
+import math
+import struct
+import zlib
+from typing import Iterable
+import numpy as np
+
+# Latencies are recorded in microseconds between these bounds (values above are clamped)
+LOWEST_TRACKABLE = 1
+HIGHEST_TRACKABLE = 60_000_000  # 60 s
+SIGNIFICANT_DIGITS = 3
+
+_HEADER = struct.Struct("<4sBqqqqq")
+_MAGIC = b"HDR1"
+
+
+class HdrHistogram:
+    """
+    Fixed-memory latency histogram with HDR (log-linear) buckets.
+    Values keep SIGNIFICANT_DIGITS decimal digits of precision over the whole trackable range, the counts
+    array never grows, and two histograms with the same configuration merge losslessly by adding counts.
+    Values are recorded in milliseconds and stored internally in microseconds.
+    """
+
+    def __init__(self, lowest: int = LOWEST_TRACKABLE, highest: int = HIGHEST_TRACKABLE,
+                 digits: int = SIGNIFICANT_DIGITS):
+        """
+        Args:
+            lowest (int): Lowest distinguishable value in microseconds (>= 1).
+            highest (int): Highest trackable value in microseconds.
+            digits (int): Significant decimal digits kept (1 to 5).
+        """
+        self.lowest = lowest
+        self.highest = highest
+        self.digits = digits
+        self.unit_magnitude = int(math.floor(math.log2(lowest)))
+        sub_bucket_count_magnitude = int(math.ceil(math.log2(2 * 10 ** digits)))
+        self.sub_bucket_half_count_magnitude = max(sub_bucket_count_magnitude, 1) - 1
+        self.sub_bucket_count = 1 << sub_bucket_count_magnitude
+        self.sub_bucket_half_count = self.sub_bucket_count // 2
+        self.sub_bucket_mask = (self.sub_bucket_count - 1) << self.unit_magnitude
+
+        smallest_untrackable = self.sub_bucket_count << self.unit_magnitude
+        bucket_count = 1
+        while smallest_untrackable <= highest:
+            smallest_untrackable <<= 1
+            bucket_count += 1
+        self.counts = np.zeros((bucket_count + 1) * self.sub_bucket_half_count, dtype=np.int64)
+        self.total = 0
+        self.min = math.inf
+        self.max = 0
+
+    def _indices(self, values: np.ndarray) -> np.ndarray:
+        """
+        Vectorized value -> counts index mapping.
+        """
+        bucket = np.floor(np.log2(values | self.sub_bucket_mask)).astype(np.int64) \
+            - self.unit_magnitude - self.sub_bucket_half_count_magnitude
+        sub_bucket = values >> (bucket + self.unit_magnitude)
+        return ((bucket + 1) << self.sub_bucket_half_count_magnitude) + (sub_bucket - self.sub_bucket_half_count)
+
+    def _values(self, indices: np.ndarray) -> np.ndarray:
+        """
+        Vectorized counts index -> lowest equivalent value mapping.
+        """
+        bucket = (indices >> self.sub_bucket_half_count_magnitude) - 1
+        sub_bucket = (indices & (self.sub_bucket_half_count - 1)) + self.sub_bucket_half_count
+        low = bucket < 0
+        sub_bucket = np.where(low, sub_bucket - self.sub_bucket_half_count, sub_bucket)
+        bucket = np.where(low, 0, bucket)
+        return sub_bucket << (bucket + self.unit_magnitude)
+
+    def _highest_equivalent(self, indices: np.ndarray) -> np.ndarray:
+        bucket = np.maximum((indices >> self.sub_bucket_half_count_magnitude) - 1, 0)
+        return self._values(indices) + (np.int64(1) << (bucket + self.unit_magnitude)) - 1
+
+    def record(self, latencies_ms: Iterable[float]) -> "HdrHistogram":
+        """
+        Record a batch of latencies given in milliseconds.
+        NaN values (failed requests) are skipped.
+        """
+        values = np.asarray(latencies_ms, dtype=np.float64).ravel()
+        values = values[~np.isnan(values)]
+        if not values.size:
+            return self
+        values = np.clip(np.rint(values * 1000.0), self.lowest, self.highest).astype(np.int64)
+        self.counts += np.bincount(self._indices(values), minlength=len(self.counts))
+        self.total += int(values.size)
+        self.min = min(self.min, int(values.min()))
+        self.max = max(self.max, int(values.max()))
+        return self
+
+    def _check_compatible(self, other: "HdrHistogram") -> None:
+        if (self.lowest, self.highest, self.digits) != (other.lowest, other.highest, other.digits):
+            raise ValueError("cannot merge histograms with different configurations")
+
+    def merge(self, other: "HdrHistogram") -> "HdrHistogram":
+        """
+        Add the counts of another histogram with the same configuration.
+        """
+        self._check_compatible(other)
+        self.counts += other.counts
+        self.total += other.total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    def copy(self) -> "HdrHistogram":
+        clone = HdrHistogram(self.lowest, self.highest, self.digits)
+        return clone.merge(self)
+
+    def percentiles(self, percentiles: Iterable[float]) -> np.ndarray:
+        """
+        Latencies in milliseconds at the given percentiles (0-100), e.g. [50, 99, 99.9].
+        Each value is the highest value equivalent to the bucket holding that rank, capped at the recorded maximum.
+        """
+        percentiles = np.asarray(list(percentiles), dtype=np.float64)
+        if not self.total:
+            return np.full(percentiles.shape, np.nan)
+        ranks = np.maximum(np.ceil(percentiles / 100.0 * self.total), 1).astype(np.int64)
+        indices = np.searchsorted(np.cumsum(self.counts), ranks)
+        values = np.minimum(self._highest_equivalent(indices), self.max)
+        return values / 1000.0
+
+    def percentile(self, percentile: float) -> float:
+        return float(self.percentiles([percentile])[0])
+
+    def mean(self) -> float:
+        """
+        Mean latency in milliseconds, using the midpoint of every bucket.
+        """
+        if not self.total:
+            return math.nan
+        nonzero = np.flatnonzero(self.counts)
+        mid = (self._values(nonzero) + self._highest_equivalent(nonzero)) / 2.0
+        return float((mid * self.counts[nonzero]).sum() / self.total / 1000.0)
+
+    def to_bytes(self) -> bytes:
+        """
+        Compact serialization: configuration header plus the zlib-compressed non-zero counts.
+        """
+        nonzero = np.flatnonzero(self.counts).astype(np.int32)
+        payload = zlib.compress(nonzero.tobytes() + self.counts[nonzero].tobytes())
+        header = _HEADER.pack(_MAGIC, self.digits, self.lowest, self.highest, self.total,
+                              0 if self.min == math.inf else self.min, self.max)
+        return header + payload
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "HdrHistogram":
+        magic, digits, lowest, highest, total, minimum, maximum = _HEADER.unpack_from(data)
+        if magic != _MAGIC:
+            raise ValueError("not a serialized HdrHistogram")
+        histogram = cls(lowest, highest, digits)
+        raw = zlib.decompress(data[_HEADER.size:])
+        n = len(raw) // 12
+        indices = np.frombuffer(raw[:n * 4], dtype=np.int32)
+        histogram.counts[indices] = np.frombuffer(raw[n * 4:], dtype=np.int64)
+        histogram.total = total
+        histogram.min = minimum if total else math.inf
+        histogram.max = maximum
+        return histogram
+
+    def __reduce__(self):
+        # Pickles through the compact form, e.g. when returned from a process pool
+        return HdrHistogram.from_bytes, (self.to_bytes(),)
+
+
+def merge_all(histograms: Iterable[HdrHistogram]) -> HdrHistogram:
+    """
+    Merge any number of histograms into a new one.
+    """
+    merged = None
+    for histogram in histograms:
+        merged = histogram.copy() if merged is None else merged.merge(histogram)
+    return merged if merged is not None else HdrHistogram()
@@ -1,12 +1,19 @@
 import subprocess
+import contextlib
 import json
 import random
 import string
 import tempfile
 import os, csv
+import shlex
 import urllib.parse
 import psutil
 import time
+import numpy as np
+from pmb import load_ab_gnuplot, find_episodes, bottleneck_length
+from async_client import run_benchmark
+from hdr_histogram import HdrHistogram
+from harness_profile import stage
 
 def generate_fake_data(fake, param_type=None):
     """
@@ -61,94 +68,145 @@ def generate_request_data(path, method, parameters, fake):
     return url, body_params
 
 
-def execute_ab_request(host, url, body_params, method, csv_file, n_requests=7000, n_concurrency=10, bottleneck_threshold=500):
+PERCENTILES = ["50%", "66%", "75%", "80%", "90%", "95%", "98%", "99%", "100%"]
+
+
+def parse_ab_report(output):
+    """
+    Extracts the failed request count and the percentile table from ab's text report.
+    """
+    failed_requests = 0
+    response_times = {key: None for key in PERCENTILES}
+    failed_requests_line = next((line for line in output.splitlines() if "Failed requests" in line), None)
+    if failed_requests_line:
+        failed_requests = int(failed_requests_line.split(":")[1].strip())
+    percentage_section = next((line for line in output.splitlines() if "Percentage of the requests served within a certain time" in line), None)
+    if percentage_section:
+        percentage_lines = output.splitlines()[output.splitlines().index(percentage_section) + 1:]
+        for line in percentage_lines:
+            parts = line.split("%")
+            if len(parts) == 2:
+                percentage = parts[0].strip()
+                time_ms = parts[1].strip().split()[0]
+                if percentage + "%" in response_times:
+                    response_times[percentage + "%"] = time_ms
+    return failed_requests, response_times
+
+
+def percentile_table(latencies):
+    """
+    Builds the same percentile table as ab's report from per-request latencies (milliseconds).
+    """
+    if not len(latencies):
+        return {key: None for key in PERCENTILES}
+    values = np.percentile(latencies, [float(key[:-1]) for key in PERCENTILES])
+    return {key: round(float(value), 3) for key, value in zip(PERCENTILES, values)}
+
+
+def execute_ab_request(host, url, body_params, method, csv_file, n_requests=7000, n_concurrency=10, bottleneck_threshold=500, sampler=None, store=None, endpoint=None, client="ab", stopping=None, live=None):
     """
     Executes the Apache Benchmark (ab) command and collects the response time, network, and memory usage, saving results to a CSV file.
+    With client="asyncio" the requests are sent by the in-process keep-alive client instead of an ab subprocess.
+    When a sequential.SequentialStop is passed as stopping, the in-process client sends batches until the target
+    percentiles are precise enough (n_requests is then ignored in favour of its sample bounds); ab cannot report
+    latencies before it exits, so this mode requires client="asyncio" and raises ValueError otherwise.
+    body_params may be a dict or an already serialized JSON body (bytes), e.g. from the payload corpus.
+    When a ResultsWriter is passed as store, the record (including per-request latencies) is queued to it instead and
+    its writer thread produces the CSV row; endpoint is the path template recorded with it.
+    Per-request timings are captured (through ab's gnuplot output for ab) and scanned for millibottleneck episodes.
+    Container memory comes from the shared cgroup sampler when one is passed; otherwise host memory is read once after the run.
+    Returns a dict with the timings, episodes, latency histogram and sampler window, or None if ab failed.
+    The generate, launch, load, parse and write stages are timed by harness_profile.
+    When a live_metrics.LiveMetrics is passed as live, the in-process client's requests show up in it while they
+    run; ab's are handed over once ab has exited.
     """
-    def calculate_pmb(ab_result: str) -> float:
-        """
-        Calculate the percentile millibottleneck (PMB) for requests above a threshold.
-        Args:
-            ab_result (str): The Apache Bench output.
-        Returns:
-            float: PMB value for the threshold.
-        """
-        
-        for line in ab_result.splitlines():
-            if "Time per request" in line and "(mean, across all" not in line:
-                try:
-                    bottleneck_request_time = float(line.split()[3])
-                    return bottleneck_request_time if bottleneck_request_time <= bottleneck_threshold else 0.0
-                except ValueError:
-                    continue
-        return None    
-
-    cmd = ""
+    cmd = []
     temp_file_path = None
-
-    # If method is POST or PUT, we need to include the body
-    if method in ["POST", "PUT"]:
-        body_data = json.dumps(body_params)
-        with tempfile.NamedTemporaryFile(delete=False, mode="w", suffix=".json") as temp_file:
-            temp_file.write(body_data)
-            temp_file_path = temp_file.name
-        if method == "POST":
-            cmd = f"ab -n {n_requests} -c {n_concurrency} -p {temp_file_path} -T 'application/json' {host}{url}"
-        else:
-            cmd = f"ab -n {n_requests} -c {n_concurrency} -u {temp_file_path} -T 'application/json' {host}{url}"
-    else:
-        cmd = f"ab -n {n_requests} -c {n_concurrency} {host}{url}"
+    timings_file_path = None
+
+    with stage("generate"):
+        # If method is POST or PUT, we need to include the body
+        body_data = None
+        if method in ["POST", "PUT"]:
+            body_data = body_params if isinstance(body_params, bytes) else json.dumps(body_params).encode()
+
+        if stopping is not None and client != "asyncio":
+            raise ValueError(f"Sequential stopping needs client=\"asyncio\", not {client!r}")
+        if client == "ab":
+            with tempfile.NamedTemporaryFile(delete=False, mode="w", suffix=".tsv") as timings_file:
+                timings_file_path = timings_file.name
+            cmd = ["ab", "-n", str(n_requests), "-c", str(n_concurrency), "-g", timings_file_path]
+            if body_data is not None:
+                with tempfile.NamedTemporaryFile(delete=False, mode="wb", suffix=".json") as temp_file:
+                    temp_file.write(body_data)
+                    temp_file_path = temp_file.name
+                cmd += ["-p" if method == "POST" else "-u", temp_file_path, "-T", "application/json"]
+            # Passed as an argument list, so quotes or brackets in the URL never reach a shell
+            cmd.append(f"{host}{url}")
 
     try:
         # Track network and memory usage
         network_start = psutil.net_io_counters()
-        memory_usage = []
         start_time = time.time()
 
-        # Monitor in a separate thread
-        def monitor_resource_usage():
-            while True:
-                memory_usage.append(psutil.virtual_memory().percent)
-                time.sleep(0.1)
-
-        import threading
-        monitor_thread = threading.Thread(target=monitor_resource_usage, daemon=True)
-        monitor_thread.start()
+        # Send the requests inside a window of the shared sampler
+        window = sampler.subscribe() if sampler is not None else None
+        with window or contextlib.nullcontext():
+            if client == "ab":
+                # Spawning and running ab are timed apart; a slow fork shows up as launch, not as load
+                with stage("launch"):
+                    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+                with stage("load"):
+                    output = process.communicate()[0].decode('utf-8')
+                if process.returncode:
+                    raise subprocess.CalledProcessError(process.returncode, cmd, output)
+            elif stopping is not None:
+                with stage("load"):
+                    timings, status = stopping.run(lambda n: run_benchmark(host, url, method, body_data, n, n_concurrency, live=live, endpoint=endpoint), method, endpoint)
+            else:
+                with stage("load"):
+                    timings, status = run_benchmark(host, url, method, body_data, n_requests, n_concurrency, live=live, endpoint=endpoint)
 
-        # Execute the command
-        result = subprocess.check_output(cmd, shell=True, stderr=subprocess.STDOUT)
-        output = result.decode('utf-8')
-
-        # Stop monitoring
         elapsed_time = time.time() - start_time
-        monitor_thread.join(timeout=0)
         network_end = psutil.net_io_counters()
 
         # Calculate network and memory usage
         total_network_usage = (network_end.bytes_sent + network_end.bytes_recv) - (network_start.bytes_sent + network_start.bytes_recv)
         avg_network_usage_mbps = (total_network_usage / elapsed_time) / 1024 / 1024
-        avg_memory_usage_mb = sum(memory_usage) / len(memory_usage) if memory_usage else 0
-
-        # Extract metrics from ab output
-        bottleneck_request_time = calculate_pmb(output)
-        failed_requests = 0
-        response_times = {key: None for key in ["50%", "66%", "75%", "80%", "90%", "95%", "98%", "99%", "100%"]}
-        failed_requests_line = next((line for line in output.splitlines() if "Failed requests" in line), None)
-        if failed_requests_line:
-            failed_requests = int(failed_requests_line.split(":")[1].strip())
-        percentage_section = next((line for line in output.splitlines() if "Percentage of the requests served within a certain time" in line), None)
-        if percentage_section:
-            percentage_lines = output.splitlines()[output.splitlines().index(percentage_section) + 1:]
-            for line in percentage_lines:
-                parts = line.split("%")
-                if len(parts) == 2:
-                    percentage = parts[0].strip()
-                    time_ms = parts[1].strip().split()[0]
-                    if percentage + "%" in response_times:
-                        response_times[percentage + "%"] = time_ms
+        if window is not None:
+            avg_memory_usage_mb = float(np.nansum(window.mean_memory_mb()))
+        else:
+            avg_memory_usage_mb = psutil.virtual_memory().used / 1024 / 1024
+
+        # Extract metrics from the client output
+        with stage("parse"):
+            if client == "ab":
+                timings = load_ab_gnuplot(timings_file_path)
+                failed_requests, response_times = parse_ab_report(output)
+                if live is not None:
+                    live.record(endpoint or url, method, timings["latency"], failed_requests)
+            else:
+                # Like ab, only connection-level failures count as failed requests
+                failed_requests = int((status == 0).sum())
+                response_times = percentile_table(timings["latency"][status != 0])
+            episodes = find_episodes(timings["start"], timings["latency"], bottleneck_threshold)
+            bottleneck_request_time = bottleneck_length(episodes)
+            histogram = HdrHistogram().record(timings["latency"])
+
+        if store is not None:
+            with stage("write"):
+                store.submit({
+                    "method": method, "endpoint": endpoint, "url": url,
+                    "started": start_time, "finished": start_time + elapsed_time, "failed": failed_requests,
+                    **{f"p{key[:-1]}": value for key, value in response_times.items()},
+                    "bottleneck_length": bottleneck_request_time, "memory_mb": avg_memory_usage_mb,
+                    "network_mbps": avg_network_usage_mbps,
+                    "request_start": timings["start"], "latency": timings["latency"], "histogram": histogram,
+                })
+            return {"timings": timings, "episodes": episodes, "histogram": histogram, "resources": window}
 
         # Save results to CSV
-        with open(csv_file, mode='a', newline='') as file:
+        with stage("write"), open(csv_file, mode='a', newline='') as file:
             writer = csv.writer(file)
             writer.writerow([
                 url,
@@ -158,12 +216,16 @@ def execute_ab_request(host, url, body_params, method, csv_file, n_requests=7000
                 response_times["100%"], bottleneck_request_time, avg_memory_usage_mb, avg_network_usage_mbps
             ])
 
+        return {"timings": timings, "episodes": episodes, "histogram": histogram, "resources": window}
+
     except subprocess.CalledProcessError as e:
         print("---------------------------------------------------------")
         print(f"[Error] Cannot execute ab")
-        print(f"[Debug] ab Command failed: {cmd}")
+        print(f"[Debug] ab Command failed: {shlex.join(cmd)}")
         print("---------------------------------------------------------")
+        return None
     finally:
-        # Clean up the temporary file if it was created
-        if temp_file_path and os.path.exists(temp_file_path):
-            os.remove(temp_file_path)
+        # Clean up the temporary files
+        for path in (temp_file_path, timings_file_path):
+            if path and os.path.exists(path):
+                os.remove(path)
@@ -0,0 +1,258 @@
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Dict, Iterator, List
+import numpy as np
+
+SURICATA_EVE = "/var/log/suricata/eve.json"
+SNORT_ALERT = "/var/log/snort/alert"
+ALERT_DIR = "./results/alerts"
+CHUNK_SIZE = 1 << 20  # bytes read per step
+
+SOURCES = ("suricata", "snort")
+BENIGN = "benign"  # scenario whose alerts are false positives
+
+ALERT_DTYPE = np.dtype([
+    ("ts", "f8"),
+    ("source", "i1"),
+    ("sid", "i8"),
+    ("priority", "i2"),
+    ("dest_port", "i4"),
+])
+
+# Snort "fast" alert line:
+# 01/16-12:34:56.789012  [**] [1:1000001:1] message [**] [Classification: x] [Priority: 2] {TCP} a:1 -> b:80
+SNORT_FAST = re.compile(
+    rb"^(\d\d)/(\d\d)-(\d\d):(\d\d):(\d\d)\.(\d+)\s+\[\*\*\]\s+\[\d+:(\d+):\d+\]\s+(.*?)\s+\[\*\*\]"
+    rb"(?:.*?\[Priority:\s*(\d+)\])?.*?(?:->\s*[^\s:]+:(\d+))?\s*$"
+)
+
+
+class LogTail:
+    """
+    Incremental reader of an append-only log file.
+    The byte offset of the last complete line is checkpointed together with the file's inode, so a restart
+    continues where the previous run stopped and a rotated or truncated file is read from the start.
+    """
+
+    def __init__(self, path: str, checkpoint: dict):
+        """
+        Args:
+            path (str): Log file.
+            checkpoint (dict): Shared checkpoint mapping; this tail's entry is stored under its path.
+        """
+        self.path = path
+        self.checkpoint = checkpoint
+
+    def read_lines(self) -> Iterator[bytes]:
+        """
+        Yield the complete lines appended since the last checkpoint and advance it.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        state = self.checkpoint.get(self.path, {})
+        offset = state.get("offset", 0)
+        if state.get("inode") != stat.st_ino or stat.st_size < offset:
+            offset = 0
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            pending = b""
+            while True:
+                chunk = f.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()
+                for line in lines:
+                    yield line
+                offset += len(chunk)
+                self.checkpoint[self.path] = {"inode": stat.st_ino, "offset": offset - len(pending)}
+        # A trailing partial line is left for the next call
+        self.checkpoint[self.path] = {"inode": stat.st_ino, "offset": offset - len(pending)}
+
+
+def parse_eve_alert(line: bytes) -> tuple:
+    """
+    Parse one Suricata eve.json line, returning an alert row or None for other event types.
+    Non-alert events are rejected before JSON decoding.
+    """
+    if b'"event_type":"alert"' not in line and b'"event_type": "alert"' not in line:
+        return None
+    try:
+        event = json.loads(line)
+        ts = datetime.strptime(event["timestamp"], "%Y-%m-%dT%H:%M:%S.%f%z").timestamp()
+    except (ValueError, KeyError):
+        return None
+    alert = event.get("alert", {})
+    return ts, 0, alert.get("signature_id", 0), alert.get("severity", 0), event.get("dest_port", 0) or 0
+
+
+def parse_snort_alert(line: bytes, year: int) -> tuple:
+    """
+    Parse one Snort fast-format alert line (which carries no year), returning an alert row or None.
+    Timestamps are taken as local time, which is how Snort writes them.
+    """
+    match = SNORT_FAST.match(line)
+    if not match:
+        return None
+    month, day, hour, minute, second, fraction, sid, _, priority, port = match.groups()
+    ts = datetime(year, int(month), int(day), int(hour), int(minute), int(second)).timestamp()
+    ts += int(fraction) / 10 ** len(fraction)
+    return ts, 1, int(sid), int(priority or 0), int(port or 0)
+
+
+class AlertIndex:
+    """
+    Time-sorted alert arrays from Suricata and Snort, persisted with the tail checkpoints.
+    """
+
+    def __init__(self, alert_dir: str = ALERT_DIR):
+        self.alert_dir = alert_dir
+        self.alerts = np.zeros(0, dtype=ALERT_DTYPE)
+        self.checkpoint = {}
+        os.makedirs(alert_dir, exist_ok=True)
+        try:
+            with open(os.path.join(alert_dir, "checkpoint.json")) as f:
+                self.checkpoint = json.load(f)
+            self.alerts = np.load(os.path.join(alert_dir, "alerts.npy"))
+        except (OSError, ValueError):
+            self.checkpoint = {}
+
+    def ingest(self, eve_path: str = SURICATA_EVE, snort_path: str = SNORT_ALERT, year: int = None) -> int:
+        """
+        Read new alerts from both logs, merge them into the index and save the checkpoint.
+        Args:
+            eve_path (str): Suricata eve.json.
+            snort_path (str): Snort fast alert log.
+            year (int): Year for Snort timestamps (defaults to the current year).
+        Returns:
+            int: Number of new alerts.
+        """
+        year = year or time.localtime().tm_year
+        rows = []
+        for line in LogTail(eve_path, self.checkpoint).read_lines():
+            row = parse_eve_alert(line)
+            if row is not None:
+                rows.append(row)
+        for line in LogTail(snort_path, self.checkpoint).read_lines():
+            row = parse_snort_alert(line, year)
+            if row is not None:
+                rows.append(row)
+        known = len(self.alerts)
+        if rows:
+            merged = np.concatenate((self.alerts, np.array(rows, dtype=ALERT_DTYPE)))
+            # Sorted by ts; identical rows can only come from lines re-read after a crash between the writes of save()
+            self.alerts = np.unique(merged)
+        self.save()
+        return len(self.alerts) - known
+
+    def save(self) -> None:
+        """
+        Write the alerts and then the checkpoint, each through a temp file and os.replace. A crash in between
+        leaves the new alerts with the old checkpoint, and the re-read lines are then dropped as duplicates.
+        """
+        alerts_path = os.path.join(self.alert_dir, "alerts.npy")
+        with open(alerts_path + ".tmp", "wb") as f:
+            np.save(f, self.alerts)
+        os.replace(alerts_path + ".tmp", alerts_path)
+        tmp_path = os.path.join(self.alert_dir, "checkpoint.json.tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(self.checkpoint, f)
+        os.replace(tmp_path, os.path.join(self.alert_dir, "checkpoint.json"))
+
+    def window(self, start: float, end: float) -> np.ndarray:
+        """
+        Alerts raised between two epoch timestamps.
+        """
+        ts = self.alerts["ts"]
+        return self.alerts[np.searchsorted(ts, start, "left"):np.searchsorted(ts, end, "right")]
+
+    def first_alerts(self, starts: np.ndarray, ends: np.ndarray, source: int = None) -> np.ndarray:
+        """
+        Vectorized time to first alert for many windows.
+        Args:
+            starts (np.ndarray): Window starts (epoch seconds).
+            ends (np.ndarray): Window ends (epoch seconds).
+            source (int): Only count alerts from this source (index into SOURCES); None counts both.
+        Returns:
+            np.ndarray: Seconds from window start to the first alert, NaN when the window has none.
+        """
+        alerts = self.alerts if source is None else self.alerts[self.alerts["source"] == source]
+        ts = alerts["ts"]
+        first = np.searchsorted(ts, starts, "left")
+        found = first < ts.size
+        delay = np.full(len(starts), np.nan)
+        delay[found] = ts[first[found]] - starts[found]
+        delay[~found | (delay > ends - starts)] = np.nan
+        return delay
+
+
+def detection_report(index: AlertIndex, columns: Dict[str, np.ndarray], keys: np.ndarray = None,
+                     grace: float = 5.0, benign: str = BENIGN) -> Dict[str, List[dict]]:
+    """
+    Join alerts to the run windows of stored results and summarize them per (scenario, endpoint) and IDS.
+    Alerts in windows of the benign scenario are false positives, so those groups report a false-positive rate;
+    every other scenario reports a detection rate and the time to first alert.
+    Args:
+        index (AlertIndex): Ingested alerts.
+        columns (Dict[str, np.ndarray]): Columns from results_store.load_results.
+        keys (np.ndarray): Endpoint key per row (e.g. from analysis.normalize_endpoints); defaults to "endpoint".
+        grace (float): Seconds after a window's end in which alerts still count, to cover IDS processing lag.
+        benign (str): Scenario name of the benign baseline.
+    Returns:
+        Dict[str, List[dict]]: Per IDS, one entry per (scenario, endpoint) with the number of windows, the share
+        of windows with an alert ("detection_rate", or "false_positive_rate" for the benign scenario) and median /
+        minimum time to first alert in seconds.
+    """
+    keys = columns["endpoint"] if keys is None else keys
+    groups = np.stack((columns["scenario"].astype(str), np.asarray(keys).astype(str)), axis=1)
+    names, ids = np.unique(groups, axis=0, return_inverse=True)
+    ids = ids.ravel()
+    counts = np.bincount(ids, minlength=len(names))
+    report = {}
+    for source, ids_name in enumerate(SOURCES):
+        delay = index.first_alerts(columns["started"], columns["finished"] + grace, source)
+        entries = []
+        for e, (scenario, name) in enumerate(names.tolist()):
+            d = delay[ids == e]
+            detected = d[~np.isnan(d)]
+            rate = "false_positive_rate" if scenario == benign else "detection_rate"
+            entries.append({
+                "scenario": scenario,
+                "endpoint": name,
+                "windows": int(counts[e]),
+                rate: float(detected.size / counts[e]),
+                "median_time_to_alert": float(np.median(detected)) if detected.size else None,
+                "min_time_to_alert": float(detected.min()) if detected.size else None,
+            })
+        report[ids_name] = entries
+    return report
+
+
+def main(eve_path: str = SURICATA_EVE, snort_path: str = SNORT_ALERT, year: int = None,
+         alert_dir: str = ALERT_DIR) -> None:
+    """
+    Ingest new alerts from both logs and print the per-endpoint detection report of the stored results.
+    """
+    from results_store import load_results
+
+    index = AlertIndex(alert_dir)
+    print(f"Ingested {index.ingest(eve_path, snort_path, year)} new alerts ({len(index.alerts)} total)")
+    columns = load_results()
+    if columns:
+        for ids_name, entries in detection_report(index, columns).items():
+            print(f"== {ids_name}")
+            for entry in entries:
+                if "false_positive_rate" in entry:
+                    rate = f"FP rate {entry['false_positive_rate']:.2f}"
+                else:
+                    rate = f"detection rate {entry['detection_rate']:.2f} median TTA {entry['median_time_to_alert']}"
+                print(f"{entry['scenario']:8} {entry['endpoint'][:60]:60} windows {entry['windows']:4} {rate}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,286 @@
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+import numpy as np
+
+METRICS_HOST = "127.0.0.1"  # localhost only; the endpoint carries no authentication
+METRICS_PORT = 9464  # 0 picks a free port
+PUBLISH_INTERVAL = 1.0  # seconds between aggregation passes
+RATE_WINDOW = 30  # seconds covered by the rolling rate and percentiles
+SUMMARY_INTERVAL = 10.0  # seconds between terminal summary lines (0 disables them)
+QUANTILES = (0.5, 0.95, 0.99)
+PREFIX = "millibottleneck"
+
+
+def _code_class(status: np.ndarray) -> Dict[str, int]:
+    """
+    Count HTTP statuses by class; status 0 (no response, as from async_client) is "failed".
+    """
+    classes = np.bincount(np.minimum(status.astype(np.int64) // 100, 6), minlength=7)
+    counts = {f"{c}xx": int(classes[c]) for c in range(1, 6) if classes[c]}
+    if classes[0]:
+        counts["failed"] = int(classes[0])
+    return counts
+
+
+class _Watch:
+    """
+    The in-flight timing and status arrays of one in-process benchmark, scanned by the publisher thread.
+    """
+
+    def __init__(self, endpoint: str, method: str, timings: np.ndarray, status: np.ndarray):
+        self.endpoint = endpoint
+        self.method = method
+        self.timings = timings
+        self.status = status
+        self.seen = np.zeros(len(timings), dtype=bool)
+        self.done = False
+
+
+class LiveMetrics:
+    """
+    Live view of a running scenario: Prometheus text on http://127.0.0.1:<port>/metrics and a compact
+    summary line on the terminal.
+    The measurement path never takes a lock or renders anything. The in-process client's preallocated timing
+    arrays are registered with watch() and scanned by the publisher thread once per PUBLISH_INTERVAL (a row
+    counts once its start time is set); ab runs, which only report when they exit, hand their results over
+    with record(). Both only append to a list. The publisher aggregates the batches into the rolling window,
+    reads the container gauges from the shared CgroupSampler and renders the page that scrapes then return
+    as is.
+    """
+
+    def __init__(self, port: int = METRICS_PORT, sampler=None, total_endpoints: int = None,
+                 interval: float = PUBLISH_INTERVAL, window: int = RATE_WINDOW,
+                 summary_interval: float = SUMMARY_INTERVAL):
+        """
+        Args:
+            port (int): Port of the metrics endpoint (0 picks a free one, see .url).
+            sampler (CgroupSampler): Shared sampler the container gauges are read from.
+            total_endpoints (int): Endpoints the run will measure, for the progress gauge.
+            interval (float): Seconds between aggregation passes.
+            window (int): Seconds covered by the rolling request rate and percentiles.
+            summary_interval (float): Seconds between terminal summary lines (0 disables them).
+        """
+        self.port = port
+        self.sampler = sampler
+        self.total_endpoints = total_endpoints
+        self.interval = interval
+        self.summary_interval = summary_interval
+        self.url = None
+        self._watches: List[_Watch] = []
+        self._batches = deque()  # append / popleft are atomic, so producers never lock
+        # One slot per aggregation pass: (time, latencies of the requests completed in it, failures)
+        self._window = deque(maxlen=max(int(window / interval), 1))
+        self._requests: Dict[tuple, int] = {}
+        self._finished = deque()
+        self._current = None
+        self._started = None
+        self._page = b""
+        self._last_summary = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._server = None
+
+    def watch(self, endpoint: str, method: str, timings: np.ndarray, status: np.ndarray) -> _Watch:
+        """
+        Register the arrays an in-process benchmark is filling; pass the result to done() afterwards.
+        """
+        watch = _Watch(endpoint, method, timings, status)
+        self._watches.append(watch)
+        self._current = endpoint
+        return watch
+
+    def done(self, watch: _Watch) -> None:
+        """
+        Mark a watched benchmark finished; the publisher takes its last rows and drops it.
+        """
+        watch.done = True
+
+    def record(self, endpoint: str, method: str, latency: np.ndarray, failed: int = 0) -> None:
+        """
+        Hand over the results of a finished ab run, which cannot be watched: the latencies of its completed
+        requests (counted as 2xx, ab does not report statuses per request) and its failed request count.
+        """
+        status = np.zeros(len(latency) + failed, dtype=np.int16)
+        status[:len(latency)] = 200
+        self._batches.append((endpoint, method, np.concatenate([latency, np.full(failed, np.nan)]), status))
+        self._current = endpoint
+
+    def endpoint_done(self, endpoint: str) -> None:
+        self._finished.append(endpoint)
+
+    def _collect(self) -> list:
+        batches = []
+        while self._batches:
+            batches.append(self._batches.popleft())
+        for watch in list(self._watches):
+            finished = watch.done  # read first, so rows written before it was set are all taken below
+            new = (watch.timings["start"] != 0) & ~watch.seen
+            if new.any():
+                watch.seen |= new
+                batches.append((watch.endpoint, watch.method, watch.timings["latency"][new], watch.status[new]))
+            if finished:
+                self._watches.remove(watch)
+        return batches
+
+    def _aggregate(self, now: float) -> None:
+        latencies, failed = [], 0
+        for endpoint, method, latency, status in self._collect():
+            for code, count in _code_class(status).items():
+                key = (endpoint, method, code)
+                self._requests[key] = self._requests.get(key, 0) + count
+            ok = status != 0
+            failed += int((~ok).sum())
+            latencies.append(latency[ok])
+        self._window.append((now, np.concatenate(latencies) if latencies else np.empty(0), failed))
+
+    def snapshot(self) -> dict:
+        """
+        Rolling rate, error share and percentiles over the window, plus the progress of the run.
+        """
+        slots = list(self._window)
+        span = slots[-1][0] - slots[0][0] + self.interval if slots else 0.0
+        latencies = np.concatenate([slot[1] for slot in slots]) if slots else np.empty(0)
+        failed = sum(slot[2] for slot in slots)
+        completed = len(latencies) + failed
+        quantiles = np.quantile(latencies, QUANTILES) if len(latencies) else [np.nan] * len(QUANTILES)
+        return {
+            "rate": completed / span if span > 0 else 0.0,
+            "error_ratio": failed / completed if completed else 0.0,
+            "quantiles": dict(zip(QUANTILES, (float(q) for q in quantiles))),
+            "requests": sum(self._requests.values()),
+            "http_errors": sum(n for (_, _, code), n in self._requests.items() if code in ("4xx", "5xx")),
+            "failed": sum(n for (_, _, code), n in self._requests.items() if code == "failed"),
+            "endpoints_done": len(self._finished),
+            "current": self._current,
+            "uptime": time.time() - self._started if self._started else 0.0,
+        }
+
+    def _containers(self) -> Dict[str, tuple]:
+        """
+        CPU (cores), throttled share and memory (MB) of every container over the last aggregation interval.
+        """
+        if self.sampler is None or not self.sampler.containers:
+            return {}
+        now = time.time()
+        timestamps, samples = self.sampler.window(now - 2 * self.interval, now)
+        if len(timestamps) < 2:
+            return {}
+        elapsed = (timestamps[-1] - timestamps[0]) * 1e6
+        cpu = (samples[-1, :, 0] - samples[0, :, 0]) / elapsed
+        throttled = (samples[-1, :, 1] - samples[0, :, 1]) / elapsed
+        memory = samples[-1, :, 2] / 1024 / 1024
+        return {name: (float(cpu[i]), float(throttled[i]), float(memory[i]))
+                for i, name in enumerate(self.sampler.containers)}
+
+    def render(self, snapshot: dict, containers: Dict[str, tuple]) -> str:
+        """
+        Prometheus text exposition (version 0.0.4) of a snapshot.
+        """
+        lines = [f"# HELP {PREFIX}_requests_total Requests completed, by endpoint and status class.",
+                 f"# TYPE {PREFIX}_requests_total counter"]
+        for (endpoint, method, code), count in sorted(self._requests.items()):
+            endpoint = endpoint.replace("\\", "\\\\").replace('"', '\\"')
+            lines.append(f'{PREFIX}_requests_total{{endpoint="{endpoint}",method="{method}",code="{code}"}} {count}')
+        lines += [f"# HELP {PREFIX}_request_rate Requests per second over the last {self._window.maxlen * self.interval:.0f} s.",
+                  f"# TYPE {PREFIX}_request_rate gauge",
+                  f"{PREFIX}_request_rate {snapshot['rate']:.3f}",
+                  f"# HELP {PREFIX}_error_ratio Share of requests without a response over the same window.",
+                  f"# TYPE {PREFIX}_error_ratio gauge",
+                  f"{PREFIX}_error_ratio {snapshot['error_ratio']:.6f}",
+                  f"# HELP {PREFIX}_latency_ms Latency percentiles over the same window.",
+                  f"# TYPE {PREFIX}_latency_ms gauge"]
+        for q, value in snapshot["quantiles"].items():
+            lines.append(f'{PREFIX}_latency_ms{{quantile="{q}"}} {value:.3f}')
+        lines += [f"# HELP {PREFIX}_endpoints_done Endpoints measured so far.",
+                  f"# TYPE {PREFIX}_endpoints_done gauge",
+                  f"{PREFIX}_endpoints_done {snapshot['endpoints_done']}",
+                  f"# TYPE {PREFIX}_uptime_seconds gauge",
+                  f"{PREFIX}_uptime_seconds {snapshot['uptime']:.1f}"]
+        if self.total_endpoints is not None:
+            lines += [f"# TYPE {PREFIX}_endpoints_total gauge", f"{PREFIX}_endpoints_total {self.total_endpoints}"]
+        if containers:
+            for metric, index, help in (("container_cpu_cores", 0, "CPU used, in cores."),
+                                        ("container_cpu_throttled", 1, "Share of time the CPU was throttled."),
+                                        ("container_memory_mb", 2, "memory.current, in MB.")):
+                lines += [f"# HELP {PREFIX}_{metric} {help}", f"# TYPE {PREFIX}_{metric} gauge"]
+                for name, values in containers.items():
+                    lines.append(f'{PREFIX}_{metric}{{container="{name}"}} {values[index]:.3f}')
+        return "\n".join(lines) + "\n"
+
+    def summary(self, snapshot: dict = None, containers: Dict[str, tuple] = None) -> str:
+        """
+        One-line terminal summary.
+        """
+        s = snapshot or self.snapshot()
+        q = s["quantiles"]
+        progress = f"{s['endpoints_done']}/{self.total_endpoints}" if self.total_endpoints else str(s["endpoints_done"])
+        line = (f"{progress} endpoints, {s['requests']} requests, {s['rate']:.0f} req/s, "
+                f"{s['failed']} failed, {s['http_errors']} HTTP errors, "
+                f"p50 {q[0.5]:.1f} p95 {q[0.95]:.1f} p99 {q[0.99]:.1f} ms, at {s['current']}")
+        busiest = sorted((containers or {}).items(), key=lambda item: -item[1][0])[:3]
+        if busiest:
+            line += "; " + ", ".join(f"{name} {cpu:.2f} cores {memory:.0f} MB" for name, (cpu, _, memory) in busiest)
+        return line
+
+    def _run(self) -> None:
+        next_tick = time.perf_counter()
+        while not self._stop.is_set():
+            next_tick += self.interval
+            self._stop.wait(max(next_tick - time.perf_counter(), 0))
+            self._publish()
+
+    def _publish(self) -> None:
+        now = time.time()
+        self._aggregate(now)
+        snapshot, containers = self.snapshot(), self._containers()
+        self._page = self.render(snapshot, containers).encode()
+        if self.summary_interval and now - self._last_summary >= self.summary_interval:
+            self._last_summary = now
+            print(f"[Live] {self.summary(snapshot, containers)}")
+
+    def start(self) -> "LiveMetrics":
+        metrics = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                page = metrics._page
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+                self.send_header("Content-Length", str(len(page)))
+                self.end_headers()
+                self.wfile.write(page)
+
+            def log_message(self, *args):
+                pass
+
+        self._started = time.time()
+        self._last_summary = self._started
+        self._server = ThreadingHTTPServer((METRICS_HOST, self.port), Handler)
+        self._server.daemon_threads = True
+        self.url = f"http://{METRICS_HOST}:{self._server.server_port}/metrics"
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """
+        Take the last rows, print a final summary and shut the endpoint down.
+        """
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self._aggregate(time.time())
+        if self.summary_interval:
+            print(f"[Live] {self.summary()}")
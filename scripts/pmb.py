@@ -0,0 +1,131 @@
+import warnings
+import numpy as np
+
+# Per-request timing record. Start is an epoch timestamp in seconds, the
+# remaining fields are milliseconds as reported by the load generator
+# (ab does not report time to first byte; it is NaN for ab runs).
+TIMING_DTYPE = np.dtype([
+    ("start", "f8"),
+    ("connect", "f4"),
+    ("processing", "f4"),
+    ("ttfb", "f4"),
+    ("latency", "f4"),
+])
+
+# One millibottleneck episode: the union of overlapping over-threshold requests.
+EPISODE_DTYPE = np.dtype([
+    ("start", "f8"),
+    ("duration", "f4"),
+    ("depth", "f4"),
+    ("count", "i4"),
+])
+
+# Columns of ab's -g (gnuplot) output: starttime, seconds, ctime, dtime, ttime, wait
+AB_GNUPLOT_COLUMNS = (1, 2, 3, 4)
+
+
+def empty_timings(n: int = 0) -> np.ndarray:
+    """
+    Allocate a timing array for n requests.
+    Args:
+        n (int): Number of requests.
+    Returns:
+        np.ndarray: Zeroed array with TIMING_DTYPE.
+    """
+    return np.zeros(n, dtype=TIMING_DTYPE)
+
+
+def load_ab_gnuplot(path: str) -> np.ndarray:
+    """
+    Load per-request timings written by `ab -g <path>`.
+    ab only records the start second of each request and writes the rows sorted
+    by total time, so the result is re-sorted by start time.
+    Args:
+        path (str): Path to the gnuplot TSV file.
+    Returns:
+        np.ndarray: Timings with TIMING_DTYPE, ordered by start time.
+    """
+    with warnings.catch_warnings():
+        # ab leaves only the header behind when every request failed
+        warnings.simplefilter("ignore", UserWarning)
+        raw = np.loadtxt(path, delimiter="\t", skiprows=1, usecols=AB_GNUPLOT_COLUMNS, dtype=np.float64, ndmin=2)
+    timings = empty_timings(len(raw))
+    if len(raw):
+        timings["start"] = raw[:, 0]
+        timings["connect"] = raw[:, 1]
+        timings["processing"] = raw[:, 2]
+        timings["ttfb"] = np.nan
+        timings["latency"] = raw[:, 3]
+        timings.sort(order="start", kind="stable")
+    return timings
+
+
+def find_episodes(start: np.ndarray, latency: np.ndarray, threshold: float, merge_gap: float = 0.0,
+                  max_duration: float = None) -> np.ndarray:
+    """
+    Find millibottleneck episodes in a set of requests.
+    Every request slower than the threshold covers the interval [start, start + latency];
+    overlapping intervals (or ones closer than merge_gap) are merged into one episode.
+    Args:
+        start (np.ndarray): Request start times in seconds.
+        latency (np.ndarray): Request latencies in milliseconds.
+        threshold (float): Latency threshold in milliseconds.
+        merge_gap (float): Largest gap in milliseconds still treated as the same episode.
+        max_duration (float): Drop episodes longer than this many milliseconds (None keeps all).
+    Returns:
+        np.ndarray: Episodes with EPISODE_DTYPE, ordered by start time.
+    """
+    start = np.asarray(start, dtype=np.float64)
+    latency = np.asarray(latency, dtype=np.float64)
+    over = latency > threshold
+    if not over.any():
+        return np.zeros(0, dtype=EPISODE_DTYPE)
+
+    s = start[over]
+    lat = latency[over]
+    order = np.argsort(s, kind="stable")
+    s = s[order]
+    lat = lat[order]
+    e = s + lat / 1000.0
+
+    # A new episode begins wherever a request starts after every earlier one has ended
+    reach = np.maximum.accumulate(e)
+    breaks = np.flatnonzero(s[1:] > reach[:-1] + merge_gap / 1000.0) + 1
+    heads = np.concatenate(([0], breaks))
+
+    episodes = np.zeros(len(heads), dtype=EPISODE_DTYPE)
+    episodes["start"] = s[heads]
+    episodes["duration"] = (np.maximum.reduceat(e, heads) - s[heads]) * 1000.0
+    episodes["depth"] = np.maximum.reduceat(lat, heads)
+    episodes["count"] = np.diff(np.concatenate((heads, [len(s)])))
+    if max_duration is not None:
+        episodes = episodes[episodes["duration"] <= max_duration]
+    return episodes
+
+
+def summarize_pmb(latency: np.ndarray, threshold: float) -> tuple[float, float, int]:
+    """
+    Calculate the percentile millibottleneck (PMB) for requests above a threshold.
+    Args:
+        latency (np.ndarray): Request latencies in milliseconds.
+        threshold (float): Latency threshold in milliseconds.
+    Returns:
+        tuple: PMB, total PMB time, and the count of requests over the threshold.
+    """
+    latency = np.asarray(latency, dtype=np.float64)
+    over = latency[latency > threshold]
+    total_pmb_time = float(over.sum())
+    requests_over_threshold = int(over.size)
+    pmb = (total_pmb_time / requests_over_threshold) if requests_over_threshold > 0 else 0.0
+    return pmb, total_pmb_time, requests_over_threshold
+
+
+def bottleneck_length(episodes: np.ndarray) -> float:
+    """
+    Total time in milliseconds spent inside millibottleneck episodes.
+    Args:
+        episodes (np.ndarray): Episodes with EPISODE_DTYPE.
+    Returns:
+        float: Sum of episode durations.
+    """
+    return float(episodes["duration"].sum()) if len(episodes) else 0.0
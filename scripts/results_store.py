@@ -0,0 +1,345 @@
+import csv
+import glob
+import math
+import os
+import queue
+import secrets
+import threading
+import time
+import urllib.parse
+from typing import Dict, List
+import numpy as np
+from hdr_histogram import HdrHistogram, merge_all
+from harness_profile import stage
+
+STORE_DIR = "./results/store"
+BATCH_SIZE = 64
+FLUSH_INTERVAL = 5.0  # seconds
+
+PERCENTILES = ("50%", "66%", "75%", "80%", "90%", "95%", "98%", "99%", "100%")
+PERCENTILE_COLUMNS = tuple(f"p{p[:-1]}" for p in PERCENTILES)
+
+# Typed per-row columns; strings are stored as fixed-width unicode sized per batch
+STRING_COLUMNS = ("run_id", "scenario", "method", "endpoint", "url")
+NUMERIC_COLUMNS = {
+    "started": np.float64,
+    "finished": np.float64,
+    "failed": np.int32,
+    **{name: np.float32 for name in PERCENTILE_COLUMNS},
+    "bottleneck_length": np.float32,
+    "memory_mb": np.float32,
+    "network_mbps": np.float32,
+    "endpoint_id": np.int32,  # interned "METHOD template" key, see endpoint_index (0 = unknown)
+}
+# Per-request arrays, stored flat with one offset per row (CSR layout)
+ARRAY_COLUMNS = {"request_start": np.float64, "latency": np.float32}
+# Serialized per-row objects, stored as one byte blob with "<name>_offsets"
+BLOB_COLUMNS = ("histogram",)
+
+CSV_HEADER = [
+    "URL", "Failed Requests", *PERCENTILES,
+    "Bottleneck Length", "Average Memory Usage (MB)", "Average Network Usage (MBps)",
+    "Endpoint Id", "Endpoint"
+]
+
+
+def new_run_id(scenario: str) -> str:
+    """
+    Build a run id from the scenario name, the current time and random bits.
+    Batch files are named after the run id, so two runs started in the same second must not share it.
+    """
+    return f"{scenario}-{time.strftime('%Y%m%d-%H%M%S')}-{secrets.token_hex(3)}"
+
+
+def _to_float(value) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def write_batch(path: str, records: List[dict]) -> None:
+    """
+    Write a list of result records as one columnar .npz batch.
+    Args:
+        path (str): Output file.
+        records (List[dict]): Records with the keys of STRING_COLUMNS, NUMERIC_COLUMNS, ARRAY_COLUMNS and
+            BLOB_COLUMNS (an HdrHistogram for "histogram").
+    """
+    columns = {}
+    for name in STRING_COLUMNS:
+        columns[name] = np.array([str(r.get(name) or "") for r in records])
+    for name, dtype in NUMERIC_COLUMNS.items():
+        if np.issubdtype(dtype, np.integer):
+            columns[name] = np.array([int(r.get(name) or 0) for r in records], dtype=dtype)
+        else:
+            columns[name] = np.array([_to_float(r.get(name)) for r in records], dtype=dtype)
+    lengths = [len(r.get("latency", ())) for r in records]
+    columns["offsets"] = np.concatenate(([0], np.cumsum(lengths))).astype(np.int64)
+    for name, dtype in ARRAY_COLUMNS.items():
+        parts = [np.asarray(r.get(name, ()), dtype=dtype) for r in records]
+        columns[name] = np.concatenate(parts) if parts else np.zeros(0, dtype=dtype)
+    for name in BLOB_COLUMNS:
+        blobs = [r[name].to_bytes() if r.get(name) is not None else b"" for r in records]
+        columns[f"{name}_offsets"] = np.concatenate(([0], np.cumsum([len(b) for b in blobs]))).astype(np.int64)
+        columns[name] = np.frombuffer(b"".join(blobs), dtype=np.uint8)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.savez(f, **columns)
+    os.replace(tmp_path, path)
+
+
+def load_results(store_dir: str = STORE_DIR, run_ids: List[str] = None) -> Dict[str, np.ndarray]:
+    """
+    Load every batch of a results store into one set of columns.
+    Args:
+        store_dir (str): Directory holding .npz batches.
+        run_ids (List[str]): Only load these runs (None loads everything).
+    Returns:
+        Dict[str, np.ndarray]: Column name to array; per-request arrays are flat with "offsets" marking row i
+        as [offsets[i], offsets[i + 1]).
+    """
+    paths = sorted(glob.glob(os.path.join(store_dir, "*.npz")))
+    if run_ids is not None:
+        paths = [p for p in paths if any(os.path.basename(p).startswith(f"{r}-b") for r in run_ids)]
+    batches = []
+    for path in paths:
+        with np.load(path) as data:
+            batches.append({name: data[name] for name in data.files})
+    if not batches:
+        return {}
+
+    columns = {}
+    for name in (*STRING_COLUMNS, *ARRAY_COLUMNS):
+        columns[name] = np.concatenate([b[name] for b in batches])
+    for name, dtype in NUMERIC_COLUMNS.items():
+        # Batches written before a numeric column existed contribute zeros
+        columns[name] = np.concatenate([b.get(name, np.zeros(len(b["url"]), dtype=dtype)) for b in batches])
+    offsets = [np.zeros(1, dtype=np.int64)]
+    total = 0
+    for b in batches:
+        offsets.append(b["offsets"][1:] + total)
+        total += int(b["offsets"][-1])
+    columns["offsets"] = np.concatenate(offsets)
+    for name in BLOB_COLUMNS:
+        # Batches written before a blob column existed contribute empty blobs
+        blobs = [b.get(name, np.zeros(0, dtype=np.uint8)) for b in batches]
+        blob_offsets = [b.get(f"{name}_offsets", np.zeros(len(b["url"]) + 1, dtype=np.int64)) for b in batches]
+        columns[name] = np.concatenate(blobs)
+        shifted = [np.zeros(1, dtype=np.int64)]
+        total = 0
+        for o in blob_offsets:
+            shifted.append(o[1:] + total)
+            total += int(o[-1])
+        columns[f"{name}_offsets"] = np.concatenate(shifted)
+    return columns
+
+
+def row_latencies(columns: Dict[str, np.ndarray], row: int) -> np.ndarray:
+    """
+    Per-request latencies of one loaded row (a view, no copy).
+    """
+    offsets = columns["offsets"]
+    return columns["latency"][offsets[row]:offsets[row + 1]]
+
+
+def row_histogram(columns: Dict[str, np.ndarray], row: int) -> HdrHistogram:
+    """
+    Latency histogram of one loaded row; rows without a stored histogram are rebuilt from their latencies.
+    """
+    offsets = columns["histogram_offsets"]
+    blob = columns["histogram"][offsets[row]:offsets[row + 1]]
+    return HdrHistogram.from_bytes(blob.tobytes()) if blob.size else HdrHistogram().record(row_latencies(columns, row))
+
+
+def group_histograms(columns: Dict[str, np.ndarray], by: tuple = ("endpoint",)) -> Dict[tuple, HdrHistogram]:
+    """
+    Merge the row histograms of loaded results per group, e.g. by ("scenario", "method", "endpoint") or
+    ("run_id",); percentiles of any group are then read with HdrHistogram.percentiles.
+    Args:
+        columns (Dict[str, np.ndarray]): Columns from load_results.
+        by (tuple): Column names forming the group key.
+    Returns:
+        Dict[tuple, HdrHistogram]: Group key to merged histogram.
+    """
+    groups = {}
+    for row, key in enumerate(zip(*(columns[name].tolist() for name in by))):
+        groups.setdefault(key, []).append(row_histogram(columns, row))
+    return {key: merge_all(histograms) for key, histograms in groups.items()}
+
+
+class ResultsWriter:
+    """
+    Single writer for endpoint results.
+    Worker threads submit records to a queue; one background thread appends the CSV rows and writes the
+    records as typed columnar .npz batches, so concurrent workers never share a file handle.
+    A batch that cannot be written (disk full, permissions, ...) is reported and dropped, the thread keeps
+    draining the queue, and close() re-raises the first such error.
+    """
+
+    def __init__(self, run_id: str, scenario: str, store_dir: str = STORE_DIR, csv_file: str = None,
+                 batch_size: int = BATCH_SIZE, flush_interval: float = FLUSH_INTERVAL, endpoint_index=None):
+        """
+        Args:
+            run_id (str): Id stamped on every record and batch file of this run.
+            scenario (str): Scenario name stamped on every record.
+            store_dir (str): Directory for the .npz batches.
+            csv_file (str): Optional CSV that also receives one row per record (header written by the caller).
+            batch_size (int): Records per .npz batch.
+            flush_interval (float): Longest time in seconds a record waits before its batch is written.
+            endpoint_index (EndpointIndex): Key table that stamps every record with its endpoint id; it is
+                saved when the writer is closed.
+        """
+        self.endpoint_index = endpoint_index
+        self.run_id = run_id
+        self.scenario = scenario
+        self.store_dir = store_dir
+        self.csv_file = csv_file
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._sequence = 0
+        self.error = None
+        self.lost = 0
+        os.makedirs(store_dir, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name="results-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, record: dict) -> None:
+        """
+        Queue one result record. Safe to call from any thread.
+        """
+        record.setdefault("run_id", self.run_id)
+        record.setdefault("scenario", self.scenario)
+        self._queue.put(record)
+
+    def close(self) -> None:
+        """
+        Flush everything that is queued and stop the writer thread.
+        Raises the first error of the writer thread, after everything that could be written was.
+        """
+        self._queue.put(None)
+        self._thread.join()
+        if self.endpoint_index is not None:
+            self.endpoint_index.save()
+        if self.error is not None:
+            raise self.error
+
+    def _flush(self, batch: List[dict], csv_writer, csv_handle=None) -> None:
+        if not batch:
+            return
+        try:
+            with stage("store_flush"):
+                self._write(batch, csv_writer, csv_handle)
+        except Exception as e:
+            # Keep the thread alive: later batches may still be written, and submit() never blocks on it
+            self.lost += len(batch)
+            print(f"[Error] Results writer could not write {len(batch)} records of {self.run_id}: {e}")
+            if self.error is None:
+                self.error = e
+
+    def _write(self, batch: List[dict], csv_writer, csv_handle=None) -> None:
+        if self.endpoint_index is not None:
+            # Interned on the writer thread only, so the key table needs no lock
+            for r in batch:
+                r.setdefault("endpoint_id", self.endpoint_index.resolve(r.get("method"), r.get("endpoint"), ""))
+        self._sequence += 1
+        write_batch(os.path.join(self.store_dir, f"{self.run_id}-b{self._sequence:06d}.npz"), batch)
+        if csv_writer is not None:
+            for r in batch:
+                csv_writer.writerow([
+                    r.get("url"), r.get("failed"), *(r.get(name) for name in PERCENTILE_COLUMNS),
+                    r.get("bottleneck_length"), r.get("memory_mb"), r.get("network_mbps"),
+                    r.get("endpoint_id", ""), f"{r.get('method') or '*'} {r['endpoint']}" if r.get("endpoint") else ""
+                ])
+            csv_handle.flush()
+
+    def _run(self) -> None:
+        csv_handle = None
+        try:
+            csv_handle = open(self.csv_file, mode='a', newline='') if self.csv_file else None
+        except OSError as e:
+            # The .npz batches are still written
+            print(f"[Error] Results writer cannot open {self.csv_file}: {e}")
+            self.error = e
+        csv_writer = csv.writer(csv_handle) if csv_handle else None
+        batch = []
+        deadline = None
+        try:
+            while True:
+                timeout = None if deadline is None else max(0.0, deadline - time.monotonic())
+                try:
+                    record = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    # Flush interval elapsed with a partial batch
+                    self._flush(batch, csv_writer, csv_handle)
+                    batch, deadline = [], None
+                    continue
+                if record is None:
+                    break
+                batch.append(record)
+                if deadline is None:
+                    deadline = time.monotonic() + self.flush_interval
+                if len(batch) >= self.batch_size:
+                    self._flush(batch, csv_writer, csv_handle)
+                    batch, deadline = [], None
+            self._flush(batch, csv_writer, csv_handle)
+        finally:
+            if csv_handle:
+                csv_handle.close()
+
+
+def convert_csv(csv_path: str, store_dir: str = STORE_DIR, scenario: str = None, run_id: str = None) -> int:
+    """
+    Convert an existing results CSV (results/*.csv or spring/Documents/*_response_time.csv) into a store batch.
+    Columns are matched by position, since the older files name them differently; the method and endpoint
+    template are only known for files backfilled by endpoint_index and are left empty otherwise.
+    Args:
+        csv_path (str): CSV file to convert.
+        store_dir (str): Store directory.
+        scenario (str): Scenario name; guessed from the file name when None.
+        run_id (str): Run id; derived from the file name when None.
+    Returns:
+        int: Number of converted rows.
+    """
+    name = os.path.splitext(os.path.basename(csv_path))[0]
+    scenario = scenario or ("benign" if "benign" in name else "attack")
+    run_id = run_id or f"legacy-{name}"
+    finished = os.path.getmtime(csv_path)
+    records = []
+    with open(csv_path, newline='') as f:
+        reader = csv.reader(f)
+        next(reader, None)
+        for row in reader:
+            if not row:
+                continue
+            row = row + [""] * (len(CSV_HEADER) - len(row))
+            url = urllib.parse.urlsplit(row[0])
+            record = {
+                "run_id": run_id,
+                "scenario": scenario,
+                "url": url.path + (f"?{url.query}" if url.query else ""),
+                "failed": int(_to_float(row[1])) if row[1].strip().isdigit() else 0,
+                "finished": finished,
+                "bottleneck_length": row[11],
+                "memory_mb": row[12],
+                "network_mbps": row[13],
+            }
+            # Files backfilled by endpoint_index carry the matched "METHOD template" key
+            method, _, endpoint = row[15].partition(" ")
+            if endpoint:
+                record["method"] = "" if method == "*" else method
+                record["endpoint"] = endpoint
+                record["endpoint_id"] = int(_to_float(row[14])) if row[14].strip().isdigit() else 0
+            record.update(zip(PERCENTILE_COLUMNS, row[2:11]))
+            records.append(record)
+    os.makedirs(store_dir, exist_ok=True)
+    if records:
+        write_batch(os.path.join(store_dir, f"{run_id}-b000000.npz"), records)
+    return len(records)
+
+
+if __name__ == "__main__":
+    # Convert the CSV results already in the repository
+    for path in sorted(glob.glob("./results/*.csv") + glob.glob("./spring/Documents/*_response_time.csv")):
+        print(f"Converted {convert_csv(path)} rows from {path}")
@@ -0,0 +1,196 @@
+import math
+from statistics import NormalDist
+from typing import Callable
+import numpy as np
+from pmb import empty_timings
+from hdr_histogram import HdrHistogram
+
+TARGET_PERCENTILES = (50, 95, 99)
+CONFIDENCE = 0.95
+TOLERANCES = (0.02, 0.05, 0.10)  # largest CI half-width relative to the estimate, per target percentile
+FLOOR_MS = 0.5  # half-widths below this are within timer / scheduler noise and always accepted
+MIN_SAMPLES = 500  # per endpoint; p99 needs a few requests above it before its CI means anything
+MAX_SAMPLES = 7000  # per endpoint, the fixed count of the non-adaptive mode
+BATCH_SAMPLES = 250  # smallest batch sent between two stopping checks
+STOP_REASONS = ("precise", "max_samples", "failed")
+
+
+def quantile_ci(samples, percentiles: tuple = TARGET_PERCENTILES,
+                confidence: float = CONFIDENCE) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Distribution-free confidence intervals of percentiles, read off a histogram or a sorted sample.
+    The rank of the q-quantile among n samples is Binomial(n, q), so the interval runs between the order
+    statistics at n*q -/+ z*sqrt(n*q*(1-q)). With a histogram both are looked up in its buckets, which keeps the
+    check O(buckets) however many samples were recorded; with a sorted array they are indexed exactly.
+    Args:
+        samples: HdrHistogram, or np.ndarray of values sorted ascending.
+        percentiles (tuple): Percentiles (0-100).
+        confidence (float): Confidence level of the intervals.
+    Returns:
+        tuple: Estimate, lower and upper bound (ms) per percentile (NaN without samples).
+    """
+    q = np.asarray(percentiles, dtype=np.float64) / 100.0
+    if isinstance(samples, HdrHistogram):
+        n = samples.total
+        lookup = lambda ranks: samples.percentiles(ranks / n * 100.0)
+        estimate = samples.percentiles(q * 100.0)
+    else:
+        n = samples.size
+        lookup = lambda ranks: samples[ranks.astype(np.int64) - 1].astype(np.float64)
+        estimate = lookup(np.clip(np.ceil(q * n), 1, n)) if n else np.full(q.shape, np.nan)
+    if not n:
+        return estimate, estimate.copy(), estimate.copy()
+    z = NormalDist().inv_cdf(0.5 + confidence / 2.0)
+    spread = z * np.sqrt(n * q * (1.0 - q))
+    lower_rank = np.clip(np.floor(n * q - spread), 1, n)
+    upper_rank = np.clip(np.ceil(n * q + spread), 1, n)
+    return estimate, lookup(lower_rank), lookup(upper_rank)
+
+
+def relative_half_width(estimate: np.ndarray, lower: np.ndarray, upper: np.ndarray,
+                        floor_ms: float = FLOOR_MS) -> np.ndarray:
+    """
+    Half-width of each interval relative to its estimate; intervals narrower than floor_ms count as 0.
+    """
+    half = (upper - lower) / 2.0
+    return np.where(half <= floor_ms, 0.0, half / np.maximum(estimate, 1e-9))
+
+
+def _broadcast(tolerance, percentiles: tuple) -> np.ndarray:
+    return np.broadcast_to(np.asarray(tolerance, dtype=np.float64), (len(percentiles),))
+
+
+class SequentialStop:
+    """
+    Sequential early stopping of one endpoint measurement at a time.
+    run() sends batches through a send callable and records them into an HDR histogram; after each batch the
+    percentile CIs are checked, and sampling stops once every target percentile is within its tolerance (after at
+    least min_samples successful requests) or max_samples requests were sent. Since the CI width shrinks with
+    1/sqrt(n), the next batch is sized to the sample count the current widths predict, so most endpoints need
+    only two or three checks. The achieved precision of every endpoint is kept in report.
+    """
+
+    def __init__(self, percentiles: tuple = TARGET_PERCENTILES, confidence: float = CONFIDENCE,
+                 tolerance: tuple = TOLERANCES, min_samples: int = MIN_SAMPLES, max_samples: int = MAX_SAMPLES,
+                 batch_samples: int = BATCH_SAMPLES, floor_ms: float = FLOOR_MS):
+        """
+        Args:
+            percentiles (tuple): Target percentiles (0-100).
+            confidence (float): Confidence level of the intervals.
+            tolerance (tuple): Largest accepted CI half-width relative to the estimate, per percentile (or one
+                float for all of them).
+            min_samples (int): Successful requests required before stopping.
+            max_samples (int): Requests after which sampling stops regardless of precision.
+            batch_samples (int): Smallest batch between two checks.
+            floor_ms (float): Half-widths below this are accepted whatever their relative size.
+        """
+        self.percentiles = percentiles
+        self.confidence = confidence
+        self.tolerance = _broadcast(tolerance, percentiles)
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.batch_samples = batch_samples
+        self.floor_ms = floor_ms
+        self.report = []
+
+    def _next_batch(self, sent: int, successful: int, excess: float) -> int:
+        if successful < self.min_samples:
+            needed = self.min_samples - successful
+        elif math.isfinite(excess) and excess > 0:
+            # Width ~ 1/sqrt(n): the sample count at which the worst interval should meet its tolerance
+            needed = int(math.ceil(successful * excess ** 2)) - successful
+        else:
+            needed = self.batch_samples
+        return int(min(max(needed, self.batch_samples), self.max_samples - sent))
+
+    def run(self, send: Callable[[int], tuple[np.ndarray, np.ndarray]], method: str = None,
+            endpoint: str = None) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Measure one endpoint until its percentiles are precise enough.
+        Args:
+            send (Callable): send(n) sends n requests and returns (timings, status) like
+                async_client.run_benchmark.
+            method (str): Recorded in the report.
+            endpoint (str): Recorded in the report.
+        Returns:
+            tuple: Timings and status of all requests sent, in send order.
+        """
+        histogram = HdrHistogram()
+        timings, status = [empty_timings()], [np.zeros(0, dtype=np.int16)]
+        sent = successful = checks = 0
+        excess = math.inf  # largest ratio of relative half-width to tolerance
+        reason = "max_samples"
+        while sent < self.max_samples:
+            batch_timings, batch_status = send(self._next_batch(sent, successful, excess))
+            timings.append(batch_timings)
+            status.append(batch_status)
+            sent += len(batch_status)
+            ok = batch_status != 0
+            successful += int(ok.sum())
+            histogram.record(batch_timings["latency"][ok])
+            estimate, lower, upper = quantile_ci(histogram, self.percentiles, self.confidence)
+            excess = float(np.max(relative_half_width(estimate, lower, upper, self.floor_ms) / self.tolerance))
+            checks += 1
+            if not len(batch_status):
+                break
+            if successful >= self.min_samples and excess <= 1.0:
+                reason = "precise"
+                break
+        if not successful:
+            reason = "failed"
+        estimate, lower, upper = quantile_ci(histogram, self.percentiles, self.confidence)
+        width = relative_half_width(estimate, lower, upper, self.floor_ms)
+        row = {"method": method, "endpoint": endpoint, "requests": sent, "successful": successful, "checks": checks,
+               "stopped": reason}
+        for q, values in zip(self.percentiles, np.stack((estimate, lower, upper, width), axis=1)):
+            row.update({f"p{q}": float(values[0]), f"p{q}_lower": float(values[1]), f"p{q}_upper": float(values[2]),
+                        f"p{q}_half_width": float(values[3])})
+        self.report.append(row)
+        return np.concatenate(timings), np.concatenate(status)
+
+    def summary(self) -> dict:
+        """
+        Totals over all measured endpoints: requests sent, the share saved against max_samples each, and how
+        many endpoints stopped for each reason.
+        """
+        requests = sum(row["requests"] for row in self.report)
+        budget = self.max_samples * len(self.report)
+        return {"endpoints": len(self.report), "requests": requests,
+                "saved": 1.0 - requests / budget if budget else 0.0,
+                **{reason: sum(row["stopped"] == reason for row in self.report) for reason in STOP_REASONS}}
+
+    def write_report(self, csv_file: str) -> None:
+        """
+        Write the achieved precision of every endpoint to a CSV file.
+        """
+        import csv
+
+        if not self.report:
+            return
+        with open(csv_file, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=list(self.report[0]))
+            writer.writeheader()
+            writer.writerows(self.report)
+
+
+if __name__ == "__main__":
+    # Compare sequential stopping with the fixed sample count on synthetic latency distributions
+    rng = np.random.default_rng(7)
+
+    def synthetic(scale: float, sigma: float) -> Callable[[int], tuple[np.ndarray, np.ndarray]]:
+        def send(n: int) -> tuple[np.ndarray, np.ndarray]:
+            timings = empty_timings(n)
+            timings["latency"] = rng.lognormal(np.log(scale), sigma, n)
+            return timings, np.full(n, 200, dtype=np.int16)
+        return send
+
+    stop = SequentialStop()
+    for i, (scale, sigma) in enumerate([(5, 0.2), (20, 0.4), (50, 0.8), (3, 1.2), (100, 0.3)]):
+        sample_timings, _ = stop.run(synthetic(scale, sigma), "GET", f"/synthetic/{i}")
+        reference = np.percentile(synthetic(scale, sigma)(200_000)[0]["latency"], TARGET_PERCENTILES)
+        row = stop.report[-1]
+        print(f"sigma {sigma}: {row['requests']} requests, {row['stopped']}, "
+              f"half-widths {row['p50_half_width'] * 100:.1f}/{row['p95_half_width'] * 100:.1f}/"
+              f"{row['p99_half_width'] * 100:.1f}%, "
+              f"p99 {row['p99']:.1f} [{row['p99_lower']:.1f}, {row['p99_upper']:.1f}] vs {reference[2]:.1f}")
+    print(stop.summary())
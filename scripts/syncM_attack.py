@@ -1,29 +1,47 @@
+import http.client
 import subprocess
+import tempfile
 import time
+import os
+import urllib.parse
 from typing import List
-
-# Global Constants and Variables
+import numpy as np
+from pmb import load_ab_gnuplot, find_episodes, summarize_pmb, bottleneck_length
+from docker_stats import DockerStatsCollector, STATS_FIELDS
+from hdr_histogram import HdrHistogram, merge_all
+from mitigation_proxy import start_proxy, stop_proxy
+from helper import parse_ab_report
+from results_store import ResultsWriter, new_run_id
+from endpoint_index import EndpointIndex
+
+# Global Constants and Variables (defaults of main(); the CLI overrides them from a config file or flags)
+UPSTREAM = "http://172.18.16.1"
 ENDPOINTS = {
-    "login": "http://172.18.16.1/login",
-    "catalogue": "http://172.18.16.1/catalogue",
-    "cart": "http://172.18.16.1/cart",
-    "update": "http://172.18.16.1/cart",
-    "orders": "http://172.18.16.1/orders",
-    "customers": "http://172.18.16.1/customers/1",
-    "cards": "http://172.18.16.1/cards",
-    "register": "http://172.18.16.1/register",
+    "login": "/login",
+    "catalogue": "/catalogue",
+    "cart": "/cart",
+    "update": "/cart",
+    "orders": "/orders",
+    "customers": "/customers/1",
+    "cards": "/cards",
+    "register": "/register",
 }
 
 TOTAL_REQUESTS = 7000
 CONCURRENCY = 10
 THRESHOLD = 500
+DEBUG = True
 REST_DURATION = 1
 LONG_OFF_DURATION = 5
+PROXY_POLICY = None  # e.g. "adaptive_timeout" to send the bursts through the mitigation proxy
+SCENARIO = "bursty"  # scenario name of the stored results
 
 OUTPUT_FILE = "latency_results.txt"
 DOCKER_STATS_FILE = "docker_memory_usage.txt"
 PMB_FILE = "pmb_results.txt"
 GLOBAL_PMB_FILE = "global_pmb_results.txt"
+HISTOGRAM_FILE = "latency_histograms.npz"
+REPORTED_PERCENTILES = (50, 95, 99, 99.9)
 
 # Global PMB tracking
 TOTAL_PMB_TIME = 0
@@ -46,81 +64,84 @@ def run_command(command: List[str]) -> str:
         return e.output
 
 
-def run_ab_test(endpoint_name: str, endpoint_url: str) -> None:
+def run_ab_test(endpoint_name: str, endpoint_url: str, collector: DockerStatsCollector = None,
+                store: ResultsWriter = None, n_requests: int = TOTAL_REQUESTS, n_concurrency: int = CONCURRENCY,
+                threshold: float = THRESHOLD, verbose: bool = DEBUG) -> HdrHistogram:
     """
     Run Apache Bench (ab) test for a given endpoint and calculate PMB.
     Args:
         endpoint_name (str): Name of the endpoint.
         endpoint_url (str): URL of the endpoint.
+        collector (DockerStatsCollector): Running stats collector; its samples for the test window are written out.
+        store (ResultsWriter): Results store that receives the test as one record with its per-request timings.
+        n_requests (int): Requests of the burst.
+        n_concurrency (int): Concurrent connections of the burst.
+        threshold (float): Millibottleneck threshold in ms.
+        verbose (bool): Print progress.
+    Returns:
+        HdrHistogram: Latency histogram of the test, for merging per cycle and per run.
     """
     global TOTAL_PMB_TIME, TOTAL_REQUESTS_OVER_THRESHOLD
 
-    print(f"Testing endpoint: {endpoint_name} ({endpoint_url})")
-
-    # Run Apache Bench (ab) and capture the output
-    ab_command = ["ab", "-n", str(TOTAL_REQUESTS), "-c", str(CONCURRENCY), endpoint_url]
-    ab_result = run_command(ab_command)
+    if verbose:
+        print(f"Testing endpoint: {endpoint_name} ({endpoint_url})")
 
-    # Extract 95th and 99th percentile latencies
-    p95 = extract_percentile_latency(ab_result, "95%")
-    p99 = extract_percentile_latency(ab_result, "99%")
+    # Run Apache Bench (ab), capturing per-request timings through its gnuplot output
+    with tempfile.NamedTemporaryFile(delete=False, suffix=".tsv") as timings_file:
+        timings_path = timings_file.name
+    try:
+        ab_command = ["ab", "-n", str(n_requests), "-c", str(n_concurrency), "-g", timings_path, endpoint_url]
+        window_start = time.time()
+        ab_result = run_command(ab_command)
+        window_end = time.time()
+        timings = load_ab_gnuplot(timings_path)
+    finally:
+        os.remove(timings_path)
+
+    # 95th and 99th percentile latencies from the per-request timings
+    histogram = HdrHistogram().record(timings["latency"])
+    p95, p99 = histogram.percentiles([95, 99])
 
     # Process response times to calculate PMB
-    pmb, total_pmb_time, requests_over_threshold = calculate_pmb(ab_result)
+    pmb, total_pmb_time, requests_over_threshold = calculate_pmb(timings["latency"], threshold)
+    episodes = find_episodes(timings["start"], timings["latency"], threshold)
 
     # Update global PMB tracking
     TOTAL_PMB_TIME += total_pmb_time
     TOTAL_REQUESTS_OVER_THRESHOLD += requests_over_threshold
 
     # Write results to files
-    write_results(endpoint_name, p95, p99, pmb, total_pmb_time, requests_over_threshold)
-
-
-def extract_percentile_latency(ab_result: str, percentile: str) -> float:
-    """
-    Extract latency for a given percentile from Apache Bench output.
-    Args:
-        ab_result (str): The Apache Bench output.
-        percentile (str): The percentile to extract (e.g., "95%", "99%").
-    Returns:
-        float: The extracted latency.
-    """
-    try:
-        for line in ab_result.splitlines():
-            if percentile in line:
-                return float(line.split()[1])
-    except ValueError:
-        print(f"Failed to parse {percentile} latency.")
-    return 0.0
-
-
-def calculate_pmb(ab_result: str) -> tuple[float, float, int]:
+    write_results(endpoint_name, p95, p99, pmb, total_pmb_time, requests_over_threshold, episodes, threshold)
+    if collector is not None:
+        write_container_stats(endpoint_name, collector.window(window_start, window_end))
+    if store is not None:
+        # ab only reports whole-second request starts; features.store_bin_width then bins the store at 1 s
+        failed_requests, response_times = parse_ab_report(ab_result)
+        path = urllib.parse.urlsplit(endpoint_url).path
+        store.submit({
+            "method": "GET", "endpoint": path, "url": path,
+            "started": window_start, "finished": window_end, "failed": failed_requests,
+            **{f"p{key[:-1]}": value for key, value in response_times.items()},
+            "bottleneck_length": bottleneck_length(episodes),
+            "request_start": timings["start"], "latency": timings["latency"], "histogram": histogram,
+        })
+    return histogram
+
+
+def calculate_pmb(latencies: np.ndarray, threshold: float = THRESHOLD) -> tuple[float, float, int]:
     """
     Calculate the percentile millibottleneck (PMB) for requests above a threshold.
     Args:
-        ab_result (str): The Apache Bench output.
+        latencies (np.ndarray): Per-request latencies in milliseconds.
+        threshold (float): Millibottleneck threshold in ms.
     Returns:
         tuple: PMB, total PMB time, and the count of requests over the threshold.
     """
-    total_pmb_time = 0.0
-    requests_over_threshold = 0
-
-    for line in ab_result.splitlines():
-        if "Time per request" in line and "(mean, across all" not in line:
-            try:
-                request_time = float(line.split()[3])
-                if request_time > THRESHOLD:
-                    total_pmb_time += request_time
-                    requests_over_threshold += 1
-            except ValueError:
-                continue
-
-    pmb = (total_pmb_time / requests_over_threshold) if requests_over_threshold > 0 else 0.0
-    return pmb, total_pmb_time, requests_over_threshold
+    return summarize_pmb(latencies, threshold)
 
 
 def write_results(endpoint_name: str, p95: float, p99: float, pmb: float, total_pmb_time: float,
-                  requests_over_threshold: int) -> None:
+                  requests_over_threshold: int, episodes: np.ndarray, threshold: float = THRESHOLD) -> None:
     """
     Write the latency and PMB results to their respective files.
     Args:
@@ -130,6 +151,8 @@ def write_results(endpoint_name: str, p95: float, p99: float, pmb: float, total_
         pmb (float): Percentile millibottleneck.
         total_pmb_time (float): Total PMB time.
         requests_over_threshold (int): Count of requests over the threshold.
+        episodes (np.ndarray): Millibottleneck episodes found in the run.
+        threshold (float): Millibottleneck threshold in ms.
     """
     with open(OUTPUT_FILE, 'a') as f:
         f.write(f"Endpoint: {endpoint_name}\n")
@@ -139,56 +162,143 @@ def write_results(endpoint_name: str, p95: float, p99: float, pmb: float, total_
 
     with open(PMB_FILE, 'a') as f:
         f.write(f"Endpoint: {endpoint_name}\n")
-        f.write(f"PMB: {pmb} ms (threshold: {THRESHOLD} ms)\n")
+        f.write(f"PMB: {pmb} ms (threshold: {threshold} ms)\n")
         f.write(f"Requests over threshold: {requests_over_threshold}\n")
+        for episode in episodes:
+            f.write(f"Episode at {episode['start']:.3f}: {episode['duration']:.1f} ms, "
+                    f"depth {episode['depth']:.1f} ms, {episode['count']} requests\n")
         f.write(f"----------------------------------------\n")
 
 
-def capture_docker_stats() -> None:
+def write_container_stats(endpoint_name: str, window: dict) -> None:
     """
-    Capture Docker memory usage stats and write to a file.
+    Write per-container resource usage observed while an endpoint was under test.
+    Args:
+        endpoint_name (str): Name of the endpoint.
+        window (dict): Container name to (timestamps, samples) from DockerStatsCollector.window.
     """
-    print("Capturing Docker stats...")
-    docker_command = ["docker", "stats", "--no-stream", "--format", "table {{.Name}}\t{{.MemUsage}}"]
-    stats = run_command(docker_command)
+    cpu = STATS_FIELDS.index("cpu_percent")
+    memory = STATS_FIELDS.index("memory_usage")
+    with open(DOCKER_STATS_FILE, 'a') as f:
+        f.write(f"Endpoint: {endpoint_name}\n")
+        for name, (timestamps, samples) in window.items():
+            if not len(timestamps):
+                continue
+            f.write(f"{name}\tsamples: {len(timestamps)}\tcpu mean/max: {samples[:, cpu].mean():.1f}/"
+                    f"{samples[:, cpu].max():.1f}%\tmem max: {samples[:, memory].max() / 1024 / 1024:.1f}MiB\n")
+        f.write("----------------------------------------\n")
+
 
-    with open(DOCKER_STATS_FILE, 'w') as f:
+def write_percentiles(f, label: str, histogram: HdrHistogram) -> None:
+    """
+    Write the REPORTED_PERCENTILES of a (merged) latency histogram.
+    Args:
+        f: Open text file.
+        label (str): Group name, e.g. "Global" or an endpoint.
+        histogram (HdrHistogram): Latency histogram of the group.
+    """
+    values = histogram.percentiles(REPORTED_PERCENTILES)
+    summary = ", ".join(f"p{p}: {v:.3f} ms" for p, v in zip(REPORTED_PERCENTILES, values))
+    f.write(f"{label} latency ({histogram.total} requests) {summary}\n")
+
+
+def capture_docker_stats(collector: DockerStatsCollector, verbose: bool = DEBUG) -> None:
+    """
+    Capture Docker memory usage stats and write to a file.
+    Args:
+        collector (DockerStatsCollector): Running stats collector.
+        verbose (bool): Also print the stats.
+    """
+    if verbose:
+        print("Capturing Docker stats...")
+    memory = STATS_FIELDS.index("memory_usage")
+    limit = STATS_FIELDS.index("memory_limit")
+    lines = ["NAME\tMEM USAGE / LIMIT"]
+    for name, sample in collector.latest().items():
+        lines.append(f"{name}\t{sample[memory] / 1024 / 1024:.1f}MiB / {sample[limit] / 1024 / 1024 / 1024:.2f}GiB")
+    stats = "\n".join(lines) + "\n"
+
+    with open(DOCKER_STATS_FILE, 'a') as f:
         f.write(stats)
 
-    print("Docker memory usage (top containers):")
-    print(stats)
+    if verbose:
+        print("Docker memory usage (top containers):")
+        print(stats)
 
 
-def main():
+def main(host=UPSTREAM, n_requests=TOTAL_REQUESTS, n_concurrency=CONCURRENCY, bottleneck_threshold=THRESHOLD,
+         proxy_policy=PROXY_POLICY, verbose=DEBUG):
     """
-    Main function to coordinate attack simulation and monitoring.
+    Main function to coordinate attack simulation and monitoring: ON/OFF bursts of n_requests requests at
+    n_concurrency connections against every endpoint of the target.
     """
     # Clean old results
     for file in [OUTPUT_FILE, DOCKER_STATS_FILE, PMB_FILE, GLOBAL_PMB_FILE]:
         open(file, 'w').close()
 
-    for cycle in range(2):  # Number of cycles
-        print(f"Starting cycle {cycle + 1}...")
-
-        # Run tests for each endpoint
-        for endpoint_name, endpoint_url in ENDPOINTS.items():
-            run_ab_test(endpoint_name, endpoint_url)
-            time.sleep(REST_DURATION)
-
-        # Long OFF period
-        print(f"Resting for {LONG_OFF_DURATION} seconds...")
-        time.sleep(LONG_OFF_DURATION)
-
-    # Write global PMB results
-    avg_pmb = (TOTAL_PMB_TIME / TOTAL_REQUESTS_OVER_THRESHOLD) if TOTAL_REQUESTS_OVER_THRESHOLD > 0 else 0.0
-    with open(GLOBAL_PMB_FILE, 'a') as f:
-        f.write(f"Global Average PMB: {avg_pmb} ms\n")
-        f.write(f"Total PMB time: {TOTAL_PMB_TIME} ms\n")
-        f.write(f"Total requests exceeding threshold: {TOTAL_REQUESTS_OVER_THRESHOLD}\n")
-
-    # Capture Docker stats after testing
-    capture_docker_stats()
+    # Stream container stats for the whole run; without a reachable Docker socket the attack still runs
+    try:
+        collector = DockerStatsCollector().start()
+    except (OSError, http.client.HTTPException, ValueError) as e:
+        print(f"[Error] Docker stats unavailable ({e}); running without container stats")
+        collector = None
 
+    # Optionally route every endpoint through the mitigation proxy
+    proxy = store = None
+    try:
+        if proxy_policy is not None:
+            proxy, host = start_proxy(host, proxy_policy)
+        endpoints = {name: host.rstrip("/") + path for name, path in ENDPOINTS.items()}
+
+        # Every endpoint test also goes to the columnar results store, for analysis and feature extraction
+        store = ResultsWriter(new_run_id(SCENARIO), SCENARIO, endpoint_index=EndpointIndex.load())
+
+        # Latency histograms per (cycle, endpoint); merged losslessly for any grouping afterwards
+        histograms = {}
+        for cycle in range(2):  # Number of cycles
+            if verbose:
+                print(f"Starting cycle {cycle + 1}...")
+
+            # Run tests for each endpoint
+            for endpoint_name, endpoint_url in endpoints.items():
+                histograms[(cycle, endpoint_name)] = run_ab_test(endpoint_name, endpoint_url, collector, store,
+                                                                 n_requests, n_concurrency, bottleneck_threshold,
+                                                                 verbose)
+                time.sleep(REST_DURATION)
+
+            # Long OFF period
+            if verbose:
+                print(f"Resting for {LONG_OFF_DURATION} seconds...")
+            time.sleep(LONG_OFF_DURATION)
+
+        # Write global PMB results
+        avg_pmb = (TOTAL_PMB_TIME / TOTAL_REQUESTS_OVER_THRESHOLD) if TOTAL_REQUESTS_OVER_THRESHOLD > 0 else 0.0
+        with open(GLOBAL_PMB_FILE, 'a') as f:
+            f.write(f"Global Average PMB: {avg_pmb} ms\n")
+            f.write(f"Total PMB time: {TOTAL_PMB_TIME} ms\n")
+            f.write(f"Total requests exceeding threshold: {TOTAL_REQUESTS_OVER_THRESHOLD}\n")
+            write_percentiles(f, "Global", merge_all(histograms.values()))
+            for cycle in sorted({c for c, _ in histograms}):
+                write_percentiles(f, f"Cycle {cycle + 1}",
+                                  merge_all(h for (c, _), h in histograms.items() if c == cycle))
+            for endpoint_name in ENDPOINTS:
+                write_percentiles(f, endpoint_name,
+                                  merge_all(h for (_, e), h in histograms.items() if e == endpoint_name))
+        np.savez(HISTOGRAM_FILE, **{f"{c}/{e}": np.frombuffer(h.to_bytes(), dtype=np.uint8)
+                                    for (c, e), h in histograms.items()})
+
+        # Capture Docker stats after testing
+        if collector is not None:
+            capture_docker_stats(collector, verbose)
+    finally:
+        if proxy is not None:
+            stop_proxy(proxy)
+        # Stops the stats streaming thread and closes its socket, also when a test or a write failed
+        if collector is not None:
+            collector.stop()
+        # Re-raises a failed results write
+        if store is not None:
+            store.close()
 
 if __name__ == "__main__":
     main()
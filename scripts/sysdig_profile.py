@@ -0,0 +1,264 @@
+import json
+import subprocess
+from datetime import datetime
+from typing import Dict, Iterator, List
+import numpy as np
+from hdr_histogram import HdrHistogram
+
+# Expected text layout; record with e.g.
+#   sysdig -p "%evt.rawtime %container.name %thread.tid %evt.dir %evt.type %evt.latency" "container.name!=host" > capture.txt
+SYSDIG_FORMAT = "%evt.rawtime %container.name %thread.tid %evt.dir %evt.type %evt.latency"
+BATCH_EVENTS = 1 << 16  # events parsed before they are folded into the histograms
+SYSCALL_DIGITS = 2  # histogram precision; ~20 KB per (window, container, class)
+DAY = 86400  # seconds; smaller timestamps are times of day from sysdig's default layout
+
+SYSCALL_CLASSES = {
+    **dict.fromkeys(("fsync", "fdatasync", "sync_file_range", "syncfs"), "fsync"),
+    **dict.fromkeys(("futex",), "futex"),
+    **dict.fromkeys(("epoll_wait", "epoll_pwait", "poll", "ppoll", "select", "pselect6"), "epoll"),
+    **dict.fromkeys(("read", "write", "pread", "pwrite", "readv", "writev", "preadv", "pwritev", "pread64",
+                     "pwrite64"), "io"),
+    **dict.fromkeys(("recvfrom", "sendto", "recvmsg", "sendmsg", "accept", "accept4", "connect", "sendfile"), "net"),
+    **dict.fromkeys(("nanosleep", "clock_nanosleep"), "sleep"),
+}
+CLASS_NAMES = ("fsync", "futex", "epoll", "io", "net", "sleep", "other")
+_CLASS_IDS = {name: CLASS_NAMES.index(cls) for name, cls in SYSCALL_CLASSES.items()}
+_OTHER = CLASS_NAMES.index("other")
+
+PROFILE_DTYPE = np.dtype([
+    ("window", "U256"), ("container", "U64"), ("syscall_class", "U8"),
+    ("count", "i8"), ("p50", "f8"), ("p99", "f8"), ("max", "f8"),
+    ("blocked_ms", "f8"), ("mean_blocked_threads", "f8"),
+])
+
+
+def _parse_text(line: bytes) -> tuple:
+    """
+    Parse one line in SYSDIG_FORMAT, or in sysdig's default layout
+    "num time cpu proc (tid) dir type info" (grouped by process name, latency from enter/exit pairs).
+    """
+    fields = line.split(None, 6)
+    if len(fields) < 5:
+        return None
+    if fields[0].isdigit() and len(fields[0]) > 12:
+        latency = int(fields[5]) if len(fields) > 5 and fields[5].isdigit() else -1
+        return int(fields[0]), fields[1].decode(), int(fields[2]), fields[3], fields[4].decode(), latency
+    if len(fields) < 7 or not fields[4].startswith(b"("):
+        return None
+    # The default layout only has the time of day; SyscallProfile.add maps it onto epoch windows
+    hours, minutes, seconds = fields[1].split(b":")
+    seconds, _, fraction = seconds.partition(b".")
+    ts = (int(hours) * 3600 + int(minutes) * 60 + int(seconds)) * 1_000_000_000 + int(fraction.ljust(9, b"0")[:9])
+    return ts, fields[3].decode(), int(fields[4][1:-1]), fields[5], fields[6].split(None, 1)[0].decode(), -1
+
+
+def _parse_json(line: bytes) -> tuple:
+    """
+    Parse one event of `sysdig -j` output (with or without -p SYSDIG_FORMAT).
+    """
+    line = line.strip().lstrip(b"[").rstrip(b",]")
+    if not line:
+        return None
+    try:
+        event = json.loads(line)
+        ts = int(event.get("evt.rawtime", event.get("evt.outputtime")))
+        direction = event["evt.dir"].encode()
+        syscall = event["evt.type"]
+        tid = int(event["thread.tid"])
+    except (ValueError, KeyError, TypeError):
+        return None
+    container = event.get("container.name") or event.get("proc.name", "")
+    latency = event.get("evt.latency")
+    return ts, container, tid, direction, syscall, int(latency) if latency not in (None, "") else -1
+
+
+def iter_capture(path: str, batch_events: int = BATCH_EVENTS) -> Iterator[tuple]:
+    """
+    Stream a sysdig capture as batches of completed syscalls.
+    Text and JSON output are read line by line; .scap files are decoded by `sysdig -r` into SYSDIG_FORMAT and
+    read from its stdout, so the capture is never loaded whole. Syscalls without an evt.latency field are
+    timed from their enter/exit events, keeping only one pending enter per thread.
+    Args:
+        path (str): Capture file (.scap, sysdig text or JSON output).
+        batch_events (int): Syscalls per yielded batch.
+    Yields:
+        tuple: Exit timestamps (int64 ns), container names (list), class ids (int8) and latencies (int64 ns).
+    """
+    process = None
+    if path.endswith(".scap"):
+        process = subprocess.Popen(["sysdig", "-r", path, "-p", SYSDIG_FORMAT], stdout=subprocess.PIPE)
+        stream = process.stdout
+    else:
+        stream = open(path, "rb")
+    pending = {}
+    parse = None
+    ts, containers, classes, latencies = [], [], [], []
+    try:
+        for line in stream:
+            if parse is None:
+                if not line.strip():
+                    continue
+                parse = _parse_json if line.lstrip()[:1] in (b"{", b"[") else _parse_text
+            event = parse(line)
+            if event is None:
+                continue
+            time_ns, container, tid, direction, syscall, latency = event
+            if direction == b">":
+                pending[tid] = (syscall, time_ns)
+                continue
+            if latency < 0:
+                entered = pending.pop(tid, None)
+                if entered is None or entered[0] != syscall:
+                    continue
+                latency = time_ns - entered[1]
+            ts.append(time_ns)
+            containers.append(container)
+            classes.append(_CLASS_IDS.get(syscall, _OTHER))
+            latencies.append(latency)
+            if len(ts) >= batch_events:
+                yield np.array(ts, np.int64), containers, np.array(classes, np.int8), np.array(latencies, np.int64)
+                ts, containers, classes, latencies = [], [], [], []
+        if ts:
+            yield np.array(ts, np.int64), containers, np.array(classes, np.int8), np.array(latencies, np.int64)
+    finally:
+        stream.close()
+        if process is not None:
+            process.wait()
+
+
+class SyscallProfile:
+    """
+    Per-window, per-container, per-syscall-class latency histograms.
+    Windows are the time ranges of endpoint tests or millibottleneck episodes and may overlap (e.g. concurrent
+    endpoints of an attack); a syscall counts in every window containing its exit time and syscalls outside all
+    windows are dropped. Memory is one fixed-size histogram per populated (window, container, class) key,
+    independent of the capture size.
+    """
+
+    def __init__(self, starts: np.ndarray = None, ends: np.ndarray = None, labels: List[str] = None,
+                 digits: int = SYSCALL_DIGITS):
+        """
+        Args:
+            starts (np.ndarray): Window starts in epoch seconds (None profiles the whole capture as one window).
+                Windows with a NaN or infinite start, or a NaN end, are dropped.
+            ends (np.ndarray): Window ends in epoch seconds.
+            labels (List[str]): Window labels, e.g. endpoint names.
+            digits (int): Histogram precision.
+        """
+        if starts is None:
+            starts, ends, labels = np.array([0.0]), np.array([np.inf]), ["*"]
+        starts, ends = np.asarray(starts, dtype=np.float64), np.asarray(ends, dtype=np.float64)
+        # Legacy rows converted from CSV have no start time; a NaN window would break the interval join
+        valid = np.flatnonzero(np.isfinite(starts) & ~np.isnan(ends))
+        order = valid[np.argsort(starts[valid], kind="stable")]
+        self.starts = starts[order]
+        self.ends = ends[order]
+        self.labels = [labels[i] for i in order]
+        # Longest window: only windows starting this far before a syscall can contain it
+        self.max_length = float((self.ends - self.starts).max()) if self.starts.size else 0.0
+        self.digits = digits
+        self.containers = {}
+        self.histograms: Dict[tuple, HdrHistogram] = {}
+        self.blocked_ns: Dict[tuple, int] = {}
+
+    def add(self, ts_ns: np.ndarray, containers: List[str], classes: np.ndarray, latencies_ns: np.ndarray) -> None:
+        """
+        Fold one batch from iter_capture into the histograms.
+        Captures in sysdig's default layout only carry the time of day; against epoch windows those timestamps
+        are taken as local time on the day of the first window (the next day once they fall more than 12 hours
+        before it, for captures crossing midnight).
+        """
+        ts = ts_ns / 1e9
+        if self.starts.size and self.starts[0] >= DAY and ts.size and ts.min() < DAY:
+            ts = self._from_time_of_day(ts)
+        # Interval join: candidate windows start within max_length before the syscall, kept if it ends after it
+        hi = np.searchsorted(self.starts, ts, side="right")
+        lo = np.searchsorted(self.starts, ts - self.max_length, side="left")
+        counts = hi - lo
+        event = np.repeat(np.arange(ts.size), counts)
+        window = np.arange(event.size) - np.repeat(np.cumsum(counts) - counts - lo, counts)
+        inside = ts[event] <= self.ends[window]
+        if not inside.any():
+            return
+        event, window = event[inside], window[inside]
+        container_ids = np.fromiter((self.containers.setdefault(c, len(self.containers)) for c in containers),
+                                    dtype=np.int64, count=len(containers))
+        keys = window.astype(np.int64) << 32 | container_ids[event] << 8 | classes[event]
+        latencies = latencies_ns[event]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.ravel()
+        order = np.argsort(inverse, kind="stable")
+        bounds = np.searchsorted(inverse[order], np.arange(len(unique) + 1))
+        for g, key in enumerate(unique.tolist()):
+            group = latencies[order[bounds[g]:bounds[g + 1]]]
+            key = (key >> 32, (key >> 8) & 0xFFFFFF, key & 0xFF)
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = HdrHistogram(digits=self.digits)
+                self.blocked_ns[key] = 0
+            histogram.record(group / 1e6)
+            self.blocked_ns[key] += int(group.sum())
+
+    def _from_time_of_day(self, ts: np.ndarray) -> np.ndarray:
+        """
+        Map time-of-day seconds (local time) to epoch seconds around the first window.
+        """
+        first = datetime.fromtimestamp(self.starts[0])
+        midnight = first.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+        ts = np.where(ts < DAY, ts + midnight, ts)
+        return np.where(ts < self.starts[0] - DAY / 2, ts + DAY, ts)
+
+    def report(self) -> np.ndarray:
+        """
+        Latency percentiles (ms) per (window, container, class), with a queue-wait estimate: the time threads
+        spent blocked in the class and, by Little's law, the mean number of threads blocked at once.
+        Returns:
+            np.ndarray: PROFILE_DTYPE records ordered by window, container and class.
+        """
+        names = {i: name for name, i in self.containers.items()}
+        rows = []
+        for key in sorted(self.histograms):
+            window, container, cls = key
+            histogram = self.histograms[key]
+            p50, p99, p100 = histogram.percentiles([50, 99, 100])
+            blocked_ms = self.blocked_ns[key] / 1e6
+            duration = self.ends[window] - self.starts[window]
+            mean_blocked = blocked_ms / 1e3 / duration if np.isfinite(duration) and duration > 0 else np.nan
+            rows.append((self.labels[window], names[container], CLASS_NAMES[cls], histogram.total, p50, p99, p100,
+                         blocked_ms, mean_blocked))
+        return np.array(rows, dtype=PROFILE_DTYPE)
+
+
+def profile_capture(path: str, starts: np.ndarray = None, ends: np.ndarray = None, labels: List[str] = None,
+                    batch_events: int = BATCH_EVENTS) -> SyscallProfile:
+    """
+    Stream a capture into a SyscallProfile sliced by the given windows.
+    Args:
+        path (str): Capture file.
+        starts (np.ndarray): Window starts in epoch seconds (None profiles the whole capture).
+        ends (np.ndarray): Window ends in epoch seconds.
+        labels (List[str]): Window labels.
+        batch_events (int): Syscalls parsed per batch.
+    Returns:
+        SyscallProfile: The filled profile.
+    """
+    profile = SyscallProfile(starts, ends, labels)
+    for batch in iter_capture(path, batch_events):
+        profile.add(*batch)
+    return profile
+
+
+if __name__ == "__main__":
+    import sys
+    from results_store import load_results
+
+    columns = load_results()
+    timed = np.flatnonzero(np.isfinite(columns["started"]) & np.isfinite(columns["finished"])) if columns else []
+    if len(timed):
+        labels = [f"{columns['method'][i]} {columns['endpoint'][i] or columns['url'][i]}" for i in timed]
+        result = profile_capture(sys.argv[1], columns["started"][timed], columns["finished"][timed], labels).report()
+    else:
+        result = profile_capture(sys.argv[1]).report()
+    for r in result[np.argsort(-result["p99"])][:30]:
+        print(f"{r['window'][:50]:50} {r['container'][:20]:20} {r['syscall_class']:6} n {r['count']:8} "
+              f"p50 {r['p50']:8.3f} p99 {r['p99']:8.3f} max {r['max']:9.3f} blocked {r['mean_blocked_threads']:.2f}")
@@ -0,0 +1,293 @@
+from typing import Dict, List
+import numpy as np
+
+# Every stream is stored on one clock: integer nanoseconds since the epoch. Sources report time.time()
+# seconds (or epoch nanoseconds for sysdig); a per-stream offset corrects known skew, e.g. a container clock
+# or Snort's local-time stamps.
+NS = 1_000_000_000
+
+
+def to_ns(seconds: np.ndarray, offset: float = 0.0) -> np.ndarray:
+    """
+    Convert epoch seconds (plus a clock offset in seconds) to timeline nanoseconds.
+    Raises ValueError for NaN or infinite times, which the integer cast would turn into INT64_MIN.
+    """
+    seconds = np.asarray(seconds, dtype=np.float64) + offset
+    if not np.isfinite(seconds).all():
+        raise ValueError("timestamps must be finite; drop rows without a time first (see Timeline.add_points)")
+    return np.rint(seconds * NS).astype(np.int64)
+
+
+def _finite(columns: Dict[str, np.ndarray], *times: np.ndarray) -> tuple:
+    """
+    Drop the rows where any of the given epoch-second arrays is NaN or infinite (e.g. legacy results converted
+    from CSV, which have no start time), from the times and the columns alike.
+    """
+    times = [np.asarray(t, dtype=np.float64) for t in times]
+    keep = np.logical_and.reduce([np.isfinite(t) for t in times])
+    if keep.all():
+        return (columns, *times)
+    return ({name: np.asarray(values)[keep] for name, values in (columns or {}).items()}, *(t[keep] for t in times))
+
+
+def _expand(lo: np.ndarray, hi: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Turn per-query row ranges [lo, hi) into flat (query id, row) pairs without a Python loop.
+    """
+    counts = np.maximum(hi - lo, 0)
+    query_ids = np.repeat(np.arange(len(lo)), counts)
+    heads = np.cumsum(counts) - counts
+    rows = np.arange(int(counts.sum())) - np.repeat(heads - lo, counts)
+    return query_ids, rows
+
+
+class PointStream:
+    """
+    Timestamped samples (requests, resource samples, alerts, syscalls) sorted by time, with column arrays
+    aligned to the timestamps.
+    """
+
+    def __init__(self, ts: np.ndarray, columns: Dict[str, np.ndarray] = None):
+        """
+        Args:
+            ts (np.ndarray): Timeline nanoseconds, in any order.
+            columns (Dict[str, np.ndarray]): Column arrays whose first axis matches ts.
+        """
+        order = np.argsort(ts, kind="stable")
+        self.ts = np.asarray(ts, dtype=np.int64)[order]
+        self.columns = {name: np.asarray(values)[order] for name, values in (columns or {}).items()}
+
+    def __len__(self) -> int:
+        return len(self.ts)
+
+    def rows(self, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Timestamps and columns of the given rows.
+        """
+        return {"ts": self.ts[rows], **{name: values[rows] for name, values in self.columns.items()}}
+
+    def bounds(self, starts: np.ndarray, ends: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Row range [lo, hi) of every closed time range [start, end].
+        """
+        return np.searchsorted(self.ts, starts, "left"), np.searchsorted(self.ts, ends, "right")
+
+    def range(self, start: int, end: int) -> Dict[str, np.ndarray]:
+        """
+        Rows with start <= ts <= end.
+        """
+        lo, hi = self.bounds(np.int64(start), np.int64(end))
+        return self.rows(slice(int(lo), int(hi)))
+
+    def asof(self, ts: np.ndarray, tolerance: int = None) -> np.ndarray:
+        """
+        Index of the latest row at or before every given time (-1 if there is none, or it is older than
+        tolerance nanoseconds), e.g. the resource sample in effect when each request started.
+        """
+        rows = np.searchsorted(self.ts, ts, "right") - 1
+        if tolerance is not None:
+            valid = rows >= 0
+            valid[valid] = ts[valid] - self.ts[rows[valid]] <= tolerance
+            rows[~valid] = -1
+        return rows
+
+
+class IntervalStream:
+    """
+    Time intervals (latency spikes, millibottleneck episodes, endpoint test windows) sorted by start.
+    A running maximum of the ends makes overlap queries two binary searches even when intervals overlap.
+    """
+
+    def __init__(self, starts: np.ndarray, ends: np.ndarray, columns: Dict[str, np.ndarray] = None):
+        """
+        Args:
+            starts (np.ndarray): Interval starts in timeline nanoseconds.
+            ends (np.ndarray): Interval ends in timeline nanoseconds.
+            columns (Dict[str, np.ndarray]): Column arrays aligned to the intervals.
+        """
+        order = np.argsort(starts, kind="stable")
+        self.starts = np.asarray(starts, dtype=np.int64)[order]
+        self.ends = np.asarray(ends, dtype=np.int64)[order]
+        self.columns = {name: np.asarray(values)[order] for name, values in (columns or {}).items()}
+        self.reach = np.maximum.accumulate(self.ends) if len(self.ends) else self.ends
+
+    def __len__(self) -> int:
+        return len(self.starts)
+
+    def rows(self, rows: np.ndarray) -> Dict[str, np.ndarray]:
+        return {"start": self.starts[rows], "end": self.ends[rows],
+                **{name: values[rows] for name, values in self.columns.items()}}
+
+    def overlapping(self, start: int, end: int) -> np.ndarray:
+        """
+        Indices of the intervals that overlap [start, end].
+        """
+        lo = np.searchsorted(self.reach, start, "left")
+        hi = np.searchsorted(self.starts, end, "right")
+        candidates = np.arange(lo, max(hi, lo))
+        return candidates[self.ends[candidates] >= start]
+
+
+class Timeline:
+    """
+    Named point and interval streams on one clock, with range and join queries between them.
+    Usage:
+        timeline = Timeline()
+        timeline.add_timings("requests", timings)
+        timeline.add_spikes("spikes", timings, threshold=500)
+        timeline.add_cgroup("cgroup", *sampler.window(start, end), sampler.containers)
+        spikes, samples = timeline.during("cgroup", "spikes")
+        episodes, alerts = timeline.during("alerts", "episodes", pad=0.2)
+    """
+
+    def __init__(self):
+        self.points: Dict[str, PointStream] = {}
+        self.intervals: Dict[str, IntervalStream] = {}
+
+    def add_points(self, name: str, seconds: np.ndarray, columns: Dict[str, np.ndarray] = None,
+                   offset: float = 0.0) -> PointStream:
+        """
+        Add a point stream from epoch seconds; rows without a finite time are left out.
+        """
+        columns, seconds = _finite(columns, seconds)
+        self.points[name] = PointStream(to_ns(seconds, offset), columns)
+        return self.points[name]
+
+    def add_intervals(self, name: str, starts: np.ndarray, ends: np.ndarray, columns: Dict[str, np.ndarray] = None,
+                      offset: float = 0.0) -> IntervalStream:
+        """
+        Add an interval stream from epoch seconds; intervals without a finite start and end are left out.
+        """
+        columns, starts, ends = _finite(columns, starts, ends)
+        self.intervals[name] = IntervalStream(to_ns(starts, offset), to_ns(ends, offset), columns)
+        return self.intervals[name]
+
+    def add_timings(self, name: str, timings: np.ndarray, offset: float = 0.0) -> PointStream:
+        """
+        Add per-request timings (pmb.TIMING_DTYPE) as points at their start times.
+        """
+        return self.add_points(name, timings["start"], {f: timings[f] for f in timings.dtype.names if f != "start"},
+                               offset)
+
+    def add_spikes(self, name: str, timings: np.ndarray, threshold: float, offset: float = 0.0) -> IntervalStream:
+        """
+        Add every request slower than threshold milliseconds as the interval it was in flight.
+        """
+        slow = timings[timings["latency"] > threshold]
+        return self.add_intervals(name, slow["start"], slow["start"] + slow["latency"] / 1000.0,
+                                  {"latency": slow["latency"]}, offset)
+
+    def add_episodes(self, name: str, episodes: np.ndarray, offset: float = 0.0) -> IntervalStream:
+        """
+        Add millibottleneck episodes (pmb.EPISODE_DTYPE).
+        """
+        return self.add_intervals(name, episodes["start"], episodes["start"] + episodes["duration"] / 1000.0,
+                                  {"depth": episodes["depth"], "count": episodes["count"]}, offset)
+
+    def add_cgroup(self, name: str, timestamps: np.ndarray, samples: np.ndarray, containers: List[str],
+                   offset: float = 0.0) -> PointStream:
+        """
+        Add cgroup samples (CgroupSampler.window) with one column per container and counter.
+        """
+        from cgroup_sampler import SAMPLE_FIELDS
+
+        columns = {f"{c}.{f}": samples[:, i, j] for i, c in enumerate(containers) for j, f in enumerate(SAMPLE_FIELDS)}
+        return self.add_points(name, timestamps, columns, offset)
+
+    def add_docker_stats(self, name: str, window: Dict[str, tuple], offset: float = 0.0) -> PointStream:
+        """
+        Add Docker stats (DockerStatsCollector.window) as one stream with a container column.
+        """
+        from docker_stats import STATS_FIELDS
+
+        names = list(window)
+        timestamps = np.concatenate([window[n][0] for n in names]) if names else np.zeros(0)
+        samples = np.concatenate([window[n][1] for n in names]) if names else np.zeros((0, len(STATS_FIELDS)))
+        container = np.repeat(np.arange(len(names)), [len(window[n][0]) for n in names])
+        columns = {"container": np.array(names)[container] if names else np.zeros(0, dtype=str),
+                   **{f: samples[:, j] for j, f in enumerate(STATS_FIELDS)}}
+        return self.add_points(name, timestamps, columns, offset)
+
+    def add_alerts(self, name: str, alerts: np.ndarray, offset: float = 0.0) -> PointStream:
+        """
+        Add IDS alerts (ids_alerts.ALERT_DTYPE).
+        """
+        return self.add_points(name, alerts["ts"], {f: alerts[f] for f in alerts.dtype.names if f != "ts"}, offset)
+
+    def add_windows(self, name: str, columns: Dict[str, np.ndarray], offset: float = 0.0) -> IntervalStream:
+        """
+        Add the endpoint test windows of stored results (results_store.load_results).
+        """
+        return self.add_intervals(name, columns["started"], columns["finished"],
+                                  {"endpoint": columns["endpoint"], "url": columns["url"], "run_id": columns["run_id"]},
+                                  offset)
+
+    def during(self, points: str, intervals: str, pad: float = 0.0) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Join a point stream to an interval stream: every point inside an interval widened by pad seconds on both
+        sides. A point inside several intervals is reported once per interval.
+        Args:
+            points (str): Point stream name.
+            intervals (str): Interval stream name.
+            pad (float): Seconds added before and after every interval.
+        Returns:
+            tuple: Interval indices and point rows, one entry per matching pair, grouped by interval.
+        """
+        stream = self.points[points]
+        index = self.intervals[intervals]
+        pad_ns = int(round(pad * NS))
+        lo, hi = stream.bounds(index.starts - pad_ns, index.ends + pad_ns)
+        return _expand(lo, hi)
+
+    def count_during(self, points: str, intervals: str, pad: float = 0.0) -> np.ndarray:
+        """
+        Number of points inside every (padded) interval.
+        """
+        stream = self.points[points]
+        index = self.intervals[intervals]
+        pad_ns = int(round(pad * NS))
+        lo, hi = stream.bounds(index.starts - pad_ns, index.ends + pad_ns)
+        return hi - lo
+
+    def overlaps(self, left: str, right: str) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Join two interval streams: every pair of overlapping intervals (e.g. episodes inside test windows).
+        Returns:
+            tuple: Indices into left and right, one entry per overlapping pair.
+        """
+        a = self.intervals[left]
+        b = self.intervals[right]
+        lo = np.searchsorted(b.reach, a.starts, "left")
+        hi = np.maximum(np.searchsorted(b.starts, a.ends, "right"), lo)
+        left_ids, right_ids = _expand(lo, hi)
+        keep = b.ends[right_ids] >= a.starts[left_ids]
+        return left_ids[keep], right_ids[keep]
+
+    def save(self, path: str) -> None:
+        """
+        Write every stream into one .npz file.
+        """
+        arrays = {}
+        for name, stream in self.points.items():
+            arrays[f"points/{name}/ts"] = stream.ts
+            arrays.update({f"points/{name}/{c}": v for c, v in stream.columns.items()})
+        for name, stream in self.intervals.items():
+            arrays[f"intervals/{name}/start"] = stream.starts
+            arrays[f"intervals/{name}/end"] = stream.ends
+            arrays.update({f"intervals/{name}/{c}": v for c, v in stream.columns.items()})
+        np.savez(path, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "Timeline":
+        timeline = cls()
+        streams = {}
+        with np.load(path) as data:
+            for key in data.files:
+                kind, name, column = key.split("/", 2)
+                streams.setdefault((kind, name), {})[column] = data[key]
+        for (kind, name), columns in streams.items():
+            if kind == "points":
+                timeline.points[name] = PointStream(columns.pop("ts"), columns)
+            else:
+                timeline.intervals[name] = IntervalStream(columns.pop("start"), columns.pop("end"), columns)
+        return timeline
@@ -0,0 +1,261 @@
+import socket
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from typing import List
+import numpy as np
+from async_client import run_benchmark
+from cgroup_sampler import compose_published_ports
+
+# Readiness probes of the compose stack: services with a health endpoint are polled over HTTP, every other
+# published port must accept TCP connections (e.g. Postgres)
+COMPOSE_DIR = "./spring/ComposeFile"
+HEALTH_PATHS = {"dataflow-server": "/management/health", "skipper-server": "/actuator/health"}
+READY_TIMEOUT = 600.0  # seconds
+POLL_INTERVAL = 2.0  # seconds
+
+WARMUP_PERCENTILES = (50, 95, 99)
+CALIBRATION_REQUESTS = 50  # per target, to measure the sustainable rate
+ROUND_SECONDS = 5.0  # target duration of one warm-up round
+MIN_ROUND_REQUESTS = 20  # per target
+CONVERGENCE_ROUNDS = 3  # consecutive rounds that must agree
+CONVERGENCE_TOLERANCE = 0.10  # relative spread of each percentile over those rounds
+CONVERGENCE_FLOOR_MS = 1.0  # spreads below this are timer / scheduler noise, whatever the relative size
+MAX_WARMUP_SECONDS = 300.0
+WARMUP_CONCURRENCY = 10
+PROBE_REQUESTS = 500  # per drift check
+MAX_PROBE_SHARE = 0.1  # drift checks are skipped when PROBE_REQUESTS exceeds this share of an endpoint's requests
+DRIFT_TOLERANCE = 0.25  # relative change of the probe p50 / p95 that triggers a re-warm
+
+
+def _healthy(url: str) -> bool:
+    try:
+        with urllib.request.urlopen(url, timeout=5) as response:
+            return response.status == 200 and b'"DOWN"' not in response.read(4096)
+    except (urllib.error.URLError, OSError, ValueError):
+        return False
+
+
+def _port_open(host: str, port: int) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=2):
+            return True
+    except OSError:
+        return False
+
+
+def readiness_probes(host: str, compose_dir: str = COMPOSE_DIR) -> tuple:
+    """
+    Readiness probes of the stack behind a base URL: the ports its compose files publish, on the host's name.
+    Without compose files the host's own port is probed over TCP.
+    Args:
+        host (str): Base URL of the system under test, e.g. "http://localhost:9393".
+        compose_dir (str): Directory holding docker-compose*.yml files.
+    Returns:
+        tuple: Health URLs and (host, port) pairs for wait_until_ready.
+    """
+    url = urllib.parse.urlsplit(host)
+    hostname = url.hostname or "localhost"
+    health_urls, tcp_ports = [], []
+    for name, ports in compose_published_ports(compose_dir).items():
+        if ports and name in HEALTH_PATHS:
+            health_urls.append(f"http://{hostname}:{ports[0]}{HEALTH_PATHS[name]}")
+        elif ports:
+            tcp_ports.append((hostname, ports[0]))
+    if not health_urls and not tcp_ports:
+        tcp_ports.append((hostname, url.port or (443 if url.scheme == "https" else 80)))
+    return tuple(health_urls), tuple(tcp_ports)
+
+
+def drift_probe_requests(n_requests: int, probe_requests: int = PROBE_REQUESTS) -> int:
+    """
+    Requests per drift check for runs of n_requests per endpoint; 0 (no drift checks) for short runs, where
+    the probes would cost more than MAX_PROBE_SHARE of the measurement.
+    """
+    return probe_requests if probe_requests <= MAX_PROBE_SHARE * n_requests else 0
+
+
+def wait_until_ready(health_urls: tuple, tcp_ports: tuple, timeout: float = READY_TIMEOUT,
+                     verbose: bool = True) -> bool:
+    """
+    Poll the health endpoints and TCP ports until all of them answer.
+    Returns:
+        bool: True when everything became ready before the timeout.
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        pending = [url for url in health_urls if not _healthy(url)]
+        pending += [f"{host}:{port}" for host, port in tcp_ports if not _port_open(host, port)]
+        if not pending:
+            return True
+        if time.monotonic() >= deadline:
+            print(f"[Error] Not ready after {timeout:.0f}s: {', '.join(pending)}")
+            return False
+        if verbose:
+            print(f"[Verbose] Waiting for {', '.join(pending)}...")
+        time.sleep(POLL_INTERVAL)
+
+
+class SteadyStateDetector:
+    """
+    Online convergence test on rolling latency percentiles.
+    Every update adds one round's percentiles; steady state is declared once each percentile of the last
+    `rounds` rounds lies within `tolerance` of their median (or within floor_ms) and shows no monotone trend.
+    """
+
+    def __init__(self, percentiles: tuple = WARMUP_PERCENTILES, rounds: int = CONVERGENCE_ROUNDS,
+                 tolerance: float = CONVERGENCE_TOLERANCE, floor_ms: float = CONVERGENCE_FLOOR_MS):
+        self.percentiles = percentiles
+        self.rounds = rounds
+        self.tolerance = tolerance
+        self.floor_ms = floor_ms
+        self.history = []
+
+    def update(self, latencies: np.ndarray) -> bool:
+        """
+        Add one round of latencies (ms).
+        Returns:
+            bool: True once the recent rounds have converged.
+        """
+        latencies = latencies[~np.isnan(latencies)]
+        if not latencies.size:
+            return False
+        self.history.append(np.percentile(latencies, self.percentiles))
+        return self.converged()
+
+    def converged(self) -> bool:
+        if len(self.history) < self.rounds:
+            return False
+        recent = np.array(self.history[-self.rounds:])
+        median = np.median(recent, axis=0)
+        spread = recent.max(axis=0) - recent.min(axis=0)
+        stable = spread <= np.maximum(self.tolerance * median, self.floor_ms)
+        # A strictly falling percentile means the system is still warming up, even if the steps are small
+        falling = np.all(np.diff(recent, axis=0) < 0, axis=0) & (spread > self.floor_ms)
+        return bool(np.all(stable) and not falling.any())
+
+
+class WarmupGate:
+    """
+    Readiness and warm-up gate in front of a measurement run.
+    wait_ready() polls the stack, warm_up() sends a calibrated workload over a set of GET targets until the
+    rolling percentiles converge, and check_drift() re-probes between endpoints, warming up again when the
+    system moved away from the steady state it was measured in.
+    """
+
+    def __init__(self, host: str, targets: List[str], concurrency: int = WARMUP_CONCURRENCY, verbose: bool = True,
+                 health_urls: tuple = None, tcp_ports: tuple = None, compose_dir: str = COMPOSE_DIR,
+                 probe_requests: int = PROBE_REQUESTS):
+        """
+        Args:
+            host (str): Base URL, e.g. "http://localhost:9393".
+            targets (List[str]): GET paths (with query) used as warm-up workload; the first one is the drift probe.
+            concurrency (int): Connections used by the warm-up client.
+            verbose (bool): Print progress.
+            health_urls (tuple): Health endpoints polled by wait_ready.
+            tcp_ports (tuple): (host, port) pairs that must accept connections.
+            compose_dir (str): Compose files the probes are derived from when health_urls and tcp_ports are None.
+            probe_requests (int): Requests per drift check (0 disables check_drift).
+        """
+        if health_urls is None and tcp_ports is None:
+            health_urls, tcp_ports = readiness_probes(host, compose_dir)
+        self.health_urls = health_urls or ()
+        self.tcp_ports = tcp_ports or ()
+        self.probe_requests = probe_requests
+        self.host = host
+        self.targets = targets
+        self.concurrency = concurrency
+        self.verbose = verbose
+        self.round_requests = MIN_ROUND_REQUESTS
+        self.reference = None
+        self.report = {"ready": False, "warmup_seconds": 0.0, "warmup_rounds": 0, "converged": False,
+                       "drift_checks": 0, "rewarms": 0}
+
+    def _send(self, url: str, n_requests: int) -> np.ndarray:
+        timings, status = run_benchmark(self.host, url, "GET", None, n_requests, self.concurrency)
+        return timings["latency"][status != 0]
+
+    def wait_ready(self, timeout: float = READY_TIMEOUT) -> bool:
+        self.report["ready"] = wait_until_ready(self.health_urls, self.tcp_ports, timeout, self.verbose)
+        return self.report["ready"]
+
+    def calibrate(self) -> int:
+        """
+        Size warm-up rounds so one round over all targets takes about ROUND_SECONDS at the current rate.
+        The rate follows from Little's law (connections / mean latency), which leaves out connection setup.
+        """
+        latencies = np.concatenate([self._send(url, CALIBRATION_REQUESTS) for url in self.targets])
+        mean_seconds = float(latencies.mean()) / 1000.0 if latencies.size else 1.0
+        rate = self.concurrency / max(mean_seconds, 1e-4)
+        self.round_requests = max(MIN_ROUND_REQUESTS, int(rate * ROUND_SECONDS / len(self.targets)))
+        if self.verbose:
+            print(f"[Verbose] Warm-up calibrated: {rate:.0f} req/s, {self.round_requests} requests per target and round")
+        return self.round_requests
+
+    def warm_up(self, max_seconds: float = MAX_WARMUP_SECONDS) -> bool:
+        """
+        Send warm-up rounds until the rolling percentiles converge (or max_seconds pass), then take the drift
+        reference.
+        Returns:
+            bool: True if steady state was reached.
+        """
+        if not self.targets:
+            return False
+        started = time.monotonic()
+        self.calibrate()
+        detector = SteadyStateDetector()
+        converged = False
+        while not converged and time.monotonic() - started < max_seconds:
+            latencies = np.concatenate([self._send(url, self.round_requests) for url in self.targets])
+            converged = detector.update(latencies)
+            self.report["warmup_rounds"] += 1
+            if self.verbose and detector.history:
+                p = ", ".join(f"p{q} {v:.1f}" for q, v in zip(detector.percentiles, detector.history[-1]))
+                print(f"[Verbose] Warm-up round {len(detector.history)}: {p} ms")
+        self.report["warmup_seconds"] += time.monotonic() - started
+        self.report["converged"] = converged
+        if not converged:
+            print(f"[Error] No steady state after {max_seconds:.0f}s of warm-up; measuring anyway")
+        self.reference = self._probe() if self.probe_requests > 0 else None
+        return converged
+
+    def _probe(self) -> np.ndarray:
+        latencies = self._send(self.targets[0], self.probe_requests)
+        return np.percentile(latencies, (50, 95)) if latencies.size else None
+
+    def check_drift(self) -> float:
+        """
+        Probe the first target and compare its p50 / p95 with the steady-state reference; warm up again if
+        either moved by more than DRIFT_TOLERANCE (and more than the noise floor). Does nothing when the gate
+        was created with probe_requests=0.
+        Returns:
+            float: Largest relative change of the probe percentiles.
+        """
+        if self.reference is None:
+            return 0.0
+        current = self._probe()
+        self.report["drift_checks"] += 1
+        if current is None:
+            return float("inf")
+        change = np.abs(current - self.reference)
+        # Changes within the noise floor do not count as drift, however large relative to a sub-ms latency
+        drift = float(np.max(np.where(change > CONVERGENCE_FLOOR_MS, change / np.maximum(self.reference, 1e-9), 0.0)))
+        if drift > DRIFT_TOLERANCE:
+            if self.verbose:
+                print(f"[Verbose] Drift of {drift * 100:.0f}% from steady state; warming up again")
+            self.report["rewarms"] += 1
+            self.warm_up()
+        return drift
+
+
+if __name__ == "__main__":
+    # Exercise the gate against the local stub server
+    from async_client import serve_stub
+
+    stub = serve_stub()
+    stub_host = f"http://127.0.0.1:{stub.server_address[1]}"
+    gate = WarmupGate(stub_host, ["/about", "/apps"], health_urls=(f"{stub_host}/health",), tcp_ports=())
+    gate.wait_ready(10)
+    print(gate.warm_up(60), gate.check_drift(), gate.report)
+    stub.shutdown()
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The scripts import their siblings by plain name, as when they are run from the scripts directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "scripts"))
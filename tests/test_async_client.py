@@ -0,0 +1,163 @@
+import os
+import shutil
+import socket
+import subprocess
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pytest
+from async_client import run_benchmark, serve_stub
+from pmb import load_ab_gnuplot
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ab")
+
+DELAY = 0.02  # seconds the slow stub holds every request
+MAX_CLIENT_OVERHEAD = 5.0  # ms the client may add to the server's own time, median
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    """
+    Holds every request for DELAY and records how long it spent on it, so the client's measured latency can be
+    checked against the server's. /chunked and /close answer with the other two ways of framing a body.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        started = time.perf_counter()
+        time.sleep(DELAY)
+        if self.path == "/chunked":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"3\r\nabc\r\n2\r\nde\r\n0\r\n\r\n")
+        elif self.path == "/close":
+            self.send_response(200)
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(b"until the connection closes")
+            self.close_connection = True
+        else:
+            self.send_response(503 if self.path == "/busy" else 200)
+            self.send_header("Content-Length", "2")
+            self.end_headers()
+            self.wfile.write(b"ok")
+        self.wfile.flush()
+        self.server.served.append((time.perf_counter() - started) * 1e3)
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def slow_stub():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    server.daemon_threads = True
+    server.served = []
+    server.connections = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def stub():
+    server = serve_stub()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_timings_of_every_request_against_the_stub(stub):
+    timings, status = run_benchmark(stub, "/apps?force=true", n_requests=200, n_concurrency=4)
+    assert status.tolist() == [200] * 200
+    assert np.all(np.diff(timings["start"]) >= 0)
+    assert abs(timings["start"][0] - time.time()) < 60
+    assert np.all(timings["ttfb"] > 0)
+    assert np.all(timings["latency"] >= timings["ttfb"])
+    assert np.allclose(timings["connect"] + timings["processing"], timings["latency"], atol=1e-3)
+    # Keep-alive: each of the 4 workers connects once
+    assert int((timings["connect"] > 0).sum()) == 4
+
+
+def test_post_body_is_sent(stub):
+    _, status = run_benchmark(stub, "/apps", "POST", b'{"name":"x"}', n_requests=20, n_concurrency=2)
+    assert status.tolist() == [200] * 20
+
+
+def test_measured_latency_matches_the_server_time(slow_stub):
+    server, host = slow_stub
+    timings, status = run_benchmark(host, "/", n_requests=40, n_concurrency=2)
+    assert status.tolist() == [200] * 40
+    assert server.connections == 2
+    assert len(server.served) == 40
+    # The client never reports less than the server spent, and adds little on top of it
+    assert np.median(timings["latency"]) >= DELAY * 1e3
+    assert np.median(timings["latency"]) - np.median(server.served) < MAX_CLIENT_OVERHEAD
+
+
+@pytest.mark.parametrize("path, connections", [("/chunked", 2), ("/close", 10)])
+def test_chunked_and_close_delimited_responses(slow_stub, path, connections):
+    server, host = slow_stub
+    timings, status = run_benchmark(host, path, n_requests=10, n_concurrency=2)
+    assert status.tolist() == [200] * 10
+    # A close-delimited body costs a new connection per request, and its connect time is recorded
+    assert server.connections == connections
+    assert int((timings["connect"] > 0).sum()) == connections
+
+
+def test_error_status_is_recorded(slow_stub):
+    _, host = slow_stub
+    _, status = run_benchmark(host, "/busy", n_requests=5, n_concurrency=1)
+    assert status.tolist() == [503] * 5
+
+
+def test_refused_connections_are_status_zero():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    timings, status = run_benchmark(f"http://127.0.0.1:{port}", "/", n_requests=5, n_concurrency=2)
+    assert status.tolist() == [0] * 5
+    assert np.isnan(timings["ttfb"]).all()
+    assert np.all(timings["latency"] >= 0)
+
+
+def test_unsupported_scheme_is_rejected():
+    with pytest.raises(ValueError):
+        run_benchmark("ftp://127.0.0.1:21", "/", n_requests=1)
+
+
+def test_load_ab_gnuplot_orders_by_start_time():
+    timings = load_ab_gnuplot(os.path.join(FIXTURES, "gnuplot.tsv"))
+    # ab writes its rows sorted by total time
+    assert timings["start"].tolist() == [1792152000, 1792152000, 1792152001, 1792152002]
+    # ab only records whole seconds; rows of the same second come in either order
+    rows = sorted(zip(timings["start"].tolist(), timings["connect"].tolist(), timings["processing"].tolist(),
+                      timings["latency"].tolist()))
+    assert rows == [(1792152000, 0, 12, 12), (1792152000, 1, 3, 4), (1792152001, 0, 2, 2), (1792152002, 0, 5, 5)]
+    assert np.isnan(timings["ttfb"]).all()
+
+
+def test_load_ab_gnuplot_of_a_run_where_every_request_failed(tmp_path):
+    path = tmp_path / "gnuplot.tsv"
+    path.write_text("starttime\tseconds\tctime\tdtime\tttime\twait\n")
+    assert len(load_ab_gnuplot(str(path))) == 0
+
+
+@pytest.mark.skipif(shutil.which("ab") is None, reason="ab is not installed")
+def test_latency_agrees_with_ab(slow_stub, tmp_path):
+    _, host = slow_stub
+    timings, _ = run_benchmark(host, "/", n_requests=40, n_concurrency=2)
+    gnuplot = str(tmp_path / "ab.tsv")
+    subprocess.run(["ab", "-k", "-q", "-n", "40", "-c", "2", "-g", gnuplot, host + "/"], check=True,
+                   stdout=subprocess.DEVNULL)
+    ab = load_ab_gnuplot(gnuplot)
+    # ab reports whole milliseconds
+    assert abs(np.median(timings["latency"]) - np.median(ab["latency"])) < MAX_CLIENT_OVERHEAD + 1
@@ -0,0 +1,131 @@
+import os
+import shutil
+import time
+import numpy as np
+import pytest
+from cgroup_sampler import CgroupSampler, SAMPLE_FIELDS, SamplerWindow, compose_container_names
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+CGROUP_TREE = os.path.join(FIXTURES, "cgroup")
+
+
+@pytest.fixture
+def tree(tmp_path):
+    # A writable copy, so tests can advance counters or break a container
+    root = tmp_path / "cgroup"
+    shutil.copytree(CGROUP_TREE, root)
+    return {name: str(root / name) for name in ("web", "db")}
+
+
+def test_sample_reads_counters_of_every_container(tree):
+    sampler = CgroupSampler(tree, capacity=8)
+    try:
+        sampler.sample_once()
+    finally:
+        sampler.stop()
+    assert sampler.count == 1
+    web, db = sampler.samples[0]
+    assert dict(zip(SAMPLE_FIELDS, web)) == {"cpu_usage_usec": 1500000, "cpu_throttled_usec": 30000,
+                                             "memory_current": 104857600, "io_rbytes": 4196, "io_wbytes": 8192}
+    assert dict(zip(SAMPLE_FIELDS, db)) == {"cpu_usage_usec": 250, "cpu_throttled_usec": 0,
+                                            "memory_current": 2048, "io_rbytes": 0, "io_wbytes": 0}
+
+
+def test_counters_are_reread_from_the_open_files(tree):
+    sampler = CgroupSampler(tree, capacity=8)
+    try:
+        sampler.sample_once()
+        with open(os.path.join(tree["web"], "memory.current"), "r+") as f:
+            f.write("209715200\n")
+        sampler.sample_once()
+    finally:
+        sampler.stop()
+    assert sampler.samples[:2, 0, SAMPLE_FIELDS.index("memory_current")].tolist() == [104857600, 209715200]
+
+
+def test_window_returns_the_newest_samples_in_order_after_wrap_around(tree):
+    sampler = CgroupSampler(tree, capacity=4)
+    path = os.path.join(tree["db"], "memory.current")
+    try:
+        for value in range(6):
+            with open(path, "w") as f:
+                f.write(f"{value}\n")
+            sampler.sample_once()
+    finally:
+        sampler.stop()
+    timestamps, samples = sampler.window(0, float("inf"))
+    assert len(timestamps) == 4
+    assert np.all(np.diff(timestamps) >= 0)
+    assert samples[:, 1, SAMPLE_FIELDS.index("memory_current")].tolist() == [2, 3, 4, 5]
+
+
+def test_unreadable_container_becomes_nan_and_the_others_keep_sampling(tree, capsys):
+    sampler = CgroupSampler(tree, capacity=8)
+    try:
+        sampler.sample_once()
+        with open(os.path.join(tree["web"], "memory.current"), "w") as f:
+            f.write("max\n")
+        sampler.sample_once()
+        sampler.sample_once()
+    finally:
+        sampler.stop()
+    assert set(sampler.failed) == {"web"}
+    assert "[Error] cgroup of web" in capsys.readouterr().out
+    assert np.isnan(sampler.samples[1:3, 0]).all()
+    assert not np.isnan(sampler.samples[:3, 1]).any()
+
+
+def test_missing_cgroup_files_are_nan(tree):
+    os.remove(os.path.join(tree["db"], "io.stat"))
+    sampler = CgroupSampler(tree, capacity=2)
+    try:
+        sampler.sample_once()
+    finally:
+        sampler.stop()
+    db = dict(zip(SAMPLE_FIELDS, sampler.samples[0, 1]))
+    assert np.isnan(db["io_rbytes"]) and np.isnan(db["io_wbytes"])
+    assert db["memory_current"] == 2048
+    assert not sampler.failed
+
+
+def test_missing_cgroup_is_nan(tmp_path):
+    sampler = CgroupSampler({"gone": str(tmp_path / "missing")}, capacity=2)
+    try:
+        sampler.sample_once()
+    finally:
+        sampler.stop()
+    assert np.isnan(sampler.samples[0, 0]).all()
+
+
+def test_window_cpu_utilization_and_memory(tree):
+    sampler = CgroupSampler(tree, capacity=4)
+    sampler.stop()
+    window = SamplerWindow(sampler)
+    samples = np.zeros((3, 2, len(SAMPLE_FIELDS)))
+    # web burns half a core; db was unreadable after its first sample
+    samples[:, 0, 0] = [0, 500000, 1000000]
+    samples[:, 0, 2] = [1024 * 1024, 3 * 1024 * 1024, 2 * 1024 * 1024]
+    samples[1:, 1] = np.nan
+    window.result = (np.array([10.0, 11.0, 12.0]), samples)
+    utilization = window.cpu_utilization()
+    assert utilization[0] == pytest.approx(0.5)
+    assert np.isnan(utilization[1])
+    assert window.mean_memory_mb()[0] == pytest.approx(2.0)
+
+
+def test_thread_samples_until_stopped(tree):
+    sampler = CgroupSampler(tree, interval=0.001, capacity=1024).start()
+    deadline = time.monotonic() + 10
+    with sampler.subscribe() as window:
+        while sampler.count < 5 and time.monotonic() < deadline:
+            time.sleep(0.001)
+    sampler.stop()
+    timestamps, samples = window.result
+    assert sampler.count >= 5
+    assert len(timestamps) >= 1
+    assert samples.shape[1:] == (2, len(SAMPLE_FIELDS))
+    assert sampler.overhead() >= 0.0
+
+
+def test_compose_container_names_in_file_order_without_duplicates():
+    assert compose_container_names(os.path.join(FIXTURES, "compose")) == ["cache", "web", "db"]
@@ -0,0 +1,144 @@
+import http.client
+import json
+import os
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler
+import pytest
+from docker_stats import DockerClient, DockerStatsCollector, STATS_FIELDS, parse_stats
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "docker")
+
+with open(os.path.join(FIXTURES, "containers.json")) as f:
+    CONTAINERS = json.load(f)
+with open(os.path.join(FIXTURES, "stats.jsonl"), "rb") as f:
+    STATS_LINES = f.read().splitlines(keepends=True)
+STATS = [json.loads(line) for line in STATS_LINES if line.strip()]
+
+
+class FakeDocker(socketserver.ThreadingUnixStreamServer):
+    """
+    Docker Engine API on a unix socket: the recorded container list, and stats streams that send the recorded
+    documents as chunks and then stay open until the client goes away.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, path: str):
+        self.connections = 0
+        self.requests = []
+        super().__init__(path, FakeDockerHandler)
+
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.requests.append(self.path)
+        if self.path == "/containers/json":
+            body = json.dumps(CONTAINERS).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        elif self.path.endswith("/stats?stream=true"):
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for line in STATS_LINES:
+                self.wfile.write(b"%x\r\n%s\r\n" % (len(line), line))
+            self.wfile.flush()
+            # Docker keeps streaming; here the stream idles until the client shuts the connection
+            self.rfile.read(1)
+            self.close_connection = True
+        else:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def docker_socket(tmp_path):
+    path = str(tmp_path / "docker.sock")
+    server = FakeDocker(path)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, path
+    server.shutdown()
+    server.server_close()
+
+
+def test_parse_stats_matches_docker_stats():
+    first, second, empty = (parse_stats(stats) for stats in STATS)
+    assert dict(zip(STATS_FIELDS, first)) == {"cpu_percent": pytest.approx(20.0), "memory_usage": 52428800,
+                                              "memory_limit": 1073741824, "net_rx": 1024, "net_tx": 2048,
+                                              "blk_read": 4096, "blk_write": 8192}
+    # Without online_cpus the number of per-CPU counters is used
+    assert second[0] == pytest.approx(40.0)
+    assert second[5:] == [0, 0]
+    assert empty == [0.0, 0, 0, 0, 0, 0, 0]
+
+
+def test_client_lists_containers_over_one_pooled_connection(docker_socket):
+    server, path = docker_socket
+    client = DockerClient(path)
+    try:
+        assert client.list_containers() == {"dataflow-server": "5f1c0a9e2b7d", "skipper-server": "9a4b3c2d1e0f"}
+        client.list_containers()
+    finally:
+        client.close()
+    assert server.connections == 1
+
+
+def test_client_raises_on_error_status(docker_socket):
+    _, path = docker_socket
+    client = DockerClient(path)
+    try:
+        with pytest.raises(http.client.HTTPException):
+            client.get_json("/containers/missing/json")
+    finally:
+        client.close()
+
+
+def test_collector_streams_every_sample_of_the_followed_containers(docker_socket):
+    server, path = docker_socket
+    started = time.time()
+    collector = DockerStatsCollector(["skipper-server", "not-running"], socket_path=path).start()
+    try:
+        deadline = time.monotonic() + 10
+        while collector.counts["skipper-server"] < len(STATS) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert collector.containers == ["skipper-server"]
+        timestamps, samples = collector.window(started, time.time())["skipper-server"]
+        assert len(timestamps) == len(STATS)
+        assert samples.tolist() == [parse_stats(stats) for stats in STATS]
+        assert collector.latest()["skipper-server"].tolist() == parse_stats(STATS[-1])
+    finally:
+        # The stream is still open; stop() has to unblock the reader thread
+        stopped = time.monotonic()
+        collector.stop()
+    assert time.monotonic() - stopped < 5
+    assert "/containers/9a4b3c2d1e0f/stats?stream=true" in server.requests
+    assert not any("5f1c0a9e2b7d" in request for request in server.requests)
+
+
+def test_collector_ring_keeps_the_newest_samples(docker_socket):
+    _, path = docker_socket
+    collector = DockerStatsCollector(["dataflow-server"], socket_path=path, capacity=2).start()
+    try:
+        deadline = time.monotonic() + 10
+        while collector.counts["dataflow-server"] < len(STATS) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        _, samples = collector.window(0, float("inf"))["dataflow-server"]
+    finally:
+        collector.stop()
+    assert samples.tolist() == [parse_stats(stats) for stats in STATS[-2:]]
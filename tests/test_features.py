@@ -0,0 +1,42 @@
+import os
+import numpy as np
+from features import AB_RESOLUTION, BIN, build_features, load_features, store_bin_width
+from results_store import write_batch
+
+T0 = 1792152000.0
+
+
+def write_run(store_dir, run_id, scenario, start):
+    rng = np.random.default_rng(0)
+    write_batch(os.path.join(store_dir, f"{run_id}-b000000.npz"),
+                [{"method": "GET", "endpoint": "/apps", "url": "/apps", "scenario": scenario,
+                  "request_start": start, "latency": rng.random(len(start)) * 10}])
+
+
+def starts(n=3000, seconds=120.0):
+    return T0 + np.sort(np.random.default_rng(1).random(n)) * seconds
+
+
+def test_store_with_ab_runs_is_binned_at_the_ab_resolution(tmp_path):
+    store_dir = str(tmp_path / "store")
+    os.makedirs(store_dir)
+    write_run(store_dir, "benign-1", "benign", starts())
+    assert store_bin_width(store_dir) == BIN
+    # ab records whole-second request starts
+    write_run(store_dir, "attack-1", "attack", np.floor(starts()))
+    assert store_bin_width(store_dir) == AB_RESOLUTION
+    meta = build_features(store_dir, str(tmp_path / "features"))
+    assert meta["bin"] == AB_RESOLUTION
+    assert [run["scenario"] for run in meta["runs"]] == ["attack", "benign"]
+    _, labels, _, _ = load_features(str(tmp_path / "features"))
+    assert labels.sum() > 0 and (labels == 0).sum() > 0
+
+
+def test_explicit_finer_bins_skip_ab_runs(tmp_path):
+    store_dir = str(tmp_path / "store")
+    os.makedirs(store_dir)
+    write_run(store_dir, "attack-1", "attack", np.floor(starts()))
+    write_run(store_dir, "benign-1", "benign", starts())
+    meta = build_features(store_dir, str(tmp_path / "features"), bin_width=BIN)
+    assert meta["bin"] == BIN
+    assert [run["scenario"] for run in meta["runs"]] == ["benign"]
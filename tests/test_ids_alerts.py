@@ -0,0 +1,128 @@
+import os
+import shutil
+import time
+import numpy as np
+import pytest
+from ids_alerts import AlertIndex, detection_report, parse_eve_alert, parse_snort_alert
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "ids")
+
+T0 = 1792152000.0  # 2026-10-16 12:00:00 UTC, the start of the recorded logs
+EVE_ALERTS = [(T0 + 1.25, 0, 2100498, 2, 8080), (T0 + 3.5, 0, 2013028, 1, 9393), (T0 + 20.0, 0, 2200003, 3, 0)]
+SNORT_ALERTS = [(T0 + 2.0, 1, 1000001, 2, 9393), (T0 + 30.5, 1, 1000002, 3, 8080), (T0 + 31.0, 1, 1000003, 0, 0)]
+
+
+@pytest.fixture(autouse=True)
+def utc(monkeypatch):
+    # Snort writes local time; the recorded log was written in UTC
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.fixture
+def logs(tmp_path):
+    eve = tmp_path / "eve.json"
+    snort = tmp_path / "alert"
+    shutil.copy(os.path.join(FIXTURES, "eve.json"), eve)
+    shutil.copy(os.path.join(FIXTURES, "alert"), snort)
+    return str(eve), str(snort), str(tmp_path / "alerts")
+
+
+def read_lines(name):
+    with open(os.path.join(FIXTURES, name), "rb") as f:
+        return f.read().splitlines()
+
+
+def test_parse_recorded_suricata_events():
+    rows = [parse_eve_alert(line) for line in read_lines("eve.json")]
+    # flow and stats events, and an alert with a malformed timestamp, are skipped
+    assert [row for row in rows if row is not None] == EVE_ALERTS
+
+
+def test_parse_recorded_snort_fast_alerts():
+    rows = [parse_snort_alert(line, 2026) for line in read_lines("alert")]
+    # Snort's own status lines are not alerts; missing priority and port become 0
+    assert [row for row in rows if row is not None] == SNORT_ALERTS
+
+
+def test_ingest_merges_both_logs_by_time(logs):
+    eve, snort, alert_dir = logs
+    index = AlertIndex(alert_dir)
+    assert index.ingest(eve, snort, year=2026) == 6
+    assert index.alerts.tolist() == sorted(EVE_ALERTS + SNORT_ALERTS)
+    assert index.ingest(eve, snort, year=2026) == 0
+    assert index.window(T0 + 2.0, T0 + 20.0)["sid"].tolist() == [1000001, 2013028, 2200003]
+
+
+def test_ingest_reads_only_complete_appended_lines(logs):
+    eve, snort, alert_dir = logs
+    index = AlertIndex(alert_dir)
+    index.ingest(eve, snort, year=2026)
+    line = read_lines("alert")[0].replace(b"12:00:02", b"12:00:40")
+    with open(snort, "ab") as f:
+        f.write(line[:30])
+    assert index.ingest(eve, snort, year=2026) == 0
+    with open(snort, "ab") as f:
+        f.write(line[30:] + b"\n")
+    assert index.ingest(eve, snort, year=2026) == 1
+    assert index.alerts[-1].tolist() == (T0 + 40.0, 1, 1000001, 2, 9393)
+
+
+def test_restart_continues_from_the_checkpoint(logs):
+    eve, snort, alert_dir = logs
+    AlertIndex(alert_dir).ingest(eve, snort, year=2026)
+    restarted = AlertIndex(alert_dir)
+    assert len(restarted.alerts) == 6
+    assert restarted.ingest(eve, snort, year=2026) == 0
+
+
+def test_lines_reread_after_a_crash_are_not_counted_twice(logs):
+    eve, snort, alert_dir = logs
+    checkpoint = os.path.join(alert_dir, "checkpoint.json")
+    AlertIndex(alert_dir).ingest(eve, snort + ".missing", year=2026)
+    shutil.copy(checkpoint, checkpoint + ".old")
+    AlertIndex(alert_dir).ingest(eve, snort, year=2026)
+    # A crash between writing the alerts and the checkpoint leaves the new alerts with the old checkpoint
+    os.replace(checkpoint + ".old", checkpoint)
+    restarted = AlertIndex(alert_dir)
+    assert restarted.ingest(eve, snort, year=2026) == 0
+    assert restarted.alerts.tolist() == sorted(EVE_ALERTS + SNORT_ALERTS)
+
+
+def test_rotated_log_is_read_from_the_start(logs, tmp_path):
+    eve, snort, alert_dir = logs
+    index = AlertIndex(alert_dir)
+    index.ingest(eve, snort, year=2026)
+    rotated = tmp_path / "alert.new"
+    rotated.write_bytes(read_lines("alert")[0].replace(b"12:00:02", b"12:01:00") + b"\n")
+    os.replace(rotated, snort)
+    assert index.ingest(eve, snort, year=2026) == 1
+
+
+def test_detection_report_per_scenario_and_ids(logs):
+    eve, snort, alert_dir = logs
+    index = AlertIndex(alert_dir)
+    index.ingest(eve, snort, year=2026)
+    columns = {
+        "scenario": np.array(["attack", "attack", "benign"]),
+        "endpoint": np.array(["/login", "/login", "/catalogue"]),
+        "started": np.array([T0, T0 + 10.0, T0 + 19.0]),
+        "finished": np.array([T0 + 1.0, T0 + 12.0, T0 + 21.0]),
+    }
+    report = detection_report(index, columns, grace=5.0)
+    # The second /login window has no alert within its end plus the grace period
+    assert report["suricata"] == [
+        {"scenario": "attack", "endpoint": "/login", "windows": 2, "detection_rate": 0.5,
+         "median_time_to_alert": 1.25, "min_time_to_alert": 1.25},
+        {"scenario": "benign", "endpoint": "/catalogue", "windows": 1, "false_positive_rate": 1.0,
+         "median_time_to_alert": 1.0, "min_time_to_alert": 1.0},
+    ]
+    assert report["snort"] == [
+        {"scenario": "attack", "endpoint": "/login", "windows": 2, "detection_rate": 0.5,
+         "median_time_to_alert": 2.0, "min_time_to_alert": 2.0},
+        {"scenario": "benign", "endpoint": "/catalogue", "windows": 1, "false_positive_rate": 0.0,
+         "median_time_to_alert": None, "min_time_to_alert": None},
+    ]
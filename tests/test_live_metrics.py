@@ -0,0 +1,135 @@
+import re
+import time
+import urllib.error
+import urllib.request
+import numpy as np
+import pytest
+from async_client import run_benchmark, serve_stub
+from cgroup_sampler import SAMPLE_FIELDS
+from live_metrics import LiveMetrics
+
+INTERVAL = 0.05  # seconds between aggregation passes in the tests
+SAMPLE = re.compile(r'^([a-z_]+)(?:\{(.*)\})? (-?[0-9.]+|nan|NaN)$')
+
+
+class StubSampler:
+    """
+    Stands in for CgroupSampler: two containers, the first burning half a core over one second.
+    """
+
+    containers = ["web", "db"]
+
+    def window(self, start, end):
+        samples = np.zeros((2, 2, len(SAMPLE_FIELDS)))
+        samples[1, 0, 0] = 500000
+        samples[1, 0, 1] = 100000
+        samples[:, :, 2] = 64 * 1024 * 1024
+        return np.array([end - 1.0, end]), samples
+
+
+def scrape(url):
+    """
+    Fetch the page and parse it into {(name, labels): value}; fails on lines that are not valid samples.
+    """
+    with urllib.request.urlopen(url, timeout=10) as response:
+        assert response.headers["Content-Type"] == "text/plain; version=0.0.4; charset=utf-8"
+        text = response.read().decode()
+    samples = {}
+    for line in text.splitlines():
+        if line.startswith("# HELP ") or line.startswith("# TYPE "):
+            continue
+        name, labels, value = SAMPLE.match(line).groups()
+        samples[(name, labels or "")] = float(value)
+    return samples
+
+
+def scrape_until(metrics, condition):
+    deadline = time.monotonic() + 10
+    while True:
+        samples = scrape(metrics.url)
+        if condition(samples) or time.monotonic() > deadline:
+            return samples
+        time.sleep(INTERVAL)
+
+
+@pytest.fixture
+def metrics():
+    live = LiveMetrics(port=0, sampler=StubSampler(), total_endpoints=3, interval=INTERVAL, summary_interval=0)
+    live.start()
+    yield live
+    live.stop()
+
+
+@pytest.fixture
+def stub():
+    server = serve_stub()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def test_scrape_during_a_run(metrics, stub):
+    run_benchmark(stub, "/apps?page=1", n_requests=50, n_concurrency=2, live=metrics, endpoint="/apps")
+    metrics.endpoint_done("/apps")
+    # An ab run hands over its latencies and failed count at the end
+    metrics.record("/login", "POST", np.array([3.0, 4.0, 5.0]), failed=2)
+    metrics.endpoint_done("/login")
+    key = ("millibottleneck_requests_total", 'endpoint="/login",method="POST",code="failed"')
+    samples = scrape_until(metrics, lambda samples: key in samples)
+    assert samples[("millibottleneck_requests_total", 'endpoint="/apps",method="GET",code="2xx"')] == 50
+    assert samples[("millibottleneck_requests_total", 'endpoint="/login",method="POST",code="2xx"')] == 3
+    assert samples[key] == 2
+    assert samples[("millibottleneck_endpoints_done", "")] == 2
+    assert samples[("millibottleneck_endpoints_total", "")] == 3
+    assert samples[("millibottleneck_request_rate", "")] > 0
+    # 2 failures of the 55 requests in the window
+    assert samples[("millibottleneck_error_ratio", "")] == pytest.approx(2 / 55, abs=1e-6)
+    assert samples[("millibottleneck_latency_ms", 'quantile="0.99"')] > 0
+    assert samples[("millibottleneck_container_cpu_cores", 'container="web"')] == pytest.approx(0.5)
+    assert samples[("millibottleneck_container_cpu_throttled", 'container="web"')] == pytest.approx(0.1)
+    assert samples[("millibottleneck_container_cpu_cores", 'container="db"')] == 0
+    assert samples[("millibottleneck_container_memory_mb", 'container="db"')] == 64
+
+
+def test_watched_rows_count_once_they_start(metrics):
+    timings = np.zeros(4, dtype=[("start", "f8"), ("latency", "f4")])
+    status = np.zeros(4, dtype=np.int16)
+    watch = metrics.watch("/cart", "GET", timings, status)
+    # The status is written before the start time, as async_client does
+    status[:2] = (200, 503)
+    timings[:2] = [(time.time(), 2.0), (time.time(), 8.0)]
+    key = ("millibottleneck_requests_total", 'endpoint="/cart",method="GET",code="5xx"')
+    samples = scrape_until(metrics, lambda samples: key in samples)
+    assert samples[key] == 1
+    status[2] = 0
+    timings[2] = (time.time(), 30000.0)
+    metrics.done(watch)
+    key = ("millibottleneck_requests_total", 'endpoint="/cart",method="GET",code="failed"')
+    samples = scrape_until(metrics, lambda samples: key in samples)
+    assert samples[("millibottleneck_requests_total", 'endpoint="/cart",method="GET",code="2xx"')] == 1
+    assert samples[("millibottleneck_requests_total", 'endpoint="/cart",method="GET",code="5xx"')] == 1
+    assert samples[key] == 1
+    assert metrics.snapshot()["current"] == "/cart"
+
+
+def test_endpoint_labels_are_escaped(metrics):
+    metrics.record('/search?q="a\\b"', "GET", np.array([1.0]))
+    samples = scrape_until(metrics, lambda samples: any('q=' in labels for _, labels in samples))
+    assert samples[("millibottleneck_requests_total", 'endpoint="/search?q=\\"a\\\\b\\"",method="GET",code="2xx"')] == 1
+
+
+def test_only_the_metrics_path_is_served(metrics):
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(metrics.url.replace("/metrics", "/"), timeout=10)
+    assert error.value.code == 404
+
+
+def test_summary_line():
+    live = LiveMetrics(port=0, total_endpoints=3, interval=INTERVAL, summary_interval=0)
+    live.record("/apps", "GET", np.array([1.0, 2.0, 3.0]), failed=1)
+    live.endpoint_done("/apps")
+    live.stop()
+    line = live.summary()
+    assert line.startswith("1/3 endpoints, 4 requests, ")
+    assert "1 failed, 0 HTTP errors, p50 2.0 " in line
+    assert line.endswith("at /apps")
@@ -0,0 +1,248 @@
+import asyncio
+import http.client
+import os
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pytest
+import mitigation_proxy
+from async_client import run_benchmark
+from mitigation_proxy import (BENCH_CONCURRENCY, Chain, ConcurrencyLimit, MitigationProxy, TokenBucket, build_policy,
+                              over_budget, overhead_benchmark)
+
+
+class BackendHandler(BaseHTTPRequestHandler):
+    """
+    Backend behind the proxy: /chunked and /close frame their bodies the other two ways, /slow holds the
+    request for 20 ms, /hang for 2 s, and POST echoes the body. The server counts its connections and the
+    most requests it handled at once.
+    """
+
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.active += 1
+            self.server.max_active = max(self.server.max_active, self.server.active)
+        try:
+            if self.path == "/slow":
+                time.sleep(0.02)
+            elif self.path == "/hang":
+                time.sleep(2.0)
+            if self.path == "/chunked":
+                self.send_response(200)
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                self.wfile.write(b"3\r\nabc\r\n2\r\nde\r\n0\r\nX-Trailer: 1\r\n\r\n")
+            elif self.path == "/close":
+                self.send_response(200)
+                self.end_headers()
+                self.wfile.write(b"until close")
+                self.close_connection = True
+            else:
+                self.reply(self.path.encode())
+        finally:
+            with self.server.lock:
+                self.server.active -= 1
+
+    def do_POST(self):
+        self.reply(self.rfile.read(int(self.headers["Content-Length"])))
+
+    def reply(self, body):
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def backend():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), BackendHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.connections = server.active = server.max_active = 0
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def run_proxy():
+    """
+    Start a MitigationProxy on its own event loop thread; returns (proxy, port).
+    """
+    running = []
+
+    def start(upstream, policy=None):
+        proxy = MitigationProxy(upstream, policy, port=0)
+        loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        task = loop.create_task(proxy.serve(lambda port: ready.set()))
+
+        def serve():
+            try:
+                loop.run_until_complete(task)
+            except asyncio.CancelledError:
+                pass
+
+        thread = threading.Thread(target=serve, daemon=True)
+        thread.start()
+        assert ready.wait(10)
+        running.append((loop, task, thread))
+        return proxy, proxy.port
+
+    yield start
+    for loop, task, thread in running:
+        loop.call_soon_threadsafe(task.cancel)
+        thread.join(10)
+        loop.close()
+
+
+def get(port, paths, method="GET", body=None):
+    """
+    Send requests one after another over one connection; returns (status, headers, body) of each.
+    """
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+    try:
+        replies = []
+        for path in paths:
+            conn.request(method, path, body)
+            response = conn.getresponse()
+            replies.append((response.status, dict(response.getheaders()), response.read()))
+        return replies
+    finally:
+        conn.close()
+
+
+def test_requests_are_forwarded_over_one_pooled_upstream_connection(backend, run_proxy):
+    server, upstream = backend
+    proxy, port = run_proxy(upstream)
+    replies = get(port, ["/a", "/b?x=1"]) + get(port, ["/a"])
+    assert [(status, body) for status, _, body in replies] == [(200, b"/a"), (200, b"/b?x=1"), (200, b"/a")]
+    assert server.connections == 1
+    assert proxy.stats == {"requests": 3, "shed": 0, "upstream_errors": 0}
+
+
+def test_response_framings_and_request_bodies(backend, run_proxy):
+    _, upstream = backend
+    _, port = run_proxy(upstream)
+    (chunked_status, _, chunked), (close_status, headers, close_body) = get(port, ["/chunked", "/close"])
+    assert (chunked_status, chunked) == (200, b"abcde")
+    # A body delimited by the upstream closing is sent on with a length, so the client connection stays open
+    assert (close_status, close_body, headers["Content-Length"]) == (200, b"until close", "11")
+    (status, _, body), = get(port, ["/apps"], "POST", b'{"name": "x"}')
+    assert (status, body) == (200, b'{"name": "x"}')
+
+
+def test_pipelined_requests_are_answered_in_order(backend, run_proxy):
+    _, upstream = backend
+    _, port = run_proxy(upstream)
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as sock:
+        sock.sendall(b"GET /slow HTTP/1.1\r\nHost: x\r\n\r\nGET /fast HTTP/1.1\r\nHost: x\r\n\r\n")
+        received = b""
+        while received.count(b"HTTP/1.1 200") < 2 or not received.endswith(b"/fast"):
+            chunk = sock.recv(65536)
+            assert chunk
+            received += chunk
+    assert received.index(b"/slow") < received.index(b"/fast")
+
+
+def test_http10_connection_is_closed_after_the_response(backend, run_proxy):
+    _, upstream = backend
+    _, port = run_proxy(upstream)
+    with socket.create_connection(("127.0.0.1", port), timeout=10) as sock:
+        sock.sendall(b"GET /old HTTP/1.0\r\n\r\n")
+        received = b""
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            received += chunk
+    assert received.startswith(b"HTTP/1.1 200") and received.endswith(b"/old")
+
+
+def test_token_bucket_sheds_beyond_the_burst(backend, run_proxy):
+    _, upstream = backend
+    proxy, port = run_proxy(upstream, TokenBucket(rate=0.001, burst=2))
+    replies = get(port, ["/a"] * 5)
+    assert [status for status, _, _ in replies] == [200, 200, 503, 503, 503]
+    assert replies[2][1]["Retry-After"] == "1"
+    assert proxy.stats["shed"] == 3
+
+
+def test_endpoint_limit_queues_instead_of_shedding(backend, run_proxy):
+    server, upstream = backend
+    _, port = run_proxy(upstream, ConcurrencyLimit(limit=1))
+    _, status = run_benchmark(f"http://127.0.0.1:{port}", "/slow", n_requests=20, n_concurrency=5)
+    assert status.tolist() == [200] * 20
+    assert server.max_active == 1
+
+
+def test_chained_policies_release_what_they_admitted(backend, run_proxy):
+    _, upstream = backend
+    limit = ConcurrencyLimit(limit=2)
+    _, port = run_proxy(upstream, Chain([limit, TokenBucket(rate=0.001, burst=1)]))
+    assert [status for status, _, _ in get(port, ["/a"] * 3)] == [200, 503, 503]
+    # Shed requests gave their endpoint slot back
+    assert limit.slots["GET /a"].active == 0
+
+
+def test_unreachable_upstream_is_a_bad_gateway(run_proxy):
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        dead = sock.getsockname()[1]
+    proxy, port = run_proxy(f"http://127.0.0.1:{dead}")
+    assert [status for status, _, _ in get(port, ["/a", "/a"])] == [502, 502]
+    assert proxy.stats["upstream_errors"] == 2
+
+
+def test_hanging_upstream_times_out(backend, run_proxy, monkeypatch):
+    monkeypatch.setattr(mitigation_proxy, "UPSTREAM_TIMEOUT", 0.2)
+    monkeypatch.setattr(mitigation_proxy, "TIMEOUT_SWEEP", 0.05)
+    _, upstream = backend
+    _, port = run_proxy(upstream)
+    started = time.monotonic()
+    (status, _, _), = get(port, ["/hang"])
+    assert status == 502
+    assert time.monotonic() - started < 1.5
+    # The timed-out connection is not reused for the next request
+    (status, _, body), = get(port, ["/a"])
+    assert (status, body) == (200, b"/a")
+
+
+def test_build_policy():
+    assert build_policy("none").name == "none"
+    assert build_policy("token_bucket+shortest_first").name == "token_bucket+shortest_first"
+    with pytest.raises(ValueError):
+        build_policy("token_bucket+fastest")
+
+
+def test_over_budget():
+    rows = [{"concurrency": 1, "added_p99": 0.2}, {"concurrency": 10, "added_p99": 1.2}]
+    assert over_budget(rows) == rows[1:]
+
+
+def test_proxy_overhead_within_budget():
+    # A reduced benchmark at every concurrency, on whatever cores the machine has
+    results = overhead_benchmark(n_requests=2000, rounds=4)
+    cores = len(os.sched_getaffinity(0))
+    assert [result["concurrency"] for result in results] == list(BENCH_CONCURRENCY)
+    assert all(result["failed"] == 0 and result["cores"] == cores for result in results)
+    assert all(np.isfinite(result["added_p99"]) for result in results)
+    over = over_budget(results)
+    if over and cores < 3:
+        # The budget holds with backend, proxy and client on separate cores
+        pytest.xfail(f"{cores} cores: the proxy adds " + ", ".join(
+            f"{result['added_p99']:.2f} ms at p99 with {result['concurrency']} connections" for result in over))
+    assert not over
@@ -0,0 +1,103 @@
+import os
+import numpy as np
+import pytest
+from pcap_latency import (http_responses, join_results, parse_tcp_packets, request_line, retransmitted,
+                          write_synthetic_pcap)
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "pcap")
+
+# Every synthetic GET exchange is three segments, every POST four
+SEGMENTS_PER_PAIR = 3 + 4
+TIMESTAMP_MS = 0.002  # the synthetic capture stores microseconds
+
+
+def per_flow(responses):
+    # write_synthetic_pcap returns the response times flow by flow
+    return responses["server_ms"][np.lexsort((responses["request_ts"], responses["client_port"]))]
+
+
+def test_synthetic_capture_pairs_every_exchange(tmp_path):
+    path = str(tmp_path / "capture.pcap")
+    expected = write_synthetic_pcap(path, n_flows=4, requests_per_flow=50)
+    packets = parse_tcp_packets(path)
+    assert len(packets["ts"]) == 4 * 25 * SEGMENTS_PER_PAIR
+    responses = http_responses(packets)
+    assert len(responses) == len(expected)
+    assert np.all(np.diff(responses["request_ts"]) >= 0)
+    assert np.allclose(per_flow(responses), expected, atol=TIMESTAMP_MS)
+    assert set(responses["status"].tolist()) == {200}
+    assert responses["method"].tolist().count(1) == 100
+    assert np.allclose(responses["transfer_ms"], 0.1, atol=TIMESTAMP_MS)
+    assert request_line(packets, responses[0]) == "GET /apps HTTP/1.1"
+
+
+def test_sequence_numbers_wrap_without_false_retransmissions(tmp_path):
+    path = str(tmp_path / "capture.pcap")
+    write_synthetic_pcap(path, n_flows=2, requests_per_flow=10)
+    packets = parse_tcp_packets(path)
+    # The streams start 100 bytes below 2^32
+    assert packets["seq"].max() > (1 << 32) - 200
+    assert packets["seq"].min() < 1000
+    assert not retransmitted(packets).any()
+
+
+def test_retransmissions_do_not_change_the_percentiles(tmp_path):
+    path = str(tmp_path / "capture.pcap")
+    expected = write_synthetic_pcap(path, n_flows=4, requests_per_flow=50, retransmit=0.3)
+    packets = parse_tcp_packets(path)
+    duplicates = retransmitted(packets)
+    assert duplicates.sum() == len(packets["ts"]) - 4 * 25 * SEGMENTS_PER_PAIR > 0
+    responses = http_responses(packets)
+    assert len(responses) == len(expected)
+    assert np.allclose(per_flow(responses), expected, atol=TIMESTAMP_MS)
+    assert np.percentile(responses["server_ms"], 99) == pytest.approx(np.percentile(expected, 99), abs=TIMESTAMP_MS)
+
+
+def packets_of(seq, payload_len, src_port=40000):
+    n = len(seq)
+    return {"src_ip": np.full(n, 1, np.uint32), "dst_ip": np.full(n, 2, np.uint32),
+            "src_port": np.full(n, src_port, np.uint16), "dst_port": np.full(n, 80, np.uint16),
+            "seq": np.array(seq, np.uint32), "payload_len": np.array(payload_len, np.int64)}
+
+
+def test_repacketized_retransmission_is_marked_only_when_fully_resent():
+    # The third segment resends bytes 50-149, the fourth carries 50 new bytes after 200
+    packets = packets_of([0, 100, 50, 150], [100, 100, 100, 100])
+    assert retransmitted(packets).tolist() == [False, False, True, False]
+
+
+def test_large_sequence_jump_on_the_same_ports_is_a_new_connection():
+    # ab reuses ephemeral ports; the second connection's initial sequence number is unrelated to the first
+    packets = packets_of([1000, 1100, 1000 + (1 << 30), 1000], [100, 100, 100, 100])
+    assert retransmitted(packets).tolist() == [False, False, False, False]
+
+
+def test_recorded_cooked_capture_with_nanosecond_timestamps():
+    packets = parse_tcp_packets(os.path.join(FIXTURES, "cooked_ns.pcap"))
+    # The UDP lookup and the record cut short by the end of the capture are skipped
+    assert len(packets["ts"]) == 6
+    responses = http_responses(packets)
+    # The last request was never answered
+    assert responses["status"].tolist() == [404, 201]
+    assert responses["server_ms"].tolist() == pytest.approx([3.25, 10.0], rel=1e-3)
+    assert responses["transfer_ms"].tolist() == pytest.approx([0.05, 0.0], abs=1e-3)
+    assert [request_line(packets, r) for r in responses] == ["GET /catalogue?page=2 HTTP/1.1", "POST /cart HTTP/1.1"]
+    assert responses["server_port"].tolist() == [8080, 8080]
+    assert len(http_responses(packets, server_ports=(9393,))) == 0
+
+
+def test_join_results_per_test_window():
+    responses = http_responses(parse_tcp_packets(os.path.join(FIXTURES, "cooked_ns.pcap")))
+    t0 = 1792152000.0
+    columns = {"started": np.array([t0, t0 + 1.5, t0 + 5]), "finished": np.array([t0 + 2.5, t0 + 2.5, t0 + 6])}
+    joined = join_results(responses, columns, server_port=8080)
+    assert joined["count"].tolist() == [2, 1, 0]
+    assert joined["server_p50"][:2].tolist() == pytest.approx([6.625, 10.0], rel=1e-3)
+    assert np.isnan(joined["server_p99"][2])
+
+
+def test_pcapng_is_rejected(tmp_path):
+    path = tmp_path / "capture.pcapng"
+    path.write_bytes(b"\x0a\x0d\x0d\x0a" + b"\x00" * 28)
+    with pytest.raises(ValueError):
+        parse_tcp_packets(str(path))
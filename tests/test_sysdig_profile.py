@@ -0,0 +1,114 @@
+import os
+import time
+import numpy as np
+import pytest
+from sysdig_profile import DAY, SyscallProfile, iter_capture, profile_capture
+
+FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "sysdig")
+
+T0 = 1792152000.0  # 2026-10-16 12:00:00 UTC, the start of the recorded captures
+MS = 1_000_000  # ns
+
+
+@pytest.fixture(autouse=True)
+def utc(monkeypatch):
+    # The default sysdig layout only has the local time of day; the captures were recorded in UTC
+    monkeypatch.setenv("TZ", "UTC")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def rows(profile):
+    return [(r["window"], r["container"], r["syscall_class"], int(r["count"]), float(r["blocked_ms"]))
+            for r in profile.report()]
+
+
+def test_capture_in_sysdig_format_uses_the_recorded_latency():
+    (ts, containers, classes, latencies), = iter_capture(os.path.join(FIXTURES, "capture.txt"))
+    # The enter event of the first fsync is skipped; its exit carries evt.latency
+    assert ts[0] == int(T0 * 1e9) + 1004 * MS
+    assert containers == ["web", "web", "web", "db", "db", "web"]
+    assert classes.tolist() == [0, 6, 1, 3, 2, 0]
+    assert latencies.tolist() == [4 * MS, 1000, 10 * MS, MS // 2, MS, 8 * MS]
+
+
+def test_default_layout_is_timed_from_enter_exit_pairs():
+    (ts, containers, classes, latencies), = iter_capture(os.path.join(FIXTURES, "default.txt"))
+    # An exit without its enter is dropped, and a thread keeps only its latest pending enter
+    # Nanoseconds since midnight: 12:00:01.002, 12:00:01.5035 and 12:00:02.1005
+    assert ts.tolist() == [43201002000000, 43201503500000, 43202100500000]
+    assert containers == ["java", "postgres", "java"]
+    assert classes.tolist() == [1, 0, 3]
+    assert latencies.tolist() == [2 * MS, 3500000, MS // 2]
+
+
+def test_json_capture_falls_back_to_the_process_name():
+    (ts, containers, classes, latencies), = iter_capture(os.path.join(FIXTURES, "capture.json"))
+    # The fsync exit has no enter and no latency, and the last event no timestamp
+    assert containers == ["db", "nginx"]
+    assert classes.tolist() == [3, 4]
+    assert latencies.tolist() == [300000, 200000]
+
+
+def test_overlapping_windows_each_count_the_syscalls_they_contain():
+    starts, ends = np.array([T0 + 2, T0]), np.array([T0 + 7, T0 + 4])
+    profile = profile_capture(os.path.join(FIXTURES, "capture.txt"), starts, ends, ["GET /cart", "GET /login"])
+    # Windows are reported by start time; the fsync at T0 + 9 is outside both
+    assert rows(profile) == [
+        ("GET /login", "web", "fsync", 1, 4.0),
+        ("GET /login", "web", "futex", 1, 10.0),
+        ("GET /login", "web", "other", 1, 0.001),
+        ("GET /login", "db", "io", 1, 0.5),
+        ("GET /cart", "web", "futex", 1, 10.0),
+        ("GET /cart", "web", "other", 1, 0.001),
+        ("GET /cart", "db", "epoll", 1, 1.0),
+        ("GET /cart", "db", "io", 1, 0.5),
+    ]
+    futex = profile.report()[1]
+    assert futex["p99"] == pytest.approx(10.0, rel=0.01)
+    # 10 ms blocked in a 4 s window
+    assert futex["mean_blocked_threads"] == pytest.approx(0.0025)
+
+
+def test_windows_without_a_start_time_are_dropped():
+    # Legacy results converted from CSV have started = NaN
+    starts, ends = np.array([np.nan, T0, T0 + 2]), np.array([T0 + 5, T0 + 4, np.nan])
+    profile = profile_capture(os.path.join(FIXTURES, "capture.txt"), starts, ends, ["legacy", "GET /login", "open"])
+    assert profile.labels == ["GET /login"]
+    assert [row[:4] for row in rows(profile)] == [("GET /login", "web", "fsync", 1), ("GET /login", "web", "futex", 1),
+                                                  ("GET /login", "web", "other", 1), ("GET /login", "db", "io", 1)]
+
+
+def test_batches_fold_into_the_same_profile():
+    path = os.path.join(FIXTURES, "capture.txt")
+    starts, ends = np.array([T0, T0 + 2]), np.array([T0 + 4, T0 + 7])
+    whole = profile_capture(path, starts, ends, ["a", "b"]).report()
+    batched = profile_capture(path, starts, ends, ["a", "b"], batch_events=2).report()
+    assert batched.tolist() == whole.tolist()
+
+
+def test_whole_capture_profile():
+    report = profile_capture(os.path.join(FIXTURES, "capture.txt")).report()
+    fsync = report[0]
+    assert (fsync["window"], fsync["container"], fsync["syscall_class"], fsync["count"]) == ("*", "web", "fsync", 2)
+    assert fsync["max"] == pytest.approx(8.0, rel=0.01)
+    assert fsync["blocked_ms"] == pytest.approx(12.0)
+    assert np.isnan(fsync["mean_blocked_threads"])
+
+
+def test_time_of_day_is_mapped_onto_the_day_of_the_windows():
+    profile = profile_capture(os.path.join(FIXTURES, "default.txt"), np.array([T0 + 1]), np.array([T0 + 2]),
+                              ["GET /login"])
+    # The read exits at 12:00:02.1005, after the window
+    assert rows(profile) == [("GET /login", "java", "futex", 1, 2.0), ("GET /login", "postgres", "fsync", 1, 3.5)]
+
+
+def test_time_of_day_after_midnight_belongs_to_the_next_day():
+    before_midnight = T0 + DAY / 2 - 2  # 23:59:58
+    profile = SyscallProfile(np.array([before_midnight]), np.array([before_midnight + 10]), ["night"])
+    # 23:59:59 and 00:00:01 both fall in the window; 12:00:00 of the same day does not
+    ts = np.array([DAY - 1, 1, DAY / 2], dtype=np.int64) * 10 ** 9
+    profile.add(ts, ["web"] * 3, np.zeros(3, np.int8), np.full(3, MS, np.int64))
+    assert rows(profile) == [("night", "web", "fsync", 2, 2.0)]